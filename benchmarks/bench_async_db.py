@@ -0,0 +1,106 @@
+"""Interaction latency benchmark: blocking get_db() vs async get_async_db()
+
+Fires N concurrent balance lookups (the query behind /balance) the way the
+cogs run them and reports p50/p99 latency for each command, plus the worst
+event loop stall seen by a heartbeat probe.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_async_db [--concurrency 200]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import select
+from utils.database import get_db, get_async_db, UserProfile
+from benchmarks.harness import percentile
+
+BENCH_GUILD_ID = 1
+
+
+async def blocking_balance(user_id: int):
+    """Old handler: synchronous session inside an async command"""
+    with get_db() as db:
+        profile = db.query(UserProfile).filter(
+            UserProfile.user_id == user_id,
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ).first()
+        return profile.balance if profile else None
+
+
+async def async_balance(user_id: int):
+    """New handler: async session, the event loop keeps running while we wait"""
+    async with get_async_db() as db:
+        profile = await db.scalar(select(UserProfile).filter(
+            UserProfile.user_id == user_id,
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ))
+        return profile.balance if profile else None
+
+
+async def heartbeat_probe(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """Measure how late the event loop wakes up, like the gateway heartbeat would"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(handler, concurrency: int):
+    """Dispatch `concurrency` commands at once and time each from arrival to reply"""
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(heartbeat_probe(stop, lags))
+    await asyncio.sleep(0)
+
+    # All interactions arrive at once; latency is measured from arrival, so time
+    # spent waiting behind a blocked event loop counts against the command
+    started = time.perf_counter()
+
+    async def timed(user_id):
+        await handler(user_id)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(timed(random.randrange(1, 10**12)) for _ in range(concurrency)))
+    total = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    return {
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'max_loop_stall_ms': max(lags, default=0.0) * 1000,
+        'total_s': total,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    # Warm up both connection pools so connect time isn't measured
+    await run(blocking_balance, 5)
+    await run(async_balance, 15)
+
+    for name, handler in (('before (get_db)', blocking_balance), ('after (get_async_db)', async_balance)):
+        for round_no in range(1, args.rounds + 1):
+            result = await run(handler, args.concurrency)
+            print(
+                f"{name:<22} round {round_no}: "
+                f"p50 {result['p50_ms']:8.1f}ms  p99 {result['p99_ms']:8.1f}ms  "
+                f"mean {result['mean_ms']:8.1f}ms  loop stall {result['max_loop_stall_ms']:8.1f}ms  "
+                f"total {result['total_s']:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
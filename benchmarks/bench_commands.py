@@ -0,0 +1,114 @@
+"""Offline command benchmark: drives the Economy cog with fake interactions
+
+Invokes the app command callbacks (/balance, /send, /top, /level, /rank,
+/history) directly against the database in DATABASE_URL, no Discord
+connection needed. For each command it reports ops/sec, p50/p95/p99 latency
+and the number of SQL statements per invocation, and writes the results to a
+JSON file so runs can be compared (--compare an earlier file).
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_commands [--invocations 500] [--concurrency 20]
+           [--commands balance,top] [--output results.json] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, insert
+from utils.database import get_async_db, UserProfile, Transaction, ServiceLevel
+from cogs.economy import Economy
+from benchmarks.harness import (
+    FakeBot, FakeUser, bench_command, git_revision, print_results, save_results, load_results
+)
+
+BENCH_GUILD_ID = 4
+
+
+def command_options(users):
+    """Command name -> function returning (user, options) for one random invocation"""
+    def anyone():
+        return random.choice(users), {}
+
+    def transfer():
+        sender, recipient = random.sample(users, 2)
+        return sender, {'user': recipient, 'amount': 1}
+
+    return {
+        'balance': anyone,
+        'send': transfer,
+        'top': anyone,
+        'level': anyone,
+        'rank': anyone,
+        'history': anyone,
+    }
+
+
+async def seed(profiles: int):
+    """Reset the bench guild: profiles with skewed balances, 10 levels, 5 transfers per profile"""
+    async with get_async_db() as db:
+        for model in (Transaction, UserProfile, ServiceLevel):
+            await db.execute(delete(model).filter(model.guild_id == BENCH_GUILD_ID))
+        await db.execute(insert(UserProfile), [
+            {'user_id': user_id, 'guild_id': BENCH_GUILD_ID, 'balance': int(1000 * random.paretovariate(1.2))}
+            for user_id in range(1, profiles + 1)
+        ])
+        await db.execute(insert(ServiceLevel), [
+            {'guild_id': BENCH_GUILD_ID, 'name': f"Level {n}", 'emoji': '⭐',
+             'required_balance': n * 5000, 'color': 0x7289DA, 'benefits': '[]'}
+            for n in range(1, 11)
+        ])
+        await db.execute(insert(Transaction), [
+            {'from_user_id': random.randint(1, profiles), 'to_user_id': random.randint(1, profiles),
+             'guild_id': BENCH_GUILD_ID, 'amount': random.randint(1, 500), 'transaction_type': 'transfer'}
+            for _ in range(profiles * 5)
+        ])
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=1000, help='Profiles seeded into the bench guild')
+    parser.add_argument('--invocations', type=int, default=500, help='Invocations per command')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--commands', default='balance,send,top,level,rank,history')
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the data of the previous run')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/commands-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        print(f"Seeding {args.profiles:,} profiles into guild {BENCH_GUILD_ID}...")
+        await seed(args.profiles)
+
+    users = [FakeUser(user_id) for user_id in range(1, args.profiles + 1)]
+    cog = Economy(FakeBot(users))
+    options = command_options(users)
+    commands = {command.name: command for command in cog.get_app_commands()}
+
+    results = {
+        'benchmark': 'commands',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'commands': {},
+    }
+    for name in args.commands.split(','):
+        results['commands'][name] = await bench_command(
+            cog, commands[name], options[name], BENCH_GUILD_ID, args.invocations, args.concurrency
+        )
+
+    baseline = None
+    if args.compare:
+        baseline = load_results(args.compare)
+        print(f"Compared with {args.compare} (revision {baseline.get('revision')})")
+    print_results(results['commands'], baseline and baseline['commands'])
+
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
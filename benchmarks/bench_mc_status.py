@@ -0,0 +1,131 @@
+"""Minecraft status cache: pings per burst of /mc_status and poller behaviour
+
+Runs the status cache (utils/minecraft_status.py) against fake servers that
+answer after --latency seconds and count the status requests they get:
+
+- burst: --callers concurrent lookups of one server with an empty, a fresh
+  and a stale cache, and the pings each burst caused (the old cog sent one
+  per caller);
+- poller: one polling round over --servers servers, a tenth of them down,
+  with its wall time (servers are polled concurrently, so about one
+  latency) and the backoff scheduled for the failing ones.
+
+Usage: python -m benchmarks.bench_mc_status [--callers 100] [--servers 50] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from utils.config import MINECRAFT
+from utils.minecraft_status import ServerStatus, StatusPoller
+from benchmarks.harness import git_revision, save_results
+
+
+class FakeServer:
+    """JavaServer stand-in"""
+
+    def __init__(self, latency: float, down: bool = False):
+        self.latency = latency
+        self.down = down
+        self.pings = 0
+
+    async def async_status(self):
+        self.pings += 1
+        await asyncio.sleep(self.latency)
+        if self.down:
+            raise ConnectionRefusedError("server down")
+        return SimpleNamespace(latency=self.latency * 1000, players=SimpleNamespace(online=0, max=20, sample=None))
+
+
+def attach(cache: ServerStatus, server: FakeServer):
+    cache.server = server
+    # Failures reset cache.server so the address is resolved again; keep the fake instead
+    fetch = cache._fetch
+
+    async def fetch_with_fake():
+        cache.server = server
+        return await fetch()
+
+    cache._fetch = fetch_with_fake
+
+
+async def burst(callers: int, latency: float) -> dict:
+    server = FakeServer(latency)
+    cache = ServerStatus('burst.test')
+    attach(cache, server)
+    results = {}
+    for state in ('empty', 'fresh', 'stale'):
+        if state == 'stale':
+            cache.fetched_at = time.monotonic() - MINECRAFT['STATUS_TTL'] - 1
+        pings = server.pings
+        started = time.perf_counter()
+        answers = await asyncio.gather(*(cache.get() for _ in range(callers)))
+        elapsed = time.perf_counter() - started
+        if cache._refresh:
+            await cache._refresh  # Let the background refresh of a stale status finish
+        results[state] = {
+            'callers': callers,
+            'pings': server.pings - pings,
+            'answered': sum(answer is not None for answer in answers),
+            'wall_ms': round(elapsed * 1000, 1),
+        }
+    return results
+
+
+async def poll_round(servers: int, latency: float) -> dict:
+    poller = StatusPoller(f"server{n}.test" for n in range(servers))
+    fakes = {}
+    for n, cache in enumerate(poller.servers.values()):
+        fakes[cache.address] = FakeServer(latency, down=n % 10 == 0)
+        attach(cache, fakes[cache.address])
+
+    started = time.perf_counter()
+    task = asyncio.create_task(poller.run())
+    while any(fake.pings == 0 for fake in fakes.values()) or any(
+        cache._refresh is None or not cache._refresh.done() for cache in poller.servers.values()
+    ):
+        await asyncio.sleep(latency / 10)
+    elapsed = time.perf_counter() - started
+    task.cancel()
+
+    now = time.monotonic()
+    down = [cache for cache in poller.servers.values() if fakes[cache.address].down]
+    return {
+        'servers': servers,
+        'down': len(down),
+        'wall_ms': round(elapsed * 1000, 1),
+        'next_poll_up_s': round(min(cache.next_poll for cache in poller.servers.values() if cache.status) - now),
+        'next_poll_down_s': round(min(cache.next_poll for cache in down) - now) if down else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--callers', type=int, default=100, help='Concurrent /mc_status callers')
+    parser.add_argument('--servers', type=int, default=50, help='Servers in the polling round')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per fake status request')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/mc_status-<time>.json)')
+    args = parser.parse_args()
+
+    results = {
+        'benchmark': 'mc_status',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+        'burst': await burst(args.callers, args.latency),
+        'poll_round': await poll_round(args.servers, args.latency),
+    }
+
+    print(f"{'cache':<8}{'callers':>9}{'pings':>7}{'answered':>10}{'wall ms':>9}")
+    for state, stats in results['burst'].items():
+        print(f"{state:<8}{stats['callers']:>9}{stats['pings']:>7}{stats['answered']:>10}{stats['wall_ms']:>9}")
+    poll = results['poll_round']
+    print(f"poll round: {poll['servers']} servers ({poll['down']} down) in {poll['wall_ms']} ms; "
+          f"next poll in {poll['next_poll_up_s']}s, {poll['next_poll_down_s']}s for servers that are down")
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
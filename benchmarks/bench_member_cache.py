@@ -0,0 +1,135 @@
+"""Member cache memory and startup cost, default vs low-memory mode
+
+Builds a guild from a synthetic GUILD_CREATE payload with --members members
+through discord.py's own parsing and caching code, once with the default
+client options (members intent, every member cached) and once with
+LOW_MEMORY_MODE's (utils/members.py: no members intent, member cache off;
+the payload then carries no member list, as Discord sends it). Reports the
+parse time and the memory the guild keeps alive (tracemalloc), per mode and
+size.
+
+Network time isn't simulated: with the members intent a large guild is
+downloaded in chunks of 1000 members at startup, reported as
+chunk_requests; low-memory mode makes none.
+
+Usage: python -m benchmarks.bench_member_cache [--members 10000,100000]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from utils.members import client_options
+from benchmarks.harness import git_revision, save_results
+
+GUILD_ID = 1
+CHUNK_SIZE = 1000  # Members per GUILD_MEMBERS_CHUNK event
+
+
+def member_payload(user_id: int, now: datetime) -> dict:
+    return {
+        'user': {
+            'id': str(user_id),
+            'username': f"user{user_id}",
+            'discriminator': '0',
+            'global_name': f"User {user_id}" if random.random() < 0.5 else None,
+            'avatar': f"{random.getrandbits(128):032x}" if random.random() < 0.7 else None,
+        },
+        'nick': f"nick{user_id}" if random.random() < 0.3 else None,
+        'roles': [str(10 + random.randint(1, 20))] if random.random() < 0.4 else [],
+        'joined_at': (now - timedelta(days=random.randint(0, 2000))).isoformat(),
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def guild_payload(members: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        'id': str(GUILD_ID),
+        'name': 'bench',
+        'member_count': members,
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone', 'permissions': '0', 'position': 0,
+                   'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}] + [
+            {'id': str(10 + n), 'name': f"role{n}", 'permissions': '0', 'position': n,
+             'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}
+            for n in range(1, 21)
+        ],
+        'channels': [],
+        'members': [member_payload(user_id, now) for user_id in range(1000, 1000 + members)],
+    }
+
+
+def build_guild(low_memory: bool, payload: dict):
+    client = discord.Client(**client_options(low_memory))
+    return client, discord.Guild(data=payload, state=client._connection)
+
+
+def measure(low_memory: bool, payload: dict) -> dict:
+    members = len(payload['members'])
+    if low_memory:
+        # Without the members intent Discord sends no member list (only the bot and voice members)
+        payload = {**payload, 'members': []}
+
+    # Timing pass without tracemalloc, which slows allocation down
+    gc.collect()
+    started = time.perf_counter()
+    client, guild = build_guild(low_memory, payload)
+    parse_time = time.perf_counter() - started
+    cached = len(guild.members)
+    del client, guild
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    client, guild = build_guild(low_memory, payload)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del client, guild
+
+    return {
+        'members': members,
+        'cached_members': cached,
+        'parse_ms': round(parse_time * 1000, 1),
+        'retained_mb': round(retained / 2 ** 20, 2),
+        'bytes_per_member': round(retained / members),
+        'chunk_requests': 0 if low_memory else -(-members // CHUNK_SIZE),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', default='10000,100000', help='Guild sizes, comma separated')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/member_cache-<time>.json)')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    results = {
+        'benchmark': 'member_cache',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {'members': args.members, 'seed': args.seed},
+        'modes': {'default': {}, 'low_memory': {}},
+    }
+    print(f"{'mode':<12}{'members':>10}{'cached':>10}{'parse ms':>10}{'kept MB':>10}{'B/member':>10}{'chunks':>8}")
+    for size in (int(size) for size in args.members.split(',')):
+        payload = guild_payload(size)
+        for mode, low_memory in (('default', False), ('low_memory', True)):
+            stats = measure(low_memory, payload)
+            results['modes'][mode][str(size)] = stats
+            print(f"{mode:<12}{size:>10}{stats['cached_members']:>10}{stats['parse_ms']:>10}"
+                  f"{stats['retained_mb']:>10}{stats['bytes_per_member']:>10}{stats['chunk_requests']:>8}")
+        del payload
+
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
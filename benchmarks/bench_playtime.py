@@ -0,0 +1,135 @@
+"""Playtime reward tick cost: one set-based statement vs a statement per player
+
+Links --players Minecraft players to members of --guilds guilds (half of
+them with a UUID, half by name only), puts them all online on one fake
+server and runs playtime ticks (utils/playtime.py) UPDATE_INTERVAL apart;
+the ticks that complete a PERIOD pay every player and are measured. For
+comparison the same rewards are then credited per player with
+credit_balance and a Transaction row each, as /mc_reward does. Reports wall
+time and SQL statements per tick.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_playtime [--players 5000] [--guilds 3] [--ticks 5]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, insert
+from utils.config import MINECRAFT, PLAYTIME
+from utils.database import get_async_db, UserProfile, Transaction, MinecraftLink
+from utils.accounts import credit_balance
+from utils.ledger import record_transaction, commit_with_ledger
+from utils.minecraft_status import StatusPoller
+from utils.playtime import PlaytimeTracker
+from utils.tracing import start_trace
+from benchmarks.harness import git_revision, save_results
+
+PLAYTIME_GUILD_BASE = 9000  # Guilds PLAYTIME_GUILD_BASE .. PLAYTIME_GUILD_BASE + --guilds - 1
+SERVER = 'playtime.bench'
+
+
+def player(n: int) -> SimpleNamespace:
+    return SimpleNamespace(name=f"Player_{n}", id=f"{n:032x}")
+
+
+async def seed(players: int, guilds: int):
+    guild_ids = [PLAYTIME_GUILD_BASE + n for n in range(guilds)]
+    async with get_async_db() as db:
+        for model in (Transaction, UserProfile, MinecraftLink):
+            await db.execute(delete(model).filter(model.guild_id.in_(guild_ids)))
+        await db.execute(insert(MinecraftLink), [
+            {'guild_id': guild_ids[n % guilds], 'user_id': 10 ** 6 + n, 'minecraft_name': player(n).name,
+             'name_key': player(n).name.casefold(), 'minecraft_uuid': player(n).id if n % 2 else None,
+             'verified': True}
+            for n in range(players)
+        ])
+        await db.commit()
+
+
+async def batched(players: int, ticks: int) -> list:
+    poller = StatusPoller([SERVER])
+    server = poller.get(SERVER)
+    sample = [player(n) for n in range(players)]
+    server.status = SimpleNamespace(players=SimpleNamespace(online=players, max=players, sample=sample))
+    tracker = PlaytimeTracker()
+
+    # Samples UPDATE_INTERVAL apart; the tick that completes a PERIOD is measured
+    polls_per_period = -(-PLAYTIME['PERIOD'] // MINECRAFT['UPDATE_INTERVAL'])
+    server.fetched_at = 0.0
+    await tracker.tick(poller)
+    results = []
+    for tick in range(1, ticks + 1):
+        for _ in range(polls_per_period - 1):
+            server.fetched_at += MINECRAFT['UPDATE_INTERVAL']
+            await tracker.tick(poller)
+        server.fetched_at += MINECRAFT['UPDATE_INTERVAL']
+        trace = start_trace('playtime_tick')
+        started = time.perf_counter()
+        await tracker.tick(poller)
+        results.append({'seconds': time.perf_counter() - started, 'queries': trace.queries})
+    results[0]['credited'] = tracker.paid_players // ticks
+    return results
+
+
+async def per_player(players: int, ticks: int, guilds: int) -> list:
+    results = []
+    for _ in range(ticks):
+        trace = start_trace('playtime_per_player')
+        started = time.perf_counter()
+        async with get_async_db() as db:
+            for n in range(players):
+                guild_id, user_id = PLAYTIME_GUILD_BASE + n % guilds, 10 ** 6 + n
+                await credit_balance(db, guild_id, user_id, PLAYTIME['REWARD'])
+                record_transaction(db, from_user_id=None, to_user_id=user_id, guild_id=guild_id,
+                                   amount=PLAYTIME['REWARD'], transaction_type='playtime')
+                await db.flush()
+            await commit_with_ledger(db)
+        results.append({'seconds': time.perf_counter() - started, 'queries': trace.queries})
+    return results
+
+
+def summary(results: list) -> dict:
+    return {
+        'tick_ms_avg': round(sum(result['seconds'] for result in results) / len(results) * 1000, 1),
+        'tick_ms_max': round(max(result['seconds'] for result in results) * 1000, 1),
+        'queries_per_tick': max(result['queries'] for result in results),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=5000, help='Online linked players')
+    parser.add_argument('--guilds', type=int, default=3, help='Guilds the links are spread over')
+    parser.add_argument('--ticks', type=int, default=5, help='Paying ticks per mode')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/playtime-<time>.json)')
+    args = parser.parse_args()
+
+    await seed(args.players, args.guilds)
+    tick_results = await batched(args.players, args.ticks)
+    results = {
+        'benchmark': 'playtime',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+        'credited_per_tick': tick_results[0]['credited'],
+        'modes': {
+            'batched': summary(tick_results),
+            'per_player': summary(await per_player(args.players, args.ticks, args.guilds)),
+        },
+    }
+
+    print(f"{args.players} players, {results['credited_per_tick']} credited per tick")
+    print(f"{'mode':<12}{'avg ms':>10}{'max ms':>10}{'queries':>10}")
+    for mode, stats in results['modes'].items():
+        print(f"{mode:<12}{stats['tick_ms_avg']:>10}{stats['tick_ms_max']:>10}{stats['queries_per_tick']:>10}")
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+"""Query plans and timings for each cog query, without and with the hot-path indexes
+
+For every query the cogs run, prints the EXPLAIN ANALYZE plan and the median
+execution time twice: once with the indexes from migrations 0002 and 0004 dropped
+(inside a transaction that is rolled back, so nothing is lost) and once
+with them in place.
+
+DROP INDEX takes an exclusive lock on the table until the rollback, so run
+this against a development database, not production.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_query_plans [--seed-profiles 100000]
+"""
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.dialects import postgresql
+from utils.config import DEFAULT_BALANCE, HISTORY
+from utils.database import engine, UserProfile, Transaction, ServiceLevel
+from utils.history import FIRST_PAGE_SQL
+from utils.transfers import TRANSFER_SQL
+
+BENCH_GUILD_ID = 3
+
+HOT_PATH_INDEXES = [
+    'ix_user_profiles_guild_balance',
+    'ix_transactions_guild_created',
+    'ix_transactions_guild_from_history',
+    'ix_transactions_guild_to_history',
+    'ix_service_levels_guild_required_balance',
+]
+
+
+def cog_queries(user_id: int):
+    """(name, statement, params, writes) for each query the cogs issue"""
+    return [
+        ('balance lookup', select(UserProfile).filter(
+            UserProfile.user_id == user_id, UserProfile.guild_id == BENCH_GUILD_ID
+        ), None, False),
+        ('/top batch', select(UserProfile.user_id, UserProfile.balance).filter(
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ).order_by(desc(UserProfile.balance), desc(UserProfile.user_id)).limit(20), None, False),
+        ('/top profile count', select(func.count()).select_from(UserProfile).filter(
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ), None, False),
+        ('/rank build', select(UserProfile.user_id, UserProfile.balance).filter(
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ), None, False),
+        ('service levels load', select(ServiceLevel).filter(ServiceLevel.guild_id == BENCH_GUILD_ID), None, False),
+        ('guild transactions, newest', select(Transaction).filter(
+            Transaction.guild_id == BENCH_GUILD_ID
+        ).order_by(desc(Transaction.created_at)).limit(50), None, False),
+        ('/history first page', FIRST_PAGE_SQL, {
+            'guild_id': BENCH_GUILD_ID, 'user_id': user_id, 'limit': HISTORY['PAGE_SIZE'] + 1,
+        }, False),
+        ('/send transfer', TRANSFER_SQL, {
+            'guild_id': BENCH_GUILD_ID, 'from_user_id': user_id, 'to_user_id': user_id + 1,
+            'amount': 1, 'sender_opening_balance': DEFAULT_BALANCE - 1,
+            'recipient_opening_balance': DEFAULT_BALANCE + 1, 'transaction_type': 'transfer',
+        }, True),
+    ]
+
+
+def compile_sql(statement):
+    if hasattr(statement, 'compile') and not hasattr(statement, 'text'):
+        return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    return statement.text
+
+
+def seed(connection, profiles: int):
+    """Fill the bench guild with skewed balances, levels and ten transactions per profile"""
+    print(f"Seeding {profiles:,} profiles and {profiles * 10:,} transactions into guild {BENCH_GUILD_ID}...")
+    connection.execute(text("DELETE FROM transactions WHERE guild_id = :g"), {'g': BENCH_GUILD_ID})
+    connection.execute(text("DELETE FROM user_profiles WHERE guild_id = :g"), {'g': BENCH_GUILD_ID})
+    connection.execute(text("DELETE FROM service_levels WHERE guild_id = :g"), {'g': BENCH_GUILD_ID})
+    connection.execute(text("""
+        INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+        SELECT n, :g, (1000 * exp(random() * 8))::int, now(), now()
+        FROM generate_series(1, :n) AS n
+    """), {'g': BENCH_GUILD_ID, 'n': profiles})
+    connection.execute(text("""
+        INSERT INTO transactions (from_user_id, to_user_id, guild_id, amount, transaction_type, created_at)
+        SELECT 1 + (random() * (:n - 1))::int, 1 + (random() * (:n - 1))::int, :g,
+               1 + (random() * 500)::int, 'transfer', now() - random() * interval '365 days'
+        FROM generate_series(1, :n * 10)
+    """), {'g': BENCH_GUILD_ID, 'n': profiles})
+    connection.execute(text("""
+        INSERT INTO service_levels (guild_id, name, emoji, required_balance, color, benefits)
+        SELECT :g, 'Level ' || n, '⭐', n * 5000, 7506394, '[]'
+        FROM generate_series(1, 10) AS n
+    """), {'g': BENCH_GUILD_ID})
+    connection.execute(text("ANALYZE user_profiles, transactions, service_levels"))
+    connection.commit()
+
+
+def measure(connection, queries, repeat: int):
+    results = {}
+    for name, statement, params, writes in queries:
+        sql = compile_sql(statement)
+        plan = connection.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params or {}).scalars().all()
+
+        timings = []
+        for _ in range(repeat):
+            savepoint = connection.begin_nested() if writes else None
+            started = time.perf_counter()
+            connection.execute(text(sql), params or {}).fetchall()
+            timings.append(time.perf_counter() - started)
+            if savepoint:
+                savepoint.rollback()
+
+        results[name] = (statistics.median(timings) * 1000, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed-profiles', type=int, default=0,
+                        help='Reset the bench guild with this many synthetic profiles first')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        if args.seed_profiles:
+            seed(connection, args.seed_profiles)
+
+        user_id = connection.execute(select(func.max(UserProfile.user_id)).filter(
+            UserProfile.guild_id == BENCH_GUILD_ID
+        )).scalar() or 1
+        queries = cog_queries(user_id // 2)
+
+        # Still inside the transaction the query above began; rolling back restores the indexes
+        for index in HOT_PATH_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        before = measure(connection, queries, args.repeat)
+        connection.rollback()
+
+        after = measure(connection, queries, args.repeat)
+        connection.rollback()
+
+    for name, _, _, _ in queries:
+        before_ms, before_plan = before[name]
+        after_ms, after_plan = after[name]
+        print(f"\n=== {name}: {before_ms:.2f}ms -> {after_ms:.2f}ms")
+        print("--- without indexes")
+        print("\n".join(before_plan))
+        print("--- with indexes")
+        print("\n".join(after_plan))
+
+    print("\nSummary (median ms, without -> with indexes)")
+    for name, _, _, _ in queries:
+        print(f"  {name:<32} {before[name][0]:10.2f} -> {after[name][0]:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
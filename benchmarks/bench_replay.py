@@ -0,0 +1,216 @@
+"""Replay recorded command traffic through the cogs against a local database
+
+Reads trace files written with TRAFFIC_RECORD=true (utils/traffic.py) and
+invokes each recorded command with fake interactions, keeping the recorded
+gaps between invocations divided by --speed (1 = real time, 10 = ten times
+faster) or, with --speed max, as fast as --concurrency workers allow.
+
+Reports throughput, latency percentiles overall and per command, how far
+the scheduler fell behind the recorded timeline, and lock waits sampled
+from pg_stat_activity while the replay runs. Results are saved as JSON
+(benchmarks/results/replay-<time>.json) and can be compared with --compare.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_replay data/traffic/traffic-*.ndjson.gz
+           [--speed 1|10|max] [--concurrency 50] [--limit 10000] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import text
+from utils.database import engine
+from utils.traffic import read_trace
+from cogs.economy import Economy
+from cogs.admin import Admin
+from benchmarks.harness import (
+    ADMIN_ROLE, FakeBot, FakeUser, FakeInteraction, run_command, summarize, percentile,
+    git_revision, print_results, save_results, load_results
+)
+
+LOCK_SAMPLE_INTERVAL = 0.1  # Seconds between pg_stat_activity samples
+
+LOCK_WAITERS_SQL = text("""
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database() AND wait_event_type = 'Lock'
+""")
+DEADLOCKS_SQL = text("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+
+
+class LockSampler:
+    """Counts backends waiting on locks, from a thread with its own (sync) connection"""
+
+    def __init__(self, interval: float = LOCK_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        with engine.connect() as connection:
+            self.deadlocks_before = connection.scalar(DEADLOCKS_SQL)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        with engine.connect() as connection:
+            deadlocks = connection.scalar(DEADLOCKS_SQL) - self.deadlocks_before
+        waiting = [count for count in self.samples if count]
+        return {
+            'samples': len(self.samples),
+            'samples_with_waiters': len(waiting),
+            'max_waiters': max(self.samples, default=0),
+            # Each waiter seen in a sample stands for about one interval of waiting
+            'wait_seconds_est': round(sum(waiting) * self.interval, 2),
+            'deadlocks': deadlocks,
+        }
+
+    def _run(self):
+        with engine.connect() as connection:
+            connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            while not self._stop.wait(self.interval):
+                self.samples.append(connection.scalar(LOCK_WAITERS_SQL))
+
+
+class Replay:
+    """Invokes recorded commands and collects per-command latencies"""
+
+    def __init__(self, cogs):
+        self.bot = FakeBot()
+        self.commands = {}
+        for cog in cogs(self.bot):
+            self.bot.cogs[cog.qualified_name] = cog
+            for command in cog.walk_app_commands():
+                self.commands[command.qualified_name] = (cog, command)
+        self.latencies, self.queries, self.errors = {}, {}, {}
+        self.skipped = 0
+        self.lag = []
+
+    def user(self, user_id: int) -> FakeUser:
+        if user_id not in self.bot.users:
+            # Roles aren't recorded; recorded callers are let through the permission checks
+            self.bot.users[user_id] = FakeUser(user_id, roles=[ADMIN_ROLE])
+        return self.bot.users[user_id]
+
+    def option(self, value):
+        if isinstance(value, dict) and 'user' in value:
+            return self.user(value['user'])
+        if isinstance(value, dict) and 'string' in value:
+            # Recorded strings are hashed: the same input replays as the same placeholder
+            return f"s{value['string']:x}"[:16]
+        return value
+
+    def options(self, recorded: dict) -> dict:
+        return {name: self.option(value) for name, value in recorded.items()}
+
+    async def invoke(self, record: dict):
+        if record['c'] not in self.commands:
+            self.skipped += 1
+            return
+        cog, command = self.commands[record['c']]
+        interaction = FakeInteraction(self.user(record['u']), record['g'])
+        try:
+            elapsed, statements = await run_command(cog, command, interaction, **self.options(record['o']))
+            failed = interaction.failed
+        except Exception:
+            # Commands handle their own errors; this is a broken recording or a replay bug
+            elapsed, statements, failed = 0.0, 0, True
+        self.latencies.setdefault(record['c'], []).append(elapsed)
+        self.queries.setdefault(record['c'], []).append(statements)
+        self.errors[record['c']] = self.errors.get(record['c'], 0) + failed
+
+    async def timed(self, records, speed: float):
+        """Start each invocation at its recorded offset divided by speed"""
+        first = records[0]['t']
+        started = time.perf_counter()
+        tasks = set()
+        for record in records:
+            due = (record['t'] - first) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.lag.append(max(0.0, -delay))
+            task = asyncio.create_task(self.invoke(record))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def flat_out(self, records, concurrency: int):
+        """Recorded order, no gaps, at most concurrency invocations at a time"""
+        remaining = iter(records)
+
+        async def worker():
+            for record in remaining:
+                await self.invoke(record)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    def results(self, wall_time: float) -> dict:
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        queries = [count for counts in self.queries.values() for count in counts]
+        commands = {
+            name: summarize(self.latencies[name], self.queries[name], self.errors[name], wall_time)
+            for name in sorted(self.latencies, key=lambda name: -len(self.latencies[name]))
+        }
+        return {
+            'total': summarize(everything, queries, sum(self.errors.values()), wall_time) if everything else {},
+            'skipped': self.skipped,
+            'scheduler_lag_p99_ms': round(percentile(self.lag, 99) * 1000, 3) if self.lag else None,
+            'commands': commands,
+        }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('traces', nargs='+', help='Trace files recorded by the bot')
+    parser.add_argument('--speed', default='1', help='Replay speed factor, or "max"')
+    parser.add_argument('--concurrency', type=int, default=50, help='Workers for --speed max')
+    parser.add_argument('--limit', type=int, help='Replay only the first N invocations')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/replay-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    records = sorted((record for path in args.traces for record in read_trace(path)), key=lambda record: record['t'])
+    records = records[:args.limit] if args.limit else records
+    if not records:
+        parser.error("the traces contain no invocations")
+    span = records[-1]['t'] - records[0]['t']
+    print(f"Replaying {len(records):,} invocations recorded over {span:,.0f}s at speed {args.speed}")
+
+    replay = Replay(lambda bot: (Economy(bot), Admin(bot)))
+    sampler = LockSampler()
+    sampler.start()
+    started = time.perf_counter()
+    if args.speed == 'max':
+        await replay.flat_out(records, args.concurrency)
+    else:
+        await replay.timed(records, float(args.speed))
+    wall_time = time.perf_counter() - started
+
+    results = {
+        'benchmark': 'replay',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'wall_time': round(wall_time, 3),
+        **replay.results(wall_time),
+        'lock_waits': sampler.stop(),
+    }
+
+    baseline = load_results(args.compare) if args.compare else {}
+    print_results({'(all)': results['total'], **results['commands']}, {
+        '(all)': baseline.get('total'), **baseline.get('commands', {})
+    } if baseline else None)
+    print(f"skipped {results['skipped']} (unknown commands), scheduler lag p99 {results['scheduler_lag_p99_ms']} ms")
+    print(f"lock waits: {results['lock_waits']}")
+    print(f"Results written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
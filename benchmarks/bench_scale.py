@@ -0,0 +1,120 @@
+"""Command latency against guilds of 10k, 100k and 1M profiles
+
+For each size, generates a guild with benchmarks.dataset (COPY-loaded, skewed
+balances and activity), then drives /top, /level, /balance and the admin
+balance commands through the cogs with fake interactions. Results for all
+sizes are printed and saved as JSON (benchmarks/results/scale-<time>.json).
+
+A guild that already holds the requested number of profiles is reused unless
+--regenerate is given; the 1M guild takes a few minutes to load.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_scale [--sizes 10000,100000,1000000]
+           [--invocations 200] [--concurrency 10] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import func, select
+from utils.database import get_async_db, UserProfile
+from cogs.economy import Economy
+from cogs.admin import Admin
+from benchmarks.dataset import generate_guild, vacuum_analyze
+from benchmarks.harness import (
+    ADMIN_ROLE, FakeBot, FakeUser, bench_command, git_revision, print_results, save_results, load_results
+)
+
+SCALE_GUILD_BASE = 5000  # Guild of size n is SCALE_GUILD_BASE + its index in --sizes
+ADMIN_USER_ID = 10 ** 12  # Not one of the generated profiles
+
+
+def scale_commands(economy, admin, users):
+    """(name, cog, command, make_invocation) for each benchmarked command"""
+    economy_commands = {command.name: command for command in economy.get_app_commands()}
+    admin_commands = {command.name: command for command in admin.get_app_commands()}
+    admin_user = FakeUser(ADMIN_USER_ID, 'admin', roles=[ADMIN_ROLE])
+
+    def anyone():
+        return random.choice(users), {}
+
+    def set_balance():
+        return admin_user, {'user': random.choice(users), 'amount': random.randint(0, 100000)}
+
+    def reset_balance():
+        return admin_user, {'user': random.choice(users)}
+
+    return [
+        ('top', economy, economy_commands['top'], anyone),
+        ('level', economy, economy_commands['level'], anyone),
+        ('balance', economy, economy_commands['balance'], anyone),
+        ('admin_set', admin, admin_commands['admin_set'], set_balance),
+        ('admin_reset', admin, admin_commands['admin_reset'], reset_balance),
+    ]
+
+
+async def profile_count(guild_id: int) -> int:
+    async with get_async_db() as db:
+        return await db.scalar(select(func.count()).select_from(UserProfile).filter(
+            UserProfile.guild_id == guild_id
+        ))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Profiles per guild, comma separated')
+    parser.add_argument('--transactions-per-profile', type=int, default=5)
+    parser.add_argument('--invocations', type=int, default=200, help='Invocations per command and size')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--regenerate', action='store_true', help='Reload guilds that already exist')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/scale-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    baseline = load_results(args.compare)['sizes'] if args.compare else {}
+    results = {
+        'benchmark': 'scale',
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'sizes': {},
+    }
+
+    generated = False
+    for index, size in enumerate(sizes):
+        guild_id = SCALE_GUILD_BASE + index
+        if args.regenerate or await profile_count(guild_id) != size:
+            print(f"Generating guild {guild_id} with {size:,} profiles...")
+            elapsed = await generate_guild(guild_id, size, size * args.transactions_per_profile)
+            print(f"  loaded in {elapsed:.1f}s")
+            generated = True
+    if generated:
+        await vacuum_analyze()
+
+    for index, size in enumerate(sizes):
+        guild_id = SCALE_GUILD_BASE + index
+        users = [FakeUser(user_id) for user_id in range(1, size + 1)]
+        bot = FakeBot(users)
+        economy, admin = Economy(bot), Admin(bot)
+        bot.cogs = {'Economy': economy, 'Admin': admin}
+
+        commands = {}
+        for name, cog, command, make_invocation in scale_commands(economy, admin, users):
+            commands[name] = await bench_command(
+                cog, command, make_invocation, guild_id, args.invocations, args.concurrency
+            )
+        results['sizes'][str(size)] = commands
+
+        print(f"\n{size:,} profiles (guild {guild_id})")
+        print_results(commands, baseline.get(str(size)))
+
+    print(f"\nResults written to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Writes and table growth: profiles created on lookup vs virtual default accounts
+
+Replays the same traffic twice against a throwaway guild: mostly /balance and
+/level lookups spread over many users, most of whom never send or receive
+anything, plus some /send transfers. The "eager" run creates a profile row on
+every lookup miss, as get_balance used to; the "virtual" run reads a missing
+row as DEFAULT_BALANCE and only transfers create rows.
+
+Usage: DATABASE_URL=... python -m benchmarks.bench_virtual_accounts [--lookups 20000]
+"""
+import argparse
+import asyncio
+import random
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, func, select, text
+from utils.config import DEFAULT_BALANCE
+from utils.database import async_engine, get_async_db, UserProfile, Transaction
+from utils.transfers import transfer_funds
+
+BENCH_GUILD_ID = 4
+
+
+async def eager_lookup(user_id: int) -> int:
+    """Old get_balance: a lookup miss inserts and commits a profile. Returns rows written"""
+    async with get_async_db() as db:
+        balance = await db.scalar(select(UserProfile.balance).filter(
+            UserProfile.user_id == user_id, UserProfile.guild_id == BENCH_GUILD_ID
+        ))
+        if balance is None:
+            db.add(UserProfile(user_id=user_id, guild_id=BENCH_GUILD_ID, balance=DEFAULT_BALANCE))
+            await db.commit()
+            return 1
+        return 0
+
+
+async def virtual_lookup(user_id: int) -> int:
+    """New get_balance: read-only"""
+    async with get_async_db() as db:
+        await db.scalar(select(UserProfile.balance).filter(
+            UserProfile.user_id == user_id, UserProfile.guild_id == BENCH_GUILD_ID
+        ))
+        return 0
+
+
+async def table_state():
+    async with get_async_db() as db:
+        rows = await db.scalar(select(func.count()).select_from(UserProfile).filter(
+            UserProfile.guild_id == BENCH_GUILD_ID
+        ))
+        size = await db.scalar(text("SELECT pg_total_relation_size('user_profiles')"))
+        return rows, size
+
+
+async def run(lookup, traffic):
+    async with get_async_db() as db:
+        await db.execute(delete(Transaction).filter(Transaction.guild_id == BENCH_GUILD_ID))
+        await db.execute(delete(UserProfile).filter(UserProfile.guild_id == BENCH_GUILD_ID))
+        await db.commit()
+    # Reclaim the deleted rows so the previous run's space isn't reused
+    async with async_engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level='AUTOCOMMIT')
+        await connection.execute(text("VACUUM user_profiles"))
+
+    rows_before, size_before = await table_state()
+    writes = 0
+    for kind, user_id, other_id in traffic:
+        if kind == 'lookup':
+            writes += await lookup(user_id)
+        else:
+            async with get_async_db() as db:
+                if await transfer_funds(db, BENCH_GUILD_ID, user_id, other_id, 1) is not None:
+                    writes += 1
+    rows_after, size_after = await table_state()
+    return writes, rows_after - rows_before, size_after - size_before
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000, help='Distinct users looked up')
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--transfers', type=int, default=1000)
+    parser.add_argument('--active-share', type=float, default=0.05,
+                        help='Share of users that ever take part in a transfer')
+    args = parser.parse_args()
+
+    active_users = max(2, int(args.users * args.active_share))
+    traffic = [('lookup', random.randint(1, args.users), None) for _ in range(args.lookups)]
+    for _ in range(args.transfers):
+        sender, recipient = random.sample(range(1, active_users + 1), 2)
+        traffic.append(('transfer', sender, recipient))
+    random.shuffle(traffic)
+
+    results = {}
+    for name, lookup in (('eager', eager_lookup), ('virtual', virtual_lookup)):
+        results[name] = await run(lookup, traffic)
+        writes, rows, size = results[name]
+        print(f"{name:<8} write transactions {writes:>8,}  rows created {rows:>8,}  table growth {size / 1024:>10,.0f} KiB")
+
+    eager_writes, eager_rows, _ = results['eager']
+    virtual_writes, virtual_rows, _ = results['virtual']
+    print(f"\nWrites reduced by {100 * (1 - virtual_writes / max(1, eager_writes)):.1f}%, "
+          f"rows created reduced by {100 * (1 - virtual_rows / max(1, eager_rows)):.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,210 @@
+"""Query and session budget check for every slash command
+
+Runs each app command of the Economy, Admin and Minecraft cogs through a
+few scenarios (own and other user, missing profile, missing level, ...)
+against the database in DATABASE_URL, and counts the SQL statements and database
+sessions each invocation uses (CommandTrace, utils/tracing.py), permission
+checks included. Every command runs in its own freshly seeded guild, so the
+first scenario hits cold caches. Minecraft profile lookups are turned off (no network) and the
+server status cache holds a fixed sample.
+
+Fails (exit status 1) when a command exceeds its entry in BUDGETS, has no
+entry, or opens a session while another one is still open. Raise a budget
+only together with the change that needs the extra statement.
+
+Usage: DATABASE_URL=... python -m benchmarks.check_query_budget [--verbose]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, insert, select
+from utils.config import MINECRAFT
+from utils.database import (get_async_db, UserProfile, Transaction, ServiceLevel, MinecraftLink, CommandPermission,
+                            GuildSetting)
+from cogs.economy import Economy
+from cogs.admin import Admin
+from cogs.minecraft import Minecraft
+from utils.minecraft_status import statuses, ServerStatus
+from benchmarks.harness import ADMIN_ROLE, FakeBot, FakeUser, FakeInteraction, run_command
+
+BUDGET_GUILD_BASE = 7000  # Command n of the run uses guild BUDGET_GUILD_BASE + n
+
+# Most statements and sessions one invocation of the command may use, over all scenarios
+# (commands behind has_command_permission include its command_permissions load on a cold cache)
+BUDGETS = {
+    'balance': {'queries': 2, 'sessions': 2},
+    'send': {'queries': 1, 'sessions': 1},
+    'top': {'queries': 2, 'sessions': 1},
+    'rank': {'queries': 1, 'sessions': 1},
+    'history': {'queries': 1, 'sessions': 1},
+    'level': {'queries': 2, 'sessions': 2},
+    'add_level': {'queries': 3, 'sessions': 2},
+    'edit_level': {'queries': 4, 'sessions': 2},
+    'remove_level': {'queries': 3, 'sessions': 2},
+    'admin_set': {'queries': 3, 'sessions': 2},
+    'set_currency': {'queries': 2, 'sessions': 2},
+    'admin_reset': {'queries': 2, 'sessions': 2},
+    'server_settings': {'queries': 1, 'sessions': 1},
+    'help': {'queries': 1, 'sessions': 2},
+    'get_permission': {'queries': 1, 'sessions': 2},
+    'set_permission': {'queries': 2, 'sessions': 2},
+    'mc_status': {'queries': 0, 'sessions': 0},
+    'mc_link': {'queries': 3, 'sessions': 1},
+    'mc_verify': {'queries': 2, 'sessions': 1},
+    'mc_confirm': {'queries': 3, 'sessions': 2},
+    'mc_unlink': {'queries': 2, 'sessions': 1},
+    'mc_reward': {'queries': 4, 'sessions': 2},
+}
+
+# CALLER is an administrator, NEWCOMER has no profile
+CALLER, OTHER, NEWCOMER = FakeUser(1, roles=[ADMIN_ROLE]), FakeUser(2), FakeUser(3)
+
+# Minecraft accounts linked to each user (OTHER's verified), and a server status with OTHER's
+# and NEWCOMER's accounts online
+LINKS = {CALLER.id: ('Caller_mc', 'c' * 32, False), OTHER.id: ('Other_mc', 'a' * 32, True),
+         NEWCOMER.id: ('Pending_mc', 'd' * 32, False)}
+STATUS = SimpleNamespace(version=SimpleNamespace(name='1.21'), latency=1.0, players=SimpleNamespace(
+    online=3, max=20, sample=[
+        SimpleNamespace(name='Other_mc', id='aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'),
+        SimpleNamespace(name='Pending_mc', id='d' * 32),
+        SimpleNamespace(name='Stranger', id='b' * 32),
+    ]
+))
+STATUS_SERVER = 'mc.budget.test'
+
+
+def scenarios(level_id: int):
+    """Command name -> [(scenario, options)]; level_id is a level of the command's guild"""
+    return {
+        'balance': [('own', {}), ('other user', {'user': OTHER}), ('no profile', {'user': NEWCOMER})],
+        'send': [('transfer', {'user': OTHER, 'amount': 1}), ('new recipient', {'user': NEWCOMER, 'amount': 1}),
+                 ('insufficient funds', {'user': OTHER, 'amount': 10 ** 9})],
+        'top': [('first', {}), ('cached', {})],
+        'rank': [('own', {}), ('other user', {'user': OTHER}), ('page', {'page': 1})],
+        'history': [('own', {}), ('other user', {'user': OTHER})],
+        'level': [('overview', {}), ('one level', {'level_id': level_id}), ('missing level', {'level_id': 0})],
+        'add_level': [('new', {'name': 'Новый', 'emoji': '⭐'}), ('duplicate', {'name': 'Новый', 'emoji': '⭐'})],
+        'edit_level': [('rename', {'level_id': level_id, 'name': 'Другой'}), ('missing level', {'level_id': 0})],
+        'remove_level': [('remove', {'level_id': level_id}), ('missing level', {'level_id': level_id})],
+        'admin_set': [('existing profile', {'user': OTHER, 'amount': 500}),
+                      ('no profile', {'user': NEWCOMER, 'amount': 500})],
+        'set_currency': [('rename', {'name': 'кредитов', 'symbol': '💳'}),
+                         ('with format', {'name': 'кредитов', 'symbol': '💳', 'format': '{amount:_} {currency}'}),
+                         ('invalid format', {'name': 'кредитов', 'symbol': '💳', 'format': '{amount.real}'})],
+        'admin_reset': [('existing profile', {'user': OTHER})],
+        'server_settings': [('show', {}), ('change', {'default_balance': 50, 'leaderboard_size': 5})],
+        'help': [('first', {}), ('cached', {})],
+        'get_permission': [('default level', {'command': 'admin_set'}), ('open to all', {'command': 'top'}),
+                           ('unknown command', {'command': 'nope'})],
+        'set_permission': [('override', {'command': 'add_level', 'level': 2}),
+                           ('again', {'command': 'add_level', 'level': 3}),
+                           ('not configurable', {'command': 'top', 'level': 1}),
+                           ('lock out', {'command': 'set_permission', 'level': 0})],
+        'mc_link': [('relink', {'nickname': 'Caller_MC'}), ('taken', {'nickname': 'other_mc'}),
+                    ('invalid', {'nickname': 'x'}), ('unverified elsewhere', {'nickname': 'Pending_mc'})],
+        'mc_verify': [('wrong code', {'code': 'deadbeef'}), ('no code', {})],
+        'mc_confirm': [('unverified', {'member': NEWCOMER}), ('verified', {'member': OTHER})],
+        'mc_unlink': [('linked', {}), ('not linked', {})],
+        'mc_reward': [('linked player', {'player': 'other_mc', 'amount': 10}),
+                      ('unlinked player', {'player': 'Stranger', 'amount': 10}),
+                      ('unverified player', {'player': 'Pending_mc', 'amount': 10}),
+                      ('offline player', {'player': 'Caller_mc', 'amount': 10})],
+    }
+
+
+async def seed(guild_id: int) -> int:
+    """Reset a guild to two profiles with a transfer between them, three levels and
+    three Minecraft links; returns a level id"""
+    async with get_async_db() as db:
+        for model in (Transaction, UserProfile, ServiceLevel, MinecraftLink, CommandPermission, GuildSetting):
+            await db.execute(delete(model).filter(model.guild_id == guild_id))
+        await db.execute(insert(UserProfile), [
+            {'user_id': user.id, 'guild_id': guild_id, 'balance': 10000} for user in (CALLER, OTHER)
+        ])
+        await db.execute(insert(Transaction), [{
+            'from_user_id': CALLER.id, 'to_user_id': OTHER.id, 'guild_id': guild_id,
+            'amount': 100, 'transaction_type': 'transfer'
+        }])
+        await db.execute(insert(ServiceLevel), [
+            {'guild_id': guild_id, 'name': f"Уровень {n}", 'emoji': '⭐',
+             'required_balance': n * 5000, 'color': 0x7289DA, 'benefits': '[]'}
+            for n in range(1, 4)
+        ])
+        await db.execute(insert(MinecraftLink), [
+            {'guild_id': guild_id, 'user_id': user_id, 'minecraft_name': name, 'name_key': name.casefold(),
+             'minecraft_uuid': uuid, 'verified': verified}
+            for user_id, (name, uuid, verified) in LINKS.items()
+        ])
+        level_id = await db.scalar(select(ServiceLevel.id).filter(ServiceLevel.guild_id == guild_id).limit(1))
+        await db.commit()
+    return level_id
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='Show every scenario, not just the maximum')
+    args = parser.parse_args()
+
+    bot = FakeBot((CALLER, OTHER, NEWCOMER))
+    MINECRAFT['ONLINE_MODE'] = False
+    server = ServerStatus(STATUS_SERVER)
+    server.status, server.fetched_at = STATUS, time.monotonic()
+    statuses.servers = {STATUS_SERVER: server}
+    cogs = [Economy(bot), Admin(bot), Minecraft(bot)]
+    bot.cogs = {cog.qualified_name: cog for cog in cogs}
+    commands = [(cog, command) for cog in cogs for command in cog.walk_app_commands()]
+
+    failures = []
+    print(f"{'command':<16}{'queries':>9}{'budget':>8}{'sessions':>10}{'budget':>8}{'nested':>8}")
+    for index, (cog, command) in enumerate(commands):
+        name = command.qualified_name
+        guild_id = BUDGET_GUILD_BASE + index
+        level_id = await seed(guild_id)
+        budget = BUDGETS.get(name)
+        if budget is None:
+            failures.append(f"{name}: no entry in BUDGETS")
+            continue
+
+        worst = {'queries': 0, 'sessions': 0, 'nested': False}
+        for scenario, options in scenarios(level_id).get(name, [('default', {})]):
+            interaction = FakeInteraction(CALLER, guild_id)
+            try:
+                await run_command(cog, command, interaction, **options)
+            except Exception as e:
+                failures.append(f"{name} ({scenario}): raised {type(e).__name__}: {e}")
+                continue
+            trace = interaction.extras['trace']
+            worst['queries'] = max(worst['queries'], trace.queries)
+            worst['sessions'] = max(worst['sessions'], trace.sessions)
+            worst['nested'] |= trace.max_open_sessions > 1
+            if args.verbose:
+                print(f"  {name} ({scenario}): {trace.queries} queries, {trace.sessions} sessions")
+            for key in ('queries', 'sessions'):
+                if getattr(trace, key) > budget[key]:
+                    failures.append(f"{name} ({scenario}): {getattr(trace, key)} {key}, budget {budget[key]}")
+            if trace.max_open_sessions > 1:
+                failures.append(f"{name} ({scenario}): opened a session inside another")
+
+        print(f"{name:<16}{worst['queries']:>9}{budget['queries']:>8}{worst['sessions']:>10}"
+              f"{budget['sessions']:>8}{'yes' if worst['nested'] else '':>8}")
+
+    for name in BUDGETS.keys() - {command.qualified_name for _, command in commands}:
+        failures.append(f"{name}: in BUDGETS but not a command")
+
+    if failures:
+        print("\nBudget check failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll commands within budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
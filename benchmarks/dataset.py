@@ -0,0 +1,142 @@
+"""Synthetic large-guild dataset generator
+
+Bulk-loads guilds with COPY (asyncpg copy_records_to_table), shaped like our
+biggest servers:
+
+- guild sizes fall off like 1/rank: the first guild gets --profiles
+  profiles, the second half as many, and so on;
+- balances are log-normal around DEFAULT_BALANCE, so most users sit near the
+  starting balance and a few hold most of the money;
+- transactions favour a small active core of users and are spread over the
+  last --months months (their partitions are created first);
+- every guild gets --levels service levels.
+
+Existing rows of the generated guilds are deleted first.
+
+Usage: DATABASE_URL=... python -m benchmarks.dataset [--guilds 3] [--profiles 100000]
+           [--transactions-per-profile 20] [--months 12] [--first-guild-id 1000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, text
+from utils.config import DEFAULT_BALANCE
+from utils.database import async_engine, get_async_db, UserProfile, Transaction, ServiceLevel
+from utils.archive import ensure_partitions
+
+COPY_CHUNK = 50000  # Rows generated and sent per COPY
+
+
+def profile_rows(guild_id: int, profiles: int, now: datetime):
+    for user_id in range(1, profiles + 1):
+        balance = int(DEFAULT_BALANCE * random.lognormvariate(0, 1.5))
+        yield (user_id, guild_id, balance, now, now)
+
+
+def active_user(profiles: int) -> int:
+    # Cubing a uniform number skews towards low ids: ~20% of users make ~60% of transfers
+    return 1 + int(profiles * random.random() ** 3)
+
+
+def transaction_rows(guild_id: int, profiles: int, count: int, months: int, now: datetime):
+    span = timedelta(days=30 * months).total_seconds()
+    for _ in range(count):
+        sender = active_user(profiles)
+        recipient = active_user(profiles)
+        if recipient == sender:
+            recipient = recipient % profiles + 1
+        kind = 'transfer' if random.random() < 0.95 else 'admin_set'
+        created_at = now - timedelta(seconds=random.random() * span)
+        yield (sender, recipient, guild_id, random.randint(1, 500), kind, created_at)
+
+
+def level_rows(guild_id: int, levels: int):
+    for n in range(1, levels + 1):
+        benefits = json.dumps([f"Бонус {n}"], ensure_ascii=False)
+        yield (guild_id, f"Уровень {n}", '⭐', DEFAULT_BALANCE * 2 ** n, 0x7289DA, benefits)
+
+
+async def copy_rows(connection, table: str, columns, rows) -> int:
+    """COPY rows into table in chunks; returns the number of rows copied"""
+    copied = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= COPY_CHUNK:
+            await connection.copy_records_to_table(table, records=chunk, columns=columns)
+            copied += len(chunk)
+            chunk = []
+    if chunk:
+        await connection.copy_records_to_table(table, records=chunk, columns=columns)
+        copied += len(chunk)
+    return copied
+
+
+async def generate_guild(guild_id: int, profiles: int, transactions: int, months: int = 12, levels: int = 10):
+    """Replace guild_id's data with a synthetic dataset. Returns seconds spent loading"""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    async with get_async_db() as db:
+        await ensure_partitions(db, months_back=months)
+        for model in (Transaction, UserProfile, ServiceLevel):
+            await db.execute(delete(model).filter(model.guild_id == guild_id))
+        await db.commit()
+
+    async with async_engine.connect() as connection:
+        raw = (await connection.get_raw_connection()).driver_connection
+        await copy_rows(raw, 'user_profiles', ('user_id', 'guild_id', 'balance', 'created_at', 'updated_at'),
+                        profile_rows(guild_id, profiles, now))
+        await copy_rows(raw, 'service_levels',
+                        ('guild_id', 'name', 'emoji', 'required_balance', 'color', 'benefits'),
+                        level_rows(guild_id, levels))
+        await copy_rows(raw, 'transactions',
+                        ('from_user_id', 'to_user_id', 'guild_id', 'amount', 'transaction_type', 'created_at'),
+                        transaction_rows(guild_id, profiles, transactions, months, now))
+
+    return time.perf_counter() - started
+
+
+async def vacuum_analyze():
+    """Fresh statistics and visibility map, so plans match a settled production table"""
+    async with async_engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level='AUTOCOMMIT')
+        await connection.execute(text("VACUUM ANALYZE user_profiles, transactions, service_levels"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=3)
+    parser.add_argument('--profiles', type=int, default=100000, help='Profiles in the largest guild')
+    parser.add_argument('--transactions-per-profile', type=int, default=20)
+    parser.add_argument('--months', type=int, default=12, help='Months of transaction history')
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--first-guild-id', type=int, default=1000)
+    parser.add_argument('--seed', type=int, help='Random seed, for reproducible datasets')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    for rank in range(args.guilds):
+        guild_id = args.first_guild_id + rank
+        profiles = max(1, args.profiles // (rank + 1))
+        transactions = profiles * args.transactions_per_profile
+        elapsed = await generate_guild(guild_id, profiles, transactions, args.months, args.levels)
+        print(f"guild {guild_id}: {profiles:,} profiles, {transactions:,} transactions in {elapsed:.1f}s "
+              f"({(profiles + transactions) / elapsed:,.0f} rows/s)")
+
+    print("VACUUM ANALYZE...")
+    await vacuum_analyze()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,242 @@
+"""Stand-ins for the discord.py objects the cogs touch, so commands run without Discord
+
+The cogs only use a small surface of discord.Interaction: user, guild_id,
+command, extras and the response/followup senders. FakeInteraction provides
+that, records what the command sent, and run_command() invokes a cog's app
+command the way the command tree does (cog interaction_check first, which also
+starts the CommandTrace that counts SQL statements, then the command's checks).
+"""
+import asyncio
+import copy
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+
+import discord
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class FakeRole:
+    def __init__(self, role_id: int, permissions: discord.Permissions):
+        self.id = role_id
+        self.permissions = permissions
+
+
+# Passes every has_command_permission check
+ADMIN_ROLE = FakeRole(1, discord.Permissions(administrator=True))
+
+
+class FakeUser:
+    """discord.Member / discord.User stand-in"""
+
+    def __init__(self, user_id: int, name: str = None, bot: bool = False, roles=()):
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.bot = bot
+        self.roles = list(roles)
+        self.guild = None
+
+    def __str__(self):
+        return self.name
+
+    def member_of(self, guild):
+        """The user as a member of guild, like interaction.user in a guild"""
+        member = copy.copy(self)
+        member.guild = guild
+        return member
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.owner_id = None
+        self.roles = []
+        self.members = []
+
+    def get_member(self, user_id: int):
+        return next((member for member in self.members if member.id == user_id), None)
+
+    async def query_members(self, query=None, *, limit=5, user_ids=None, cache=True, **kwargs):
+        # Users the fake gateway knows are the ones in self.members
+        if user_ids is not None:
+            return [member for member in self.members if member.id in user_ids][:limit]
+        return [member for member in self.members if member.name.lower().startswith(query.lower())][:limit]
+
+
+class FakeResponse:
+    """discord.InteractionResponse stand-in that records the messages sent"""
+
+    def __init__(self):
+        self.messages = []
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self.messages.append((None, kwargs))
+        self._done = True
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+
+class FakeInteraction:
+    """discord.Interaction stand-in"""
+
+    def __init__(self, user: FakeUser, guild_id: int, command=None):
+        self.guild_id = guild_id
+        self.guild = FakeGuild(guild_id)
+        self.user = user.member_of(self.guild)
+        self.command = command
+        self.extras = {}
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        self.response.messages.append((None, kwargs))
+
+    @property
+    def failed(self) -> bool:
+        """The command answered with an error message (or not at all)"""
+        if not self.response.messages:
+            return True
+        content = self.response.messages[0][0]
+        return isinstance(content, str) and content.startswith('❌')
+
+
+class FakeBot:
+    """commands.Bot stand-in: user cache and cog lookup"""
+
+    def __init__(self, users=()):
+        self.users = {user.id: user for user in users}
+        self.cogs = {}
+        self.latency = 0.0
+
+    def get_user(self, user_id: int):
+        return self.users.get(user_id)
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+
+async def run_command(cog, command, interaction: FakeInteraction, /, **options):
+    """Invoke an app command like the command tree does: checks, then the callback.
+
+    Returns (seconds, SQL statements) for the invocation, checks included. The
+    parameters are positional-only, so a command can have an option named `command`.
+    """
+    interaction.command = command
+    await cog.interaction_check(interaction)
+    trace = interaction.extras.get('trace')
+    started = time.perf_counter()
+    for check in command.checks:
+        if not await discord.utils.maybe_coroutine(check, interaction):
+            break  # has_command_permission has already answered with the error
+    else:
+        await command.callback(cog, interaction, **options)
+    return time.perf_counter() - started, trace.queries if trace else 0
+
+
+async def bench_command(cog, command, make_invocation, guild_id: int, invocations: int, concurrency: int) -> dict:
+    """Run a command `invocations` times from `concurrency` workers and summarize.
+
+    make_invocation() returns (user, options) for one invocation.
+    """
+    latencies, queries = [], []
+    errors = 0
+    remaining = iter(range(invocations))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            user, options = make_invocation()
+            interaction = FakeInteraction(user, guild_id)
+            elapsed, statements = await run_command(cog, command, interaction, **options)
+            latencies.append(elapsed)
+            queries.append(statements)
+            errors += interaction.failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries, errors: int, wall_time: float) -> dict:
+    """JSON-ready statistics for one command's invocations"""
+    return {
+        'invocations': len(latencies),
+        'errors': errors,
+        'ops_per_sec': round(len(latencies) / wall_time, 1) if wall_time else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def print_results(commands: dict, baseline: dict = None):
+    """Table of summarize() results per command, with the change against a baseline's"""
+    print(f"{'command':<16}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}")
+    for name, stats in commands.items():
+        print(f"{name:<16}{stats['ops_per_sec']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['queries_mean']:>9}{stats['errors']:>8}")
+        before = (baseline or {}).get(name)
+        if before:
+            def change(key):
+                return f"{(stats[key] - before[key]) / before[key] * 100:+.0f}%" if before[key] else 'n/a'
+            print(f"{'  vs base':<16}{change('ops_per_sec'):>10}{change('p50_ms'):>10}{change('p95_ms'):>10}"
+                  f"{change('p99_ms'):>10}{stats['queries_mean'] - before['queries_mean']:>+9.2f}")
+
+
+def save_results(results: dict, output: str = None) -> str:
+    """Write results as JSON, by default to benchmarks/results/<benchmark>-<time>.json"""
+    output = output or os.path.join(
+        RESULTS_DIR, f"{results['benchmark']}-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as result_file:
+        json.dump(results, result_file, indent=2)
+    return output
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding='utf-8') as result_file:
+        return json.load(result_file)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
@@ -0,0 +1,129 @@
+"""Concurrency stress test for utils.transfers.transfer_funds
+
+Seeds a throwaway guild with N accounts plus K "virtual" accounts that have
+no row yet (they hold DEFAULT_BALANCE until their first transfer), fires many
+concurrent random transfers (deliberately including many from the same few
+senders), then checks the invariants: no negative balances, total money
+conserved and one transaction row per successful transfer. Reports
+transfers/sec.
+
+Usage: DATABASE_URL=... python -m benchmarks.stress_transfers [--transfers 5000]
+Set LEDGER_WRITE_BEHIND=1 to measure the write-behind ledger mode.
+Exits with status 1 if an invariant is violated.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import delete, func, insert, select
+from utils.config import DEFAULT_BALANCE, LEDGER
+from utils.database import get_async_db, UserProfile, Transaction
+from utils.transfers import transfer_funds
+from utils.ledger import ledger
+
+STRESS_GUILD_ID = 2
+
+
+async def seed(accounts: int, balance: int):
+    """Reset the stress guild and create `accounts` profiles"""
+    async with get_async_db() as db:
+        await db.execute(delete(Transaction).filter(Transaction.guild_id == STRESS_GUILD_ID))
+        await db.execute(delete(UserProfile).filter(UserProfile.guild_id == STRESS_GUILD_ID))
+        await db.execute(insert(UserProfile), [
+            {'user_id': user_id, 'guild_id': STRESS_GUILD_ID, 'balance': balance}
+            for user_id in range(1, accounts + 1)
+        ])
+        await db.commit()
+
+
+async def check_invariants(accounts: int, virtual_accounts: int, balance: int, succeeded: int) -> bool:
+    async with get_async_db() as db:
+        total, lowest, count = (await db.execute(select(
+            func.sum(UserProfile.balance), func.min(UserProfile.balance), func.count()
+        ).filter(UserProfile.guild_id == STRESS_GUILD_ID))).one()
+        recorded = await db.scalar(select(func.count()).select_from(Transaction).filter(
+            Transaction.guild_id == STRESS_GUILD_ID
+        ))
+
+    # Virtual accounts that never got a row still hold DEFAULT_BALANCE
+    total += (accounts + virtual_accounts - count) * DEFAULT_BALANCE
+    expected = accounts * balance + virtual_accounts * DEFAULT_BALANCE
+
+    ok = True
+    if lowest < 0:
+        print(f"FAIL: overdraft, lowest balance is {lowest}")
+        ok = False
+    if count > accounts + virtual_accounts or total != expected:
+        print(f"FAIL: money not conserved, accounts hold {total} (expected {expected})")
+        ok = False
+    if recorded != succeeded:
+        print(f"FAIL: {recorded} transaction rows for {succeeded} successful transfers")
+        ok = False
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--virtual-accounts', type=int, default=10,
+                        help='Extra accounts without a row, opened by their first transfer')
+    parser.add_argument('--balance', type=int, default=100)
+    parser.add_argument('--transfers', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=15)
+    args = parser.parse_args()
+
+    await seed(args.accounts, args.balance)
+
+    # A few hot senders so many transfers race on the same row, including the
+    # first transfers of virtual accounts racing to create their row
+    total_accounts = args.accounts + args.virtual_accounts
+    hot_senders = list(range(1, min(5, args.accounts) + 1)) + list(range(args.accounts + 1, total_accounts + 1))
+    queue = asyncio.Queue()
+    for _ in range(args.transfers):
+        sender = random.choice(hot_senders) if random.random() < 0.5 else random.randint(1, total_accounts)
+        recipient = random.randint(1, total_accounts)
+        while recipient == sender:
+            recipient = random.randint(1, total_accounts)
+        queue.put_nowait((sender, recipient, random.randint(1, args.balance)))
+
+    succeeded = 0
+    rejected = 0
+
+    async def worker():
+        nonlocal succeeded, rejected
+        while not queue.empty():
+            sender, recipient, amount = queue.get_nowait()
+            async with get_async_db() as db:
+                result = await transfer_funds(db, STRESS_GUILD_ID, sender, recipient, amount)
+            if result is None:
+                rejected += 1
+            else:
+                succeeded += 1
+
+    if LEDGER['WRITE_BEHIND']:
+        await ledger.start()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    if LEDGER['WRITE_BEHIND']:
+        await ledger.close()
+        print(f"write-behind ledger: {ledger.stats()}")
+
+    print(f"{args.transfers} transfers in {elapsed:.2f}s: {args.transfers / elapsed:,.0f} transfers/sec")
+    print(f"succeeded {succeeded}, rejected for insufficient funds {rejected}")
+
+    if not await check_invariants(args.accounts, args.virtual_accounts, args.balance, succeeded):
+        sys.exit(1)
+    print("OK: no overdrafts, money conserved, ledger complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,20 +1,70 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils.config import DEFAULT_BALANCE, ERRORS, CURRENCY
-from utils.permissions import has_command_permission
-from utils.database import get_db, UserProfile, ServiceLevel, Transaction
-from sqlalchemy import desc
+from utils.config import ERRORS
+from utils.permissions import (
+    has_command_permission, get_user_permission_level, get_command_levels, get_command_permission,
+    set_command_level, permission_command, permission_cache, MAX_LEVEL
+)
+from utils.leaderboard import note_profile_created
+from utils.ranking import record_balance
+from utils.levels import invalidate_levels
+from utils.accounts import set_balance
+from utils.settings import guild_settings, update_guild_settings, validate_format
+from utils.ledger import record_transaction, commit_with_ledger
+from utils.database import get_async_db, ServiceLevel
+from utils.metrics import InstrumentedCog
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 import json
-import sys
+import logging
 
-class Admin(commands.Cog):
+log = logging.getLogger(__name__)
+
+# /help sections, by cog
+HELP_CATEGORIES = {
+    'Economy': "💰 Экономика",
+    'Admin': "⚙️ Администрирование",
+    'Minecraft': "⛏ Minecraft",
+}
+HELP_FIELD_MAX = 1024  # Characters in an embed field value
+
+
+class Admin(InstrumentedCog):
     """Admin commands implementation"""
 
     def __init__(self, bot):
         self.bot = bot
-        print("Admin cog initialized")
+        log.info("Admin cog initialized")
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        permission_cache.invalidate_guild(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.permissions != after.permissions:
+            permission_cache.invalidate_guild(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        permission_cache.invalidate_guild(role.guild.id)
+
+    def command_names(self) -> set:
+        return {
+            command.qualified_name
+            for cog in self.bot.cogs.values()
+            for command in cog.walk_app_commands()
+        }
+
+    def gated_command_names(self) -> set:
+        """Commands behind has_command_permission, the only ones whose level can be changed"""
+        return {
+            command.qualified_name
+            for cog in self.bot.cogs.values()
+            for command in cog.walk_app_commands()
+            if permission_command(command)
+        }
 
     @app_commands.command(
         name='add_level',
@@ -38,7 +88,7 @@ class Admin(commands.Cog):
         benefits: str = ""
     ):
         """Add new service level"""
-        print(f"Add level command called by {interaction.user.name}")
+        log.info("Add level command called", extra={'sampled': True})
 
         try:
             color_int = int(color.replace('#', ''), 16)
@@ -52,12 +102,12 @@ class Admin(commands.Cog):
         benefits_list = [b.strip() for b in benefits.split(',')] if benefits else ["Базовый уровень"]
 
         try:
-            with get_db() as db:
+            async with get_async_db() as db:
                 # Проверяем, существует ли уже уровень с таким названием для этого сервера
-                existing_level = db.query(ServiceLevel).filter(
+                existing_level = await db.scalar(select(ServiceLevel).filter(
                     ServiceLevel.guild_id == interaction.guild_id,
                     ServiceLevel.name == name
-                ).first()
+                ))
 
                 if existing_level:
                     await interaction.response.send_message(
@@ -75,7 +125,8 @@ class Admin(commands.Cog):
                     benefits=json.dumps(benefits_list)
                 )
                 db.add(new_level)
-                db.commit()
+                await db.commit()
+                invalidate_levels(interaction.guild_id)
 
                 embed = discord.Embed(
                     title="✅ Уровень добавлен",
@@ -86,7 +137,7 @@ class Admin(commands.Cog):
                 if required_balance > 0:
                     embed.add_field(
                         name="Требуемый баланс",
-                        value=f"{required_balance:,} {CURRENCY['NAME']}",
+                        value=guild_settings.get(interaction.guild_id).format_amount(required_balance),
                         inline=True
                     )
                 else:
@@ -102,14 +153,14 @@ class Admin(commands.Cog):
                 )
 
                 await interaction.response.send_message(embed=embed)
-        except SQLAlchemyError as e:
-            print(f"Database error in add_level: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in add_level")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при добавлении уровня",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in add_level: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in add_level")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -139,14 +190,14 @@ class Admin(commands.Cog):
         benefits: str = None
     ):
         """Edit existing service level"""
-        print(f"Edit level command called by {interaction.user.name} for level {level_id}")
+        log.info("Edit level command called", extra={'sampled': True, 'data': {'level_id': level_id}})
 
         try:
-            with get_db() as db:
-                level = db.query(ServiceLevel).filter_by(
+            async with get_async_db() as db:
+                level = await db.scalar(select(ServiceLevel).filter_by(
                     id=level_id,
                     guild_id=interaction.guild_id
-                ).first()
+                ))
 
                 if not level:
                     await interaction.response.send_message(
@@ -161,11 +212,11 @@ class Admin(commands.Cog):
                     level.emoji = emoji
                 if required_balance >= 0: #Allowing 0 as a valid value
                     # Проверяем, не конфликтует ли новый required_balance с другими уровнями
-                    existing_level = db.query(ServiceLevel).filter(
+                    existing_level = await db.scalar(select(ServiceLevel).filter(
                         ServiceLevel.guild_id == interaction.guild_id,
                         ServiceLevel.required_balance == required_balance,
                         ServiceLevel.id != level_id
-                    ).first()
+                    ))
 
                     if existing_level:
                         await interaction.response.send_message(
@@ -189,7 +240,8 @@ class Admin(commands.Cog):
                 if benefits is not None: #Handle None value for benefits
                     level.benefits = json.dumps([b.strip() for b in benefits.split(',')])
 
-                db.commit()
+                await db.commit()
+                invalidate_levels(interaction.guild_id)
 
                 embed = discord.Embed(
                     title="✅ Уровень обновлен",
@@ -203,7 +255,7 @@ class Admin(commands.Cog):
                 )
                 embed.add_field(
                     name="Требуемый баланс",
-                    value=f"{level.required_balance:,} {CURRENCY['NAME']}",
+                    value=guild_settings.get(interaction.guild_id).format_amount(level.required_balance),
                     inline=True
                 )
                 embed.add_field(
@@ -213,14 +265,14 @@ class Admin(commands.Cog):
                 )
 
                 await interaction.response.send_message(embed=embed)
-        except SQLAlchemyError as e:
-            print(f"Database error in edit_level: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in edit_level")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при редактировании уровня",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in edit_level: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in edit_level")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -239,14 +291,14 @@ class Admin(commands.Cog):
         level_id: int
     ):
         """Remove service level"""
-        print(f"Remove level command called by {interaction.user.name} for level {level_id}")
+        log.info("Remove level command called", extra={'sampled': True, 'data': {'level_id': level_id}})
 
         try:
-            with get_db() as db:
-                level = db.query(ServiceLevel).filter_by(
+            async with get_async_db() as db:
+                level = await db.scalar(select(ServiceLevel).filter_by(
                     id=level_id,
                     guild_id=interaction.guild_id
-                ).first()
+                ))
 
                 if not level:
                     await interaction.response.send_message(
@@ -255,20 +307,21 @@ class Admin(commands.Cog):
                     )
                     return
 
-                db.delete(level)
-                db.commit()
+                await db.delete(level)
+                await db.commit()
+                invalidate_levels(interaction.guild_id)
 
                 await interaction.response.send_message(
                     f"✅ Уровень {level.emoji} {level.name} успешно удален"
                 )
-        except SQLAlchemyError as e:
-            print(f"Database error in remove_level: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in remove_level")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при удалении уровня",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in remove_level: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in remove_level")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -298,58 +351,48 @@ class Admin(commands.Cog):
             return
 
         try:
-            with get_db() as db:
-                profile = db.query(UserProfile).filter(
-                    UserProfile.user_id == user.id,
-                    UserProfile.guild_id == interaction.guild_id
-                ).first()
-
-                if not profile:
-                    profile = UserProfile(
-                        user_id=user.id,
-                        guild_id=interaction.guild_id,
-                        balance=amount
-                    )
-                    db.add(profile)
-                else:
-                    old_balance = profile.balance
-                    profile.balance = amount
+            async with get_async_db() as db:
+                old_balance, created = await set_balance(db, interaction.guild_id, user.id, amount)
 
                 # Record transaction
-                transaction = Transaction(
+                record_transaction(
+                    db,
                     from_user_id=interaction.user.id,
                     to_user_id=user.id,
                     guild_id=interaction.guild_id,
                     amount=amount - old_balance,
                     transaction_type='admin_set'
                 )
-                db.add(transaction)
-                db.commit()
+                await commit_with_ledger(db)
+                if created:
+                    note_profile_created(interaction.guild_id)
+                record_balance(interaction.guild_id, user.id, amount)
 
+                settings = guild_settings.get(interaction.guild_id)
                 embed = discord.Embed(title="Изменение баланса", color=discord.Color.blue())
                 embed.add_field(name="Пользователь", value=user.name, inline=True)
                 embed.add_field(
                     name="Старый баланс",
-                    value=f"{CURRENCY['SYMBOL']} {old_balance:,} {CURRENCY['NAME']}",
+                    value=settings.format_balance(old_balance),
                     inline=True
                 )
                 embed.add_field(
                     name="Новый баланс",
-                    value=f"{CURRENCY['SYMBOL']} {amount:,} {CURRENCY['NAME']}",
+                    value=settings.format_balance(amount),
                     inline=True
                 )
                 embed.set_footer(text=f"Изменено администратором: {interaction.user.name}")
 
                 await interaction.response.send_message(embed=embed)
 
-        except SQLAlchemyError as e:
-            print(f"Database error in set_balance: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in set_balance")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при изменении баланса",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in set_balance: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in set_balance")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -362,21 +405,28 @@ class Admin(commands.Cog):
     )
     @app_commands.describe(
         name='Название валюты',
-        symbol='Символ валюты (эмодзи)'
+        symbol='Символ валюты (эмодзи)',
+        format='Формат суммы, например {amount:,} {currency}'
     )
     @has_command_permission('set_currency')
     async def set_currency(
         self,
         interaction: discord.Interaction,
-        name: str,
-        symbol: str
+        name: app_commands.Range[str, 1, 32],
+        symbol: app_commands.Range[str, 1, 64],
+        format: app_commands.Range[str, 1, 64] = None
     ):
-        """Change currency settings"""
+        """Change the server's currency settings"""
+        if format is not None and not validate_format(format):
+            await interaction.response.send_message(ERRORS['INVALID_CURRENCY_FORMAT'], ephemeral=True)
+            return
+
+        values = {'currency_name': name, 'currency_symbol': symbol}
+        if format is not None:
+            values['currency_format'] = format
         try:
-            with get_db() as db:
-                CURRENCY['NAME'] = name
-                CURRENCY['SYMBOL'] = symbol
-                db.commit()
+            async with get_async_db() as db:
+                settings = await update_guild_settings(db, interaction.guild_id, **values)
 
                 embed = discord.Embed(
                     title="Настройки валюты обновлены",
@@ -384,17 +434,18 @@ class Admin(commands.Cog):
                 )
                 embed.add_field(name="Новое название", value=name, inline=True)
                 embed.add_field(name="Новый символ", value=symbol, inline=True)
+                embed.add_field(name="Пример", value=settings.format_balance(1000), inline=True)
                 embed.set_footer(text=f"Изменено администратором: {interaction.user.name}")
 
                 await interaction.response.send_message(embed=embed)
-        except SQLAlchemyError as e:
-            print(f"Database error in set_currency: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in set_currency")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при изменении настроек валюты",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in set_currency: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in set_currency")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -413,7 +464,7 @@ class Admin(commands.Cog):
     ):
         """Reset user balance to default (admin only)"""
         try:
-            with get_db() as db:
+            async with get_async_db() as db:
                 economy_cog = self.bot.get_cog('Economy')
                 if not economy_cog:
                     await interaction.response.send_message(
@@ -422,54 +473,192 @@ class Admin(commands.Cog):
                     )
                     return
 
-                profile = db.query(UserProfile).filter(
-                    UserProfile.user_id == user.id,
-                    UserProfile.guild_id == interaction.guild_id
-                ).first()
-                old_balance = profile.balance if profile else 0
-                if profile:
-                    profile.balance = DEFAULT_BALANCE
-                    db.commit()
-                else:
-                    profile = UserProfile(user_id=user.id,guild_id=interaction.guild_id,balance=DEFAULT_BALANCE)
-                    db.add(profile)
-                    db.commit()
+                settings = guild_settings.get(interaction.guild_id)
+                old_balance, created = await set_balance(db, interaction.guild_id, user.id, settings.default_balance)
+                await db.commit()
+                if created:
+                    note_profile_created(interaction.guild_id)
+                record_balance(interaction.guild_id, user.id, settings.default_balance)
 
 
                 embed = discord.Embed(title="Сброс баланса", color=discord.Color.orange())
                 embed.add_field(name="Пользователь", value=user.name, inline=True)
                 embed.add_field(
                     name="Старый баланс",
-                    value=CURRENCY['FORMAT'].format(
-                        amount=old_balance,
-                        currency=CURRENCY['NAME']
-                    ),
+                    value=settings.format_amount(old_balance),
                     inline=True
                 )
                 embed.add_field(
                     name="Новый баланс",
-                    value=CURRENCY['FORMAT'].format(
-                        amount=DEFAULT_BALANCE,
-                        currency=CURRENCY['NAME']
-                    ),
+                    value=settings.format_amount(settings.default_balance),
                     inline=True
                 )
                 embed.set_footer(text=f"Сброшено администратором: {interaction.user.name}")
 
                 await interaction.response.send_message(embed=embed)
-        except SQLAlchemyError as e:
-            print(f"Database error in reset_balance: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in reset_balance")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при сбросе баланса",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in reset_balance: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in reset_balance")
+            await interaction.response.send_message(
+                "❌ Произошла неожиданная ошибка",
+                ephemeral=True
+            )
+
+    @app_commands.command(
+        name='server_settings',
+        description='Показать или изменить настройки сервера (для администраторов)'
+    )
+    @app_commands.describe(
+        default_balance='Начальный баланс новых пользователей',
+        leaderboard_size='Количество пользователей в /top'
+    )
+    @has_command_permission('server_settings')
+    async def server_settings(
+        self,
+        interaction: discord.Interaction,
+        default_balance: app_commands.Range[int, 0, None] = None,
+        leaderboard_size: app_commands.Range[int, 1, 25] = None
+    ):
+        """Show the server's settings, changing the given ones first"""
+        values = {
+            column: value
+            for column, value in (('default_balance', default_balance), ('leaderboard_size', leaderboard_size))
+            if value is not None
+        }
+        try:
+            if values:
+                async with get_async_db() as db:
+                    settings = await update_guild_settings(db, interaction.guild_id, **values)
+            else:
+                settings = guild_settings.get(interaction.guild_id)
+
+            embed = discord.Embed(
+                title="Настройки сервера обновлены" if values else "Настройки сервера",
+                color=discord.Color.green() if values else discord.Color.blue()
+            )
+            embed.add_field(name="Валюта", value=f"{settings.currency_symbol} {settings.currency_name}", inline=True)
+            embed.add_field(name="Формат", value=f"`{settings.currency_format}`", inline=True)
+            embed.add_field(name="Начальный баланс", value=settings.format_amount(settings.default_balance), inline=True)
+            embed.add_field(name="Размер /top", value=str(settings.leaderboard_size), inline=True)
+            if default_balance is not None:
+                # Accounts without a row read as the default balance (utils/accounts.py)
+                embed.description = (
+                    "⚠️ Баланс участников, у которых еще не было операций по счету, "
+                    "теперь тоже равен новому начальному балансу"
+                )
+            if values:
+                embed.set_footer(text=f"Изменено администратором: {interaction.user.name}")
+
+            await interaction.response.send_message(embed=embed)
+        except SQLAlchemyError:
+            log.exception("Database error in server_settings")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при изменении настроек сервера",
+                ephemeral=True
+            )
+        except Exception:
+            log.exception("Unexpected error in server_settings")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
             )
 
+    @app_commands.command(
+        name='get_permission',
+        description='Показать уровень доступа для команды'
+    )
+    @app_commands.describe(command='Название команды')
+    @has_command_permission('get_permission')
+    async def get_permission(self, interaction: discord.Interaction, command: str):
+        """Show the level a command requires in this guild"""
+        if command not in self.command_names():
+            await interaction.response.send_message(ERRORS['COMMAND_NOT_FOUND'], ephemeral=True)
+            return
+        if command not in self.gated_command_names():
+            await interaction.response.send_message(
+                f"🔓 **/{command}**: доступна всем (уровень доступа не настраивается)",
+                ephemeral=True
+            )
+            return
+
+        try:
+            async with get_async_db() as db:
+                perm = get_command_permission(await get_command_levels(db, interaction.guild_id), command)
+        except SQLAlchemyError:
+            log.exception("Database error in get_permission")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при получении прав доступа",
+                ephemeral=True
+            )
+            return
+
+        source = "настроено на сервере" if perm['overridden'] else "по умолчанию"
+        await interaction.response.send_message(
+            f"🔐 **/{command}**: уровень {perm['level']} ({source})",
+            ephemeral=True
+        )
+
+    @app_commands.command(
+        name='set_permission',
+        description='Изменить уровень доступа для команды (для администраторов)'
+    )
+    @app_commands.describe(
+        command='Название команды',
+        level='Уровень: 0 - все, 1 - помощники, 2 - модераторы, 3 - администраторы'
+    )
+    @has_command_permission('set_permission')
+    async def set_permission(
+        self,
+        interaction: discord.Interaction,
+        command: str,
+        level: app_commands.Range[int, 0, MAX_LEVEL]
+    ):
+        """Override the level a command requires in this guild"""
+        if command not in self.command_names():
+            await interaction.response.send_message(ERRORS['COMMAND_NOT_FOUND'], ephemeral=True)
+            return
+        if command not in self.gated_command_names():
+            await interaction.response.send_message(ERRORS['PERMISSION_NOT_CONFIGURABLE'], ephemeral=True)
+            return
+        if command == 'set_permission' and level < MAX_LEVEL:
+            await interaction.response.send_message(ERRORS['INVALID_PERMISSION_LEVEL'], ephemeral=True)
+            return
+
+        try:
+            async with get_async_db() as db:
+                await set_command_level(db, interaction.guild_id, command, level)
+        except SQLAlchemyError:
+            log.exception("Database error in set_permission")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при изменении прав доступа",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message(
+            f"✅ Для **/{command}** теперь нужен уровень {level}",
+            ephemeral=True
+        )
+
+    @get_permission.autocomplete('command')
+    async def command_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in sorted(self.command_names()) if current.lower() in name
+        ][:25]
+
+    @set_permission.autocomplete('command')
+    async def gated_command_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in sorted(self.gated_command_names()) if current.lower() in name
+        ][:25]
+
     @app_commands.command(
         name='help',
         description='Показать список всех доступных команд'
@@ -478,9 +667,10 @@ class Admin(commands.Cog):
     async def help_command(self, interaction: discord.Interaction):
         """Show all available commands with their descriptions"""
         try:
-            with get_db() as db:
-                user_level = get_user_permission_level(interaction.user,db)
-                print(f"Help command called by {interaction.user.name} with permission level {user_level}")
+            async with get_async_db() as db:
+                user_level = get_user_permission_level(interaction.user)
+                levels = await get_command_levels(db, interaction.guild_id)
+                log.info("Help command called", extra={'sampled': True, 'data': {'permission_level': user_level}})
 
                 embed = discord.Embed(
                     title="📚 Справка по командам",
@@ -488,50 +678,37 @@ class Admin(commands.Cog):
                     color=discord.Color.blue()
                 )
 
-                # Group commands by category
-                categories = {
-                    "💰 Экономика": [
-                        ('balance', 'Показать баланс вашего счета'),
-                        ('send', 'Перевести монеты другому пользователю'),
-                        ('top', 'Показать список богатейших пользователей'),
-                        ('level', 'Информация об уровнях обслуживания')
-                    ],
-                    "⚙️ Администрирование": [
-                        ('admin_set', 'Установить баланс пользователя'),
-                        ('admin_reset', 'Сбросить баланс пользователя'),
-                        ('set_currency', 'Изменить настройки валюты'),
-                        ('get_permission', 'Показать права доступа для команды'),
-                        ('add_level', 'Добавить новый уровень обслуживания'),
-                        ('edit_level', 'Редактировать существующий уровень'),
-                        ('remove_level', 'Удалить уровень обслуживания')
-                    ]
-                }
-
-                for category, commands in categories.items():
+                for cog in self.bot.cogs.values():
+                    lines = []
+                    for command in cog.walk_app_commands():
+                        required = 0
+                        if permission_command(command):
+                            required = get_command_permission(levels, command.qualified_name)['level']
+                        if user_level >= required:
+                            level_str = f" (Уровень {required})" if required > 0 else ""
+                            lines.append(f"**/{command.qualified_name}**{level_str}\n{command.description}\n\n")
+
+                    # Long sections continue in further fields
+                    category = HELP_CATEGORIES.get(cog.qualified_name, cog.qualified_name)
                     field_value = ""
-                    for cmd_name, desc in commands:
-                        perm = get_command_permission(cmd_name)
-                        if user_level >= perm['level']:
-                            level_str = f"(Уровень {perm['level']})" if perm['level'] > 0 else ""
-                            field_value += f"**/{cmd_name}** {level_str}\n{desc}\n\n"
-
+                    for line in lines:
+                        if len(field_value) + len(line) > HELP_FIELD_MAX:
+                            embed.add_field(name=category, value=field_value, inline=False)
+                            category, field_value = "\u200b", ""
+                        field_value += line
                     if field_value:
-                        embed.add_field(
-                            name=category,
-                            value=field_value,
-                            inline=False
-                        )
+                        embed.add_field(name=category, value=field_value, inline=False)
 
                 embed.set_footer(text=f"Ваш уровень доступа: {user_level}")
                 await interaction.response.send_message(embed=embed)
-        except SQLAlchemyError as e:
-            print(f"Database error in help_command: {str(e)}", file=sys.stderr)
+        except SQLAlchemyError:
+            log.exception("Database error in help_command")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при отображении справки",
                 ephemeral=True
             )
-        except Exception as e:
-            print(f"Unexpected error in help_command: {str(e)}", file=sys.stderr)
+        except Exception:
+            log.exception("Unexpected error in help_command")
             await interaction.response.send_message(
                 "❌ Произошла неожиданная ошибка",
                 ephemeral=True
@@ -539,4 +716,4 @@ class Admin(commands.Cog):
 
 async def setup(bot):
     await bot.add_cog(Admin(bot))
-    print("Admin cog setup complete")
\ No newline at end of file
+    log.info("Admin cog setup complete")
\ No newline at end of file
@@ -1,82 +1,152 @@
 import discord
-from discord.ext import commands
 from discord import app_commands
-from utils.config import DEFAULT_BALANCE, ERRORS, CURRENCY, DEFAULT_COLOR
-from utils.database import get_db, UserProfile, Transaction, ServiceLevel
-from sqlalchemy import desc
+from utils.config import ERRORS, DEFAULT_COLOR, LEADERBOARD, RANKING, LEDGER, HISTORY
+from utils.database import get_async_db, UserProfile
+from utils.transfers import transfer_funds
+from utils.leaderboard import iter_top_profiles, count_profiles
+from utils.ranking import get_ranking, record_balance
+from utils.levels import get_guild_levels
+from utils.ledger import ledger
+from utils.archive import maintenance_loop
+from utils.history import fetch_history_page
+from utils.members import resolve_names
+from utils.settings import guild_settings
+from utils.metrics import InstrumentedCog
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
-import json
-import sys
+from datetime import timezone
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+class HistoryView(discord.ui.View):
+    """Newer/Older buttons for a /history statement; only its owner can page"""
+
+    def __init__(self, cog, interaction: discord.Interaction, user: discord.abc.User, page):
+        super().__init__(timeout=HISTORY['TIMEOUT'])
+        self.cog = cog
+        self.interaction = interaction
+        self.user = user
+        self.page = page
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.newer.disabled = not self.page.has_newer
+        self.older.disabled = not self.page.has_older
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.interaction.user.id:
+            await interaction.response.send_message(ERRORS['NO_PERMISSION'], ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction: discord.Interaction, **cursor):
+        try:
+            async with get_async_db() as db:
+                page = await fetch_history_page(
+                    db, interaction.guild_id, self.user.id, HISTORY['PAGE_SIZE'], **cursor
+                )
+        except SQLAlchemyError:
+            log.exception("Database error in history paging")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при получении истории",
+                ephemeral=True
+            )
+            return
+
+        # Rows can disappear under the cursor when their month is archived; stay on this page
+        if page.rows:
+            self.page = page
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.cog.history_embed(self.user, self.page, interaction.guild_id), view=self)
+
+    @discord.ui.button(label='◀ Новее', style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, newer_than=self.page.first_key)
+
+    @discord.ui.button(label='Старше ▶', style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, older_than=self.page.last_key)
 
-class Economy(commands.Cog):
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.interaction.edit_original_response(view=self)
+        except discord.HTTPException:
+            pass
+
+
+class Economy(InstrumentedCog):
     """Economy system implementation"""
 
     def __init__(self, bot):
         self.bot = bot
-        print("Economy cog initialized")
-
-    def get_balance(self, user_id: int, guild_id: int) -> int:
-        """Get user balance for specific server, initialize if doesn't exist"""
+        log.info("Economy cog initialized")
+
+    async def cog_load(self):
+        """Start the write-behind ledger flusher if that mode is enabled, partition maintenance and settings refresh"""
+        if LEDGER['WRITE_BEHIND']:
+            await ledger.start()
+            log.info("Write-behind ledger started")
+        self.maintenance_task = asyncio.create_task(maintenance_loop())
+        self.settings_task = asyncio.create_task(guild_settings.refresh_loop())
+
+    async def cog_unload(self):
+        """Flush queued Transaction rows before the bot shuts down"""
+        self.maintenance_task.cancel()
+        self.settings_task.cancel()
+        if LEDGER['WRITE_BEHIND']:
+            await ledger.close()
+            log.info("Write-behind ledger flushed", extra={'data': ledger.stats()})
+
+    async def get_balance(self, user_id: int, guild_id: int) -> int:
+        """Get user balance for specific server. Users without a profile read as the guild's default balance"""
+        default_balance = guild_settings.get(guild_id).default_balance
         if not guild_id:
-            print(f"Warning: get_balance called without guild_id for user {user_id}", file=sys.stderr)
-            return DEFAULT_BALANCE
+            log.warning("get_balance called without guild_id", extra={'data': {'user_id': user_id}})
+            return default_balance
 
         try:
-            with get_db() as db:
-                profile = db.query(UserProfile).filter(
+            # Read-only: the profile row is created by the first balance change, not by lookups
+            async with get_async_db() as db:
+                balance = await db.scalar(select(UserProfile.balance).filter(
                     UserProfile.user_id == user_id,
                     UserProfile.guild_id == guild_id
-                ).first()
+                ))
 
-                if not profile:
-                    profile = UserProfile(
-                        user_id=user_id,
-                        guild_id=guild_id,
-                        balance=DEFAULT_BALANCE
-                    )
-                    db.add(profile)
-                    db.commit()
-                    print(f"Created new profile for user {user_id} in guild {guild_id}")
+                return default_balance if balance is None else balance
+        except SQLAlchemyError:
+            log.exception("Database error in get_balance")
+            return default_balance
 
-                return profile.balance
-        except SQLAlchemyError as e:
-            print(f"Database error in get_balance: {str(e)}", file=sys.stderr)
-            return DEFAULT_BALANCE
-
-    def get_user_level(self, balance: int, guild_id: int) -> dict:
-        """Get user's service level based on balance"""
+    async def resolve_levels(self, balance: int, guild_id: int):
+        """Get (current level, next level) for a balance from the cached level table"""
         if not guild_id:
-            print(f"Warning: get_user_level called without guild_id", file=sys.stderr)
-            return None
+            log.warning("resolve_levels called without guild_id")
+            return None, None
 
         try:
-            with get_db() as db:
-                levels = db.query(ServiceLevel).filter(
-                    ServiceLevel.guild_id == guild_id,
-                    ServiceLevel.required_balance <= balance
-                ).order_by(desc(ServiceLevel.required_balance)).all()
-
-                if levels:
-                    level = levels[0]
-                    return {
-                        'id': level.id,
-                        'name': level.name,
-                        'emoji': level.emoji,
-                        'required_balance': level.required_balance,
-                        'color': level.color,
-                        'benefits': json.loads(level.benefits)
-                    }
-                return None
-        except SQLAlchemyError as e:
-            print(f"Database error in get_user_level: {str(e)}", file=sys.stderr)
-            return None
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error in get_user_level: {str(e)}", file=sys.stderr)
-            return None
-
-    def format_amount(self, amount: int) -> str:
-        """Format amount with currency"""
-        return f"{amount:,} {CURRENCY['NAME']}"
+            async with get_async_db() as db:
+                levels = await get_guild_levels(db, guild_id)
+            return levels.resolve(balance)
+        except SQLAlchemyError:
+            log.exception("Database error in resolve_levels")
+            return None, None
+
+    async def get_user_level(self, balance: int, guild_id: int) -> dict:
+        """Get user's service level based on balance"""
+        user_level, _ = await self.resolve_levels(balance, guild_id)
+        return user_level
+
+    def format_amount(self, amount: int, guild_id: int) -> str:
+        """Format amount with the guild's currency"""
+        return guild_settings.get(guild_id).format_amount(amount)
+
+    def format_balance(self, amount: int, guild_id: int) -> str:
+        """Format amount with the guild's currency symbol and name"""
+        return guild_settings.get(guild_id).format_balance(amount)
 
     @app_commands.command(
         name='balance',
@@ -88,7 +158,7 @@ class Economy(commands.Cog):
     async def balance(self, interaction: discord.Interaction, user: discord.Member = None):
         """Show user balance command"""
         try:
-            print(f"Balance command called by {interaction.user.name}")
+            log.info("Balance command called", extra={'sampled': True})
 
             if not interaction.guild_id:
                 await interaction.response.send_message(
@@ -100,8 +170,8 @@ class Economy(commands.Cog):
             # If no user specified, show own balance
             target_user = user or interaction.user
 
-            balance = self.get_balance(target_user.id, interaction.guild_id)
-            user_level = self.get_user_level(balance, interaction.guild_id)
+            balance = await self.get_balance(target_user.id, interaction.guild_id)
+            user_level, next_level = await self.resolve_levels(balance, interaction.guild_id)
 
             embed = discord.Embed(
                 title="Информация о счете",
@@ -111,7 +181,7 @@ class Economy(commands.Cog):
             embed.add_field(name="Владелец", value=target_user.name, inline=False)
             embed.add_field(
                 name="Баланс",
-                value=f"{CURRENCY['SYMBOL']} {self.format_amount(balance)}",
+                value=self.format_balance(balance, interaction.guild_id),
                 inline=False
             )
 
@@ -127,57 +197,39 @@ class Economy(commands.Cog):
                     inline=False
                 )
 
-                with get_db() as db:
-                    try:
-                        next_level = db.query(ServiceLevel).filter(
-                            ServiceLevel.guild_id == interaction.guild_id,
-                            ServiceLevel.required_balance > balance
-                        ).order_by(ServiceLevel.required_balance).first()
-
-                        if next_level:
-                            remaining = next_level.required_balance - balance
-                            embed.add_field(
-                                name="До следующего уровня",
-                                value=f"Накопите еще {self.format_amount(remaining)} для получения уровня {next_level.emoji} {next_level.name}",
-                                inline=False
-                            )
-                        else:
-                            embed.add_field(
-                                name="Поздравляем! 🎉",
-                                value="Вы достигли максимального уровня обслуживания!",
-                                inline=False
-                            )
-                    except SQLAlchemyError as e:
-                        print(f"Database error in balance command (next level): {str(e)}", file=sys.stderr)
+                if next_level:
+                    remaining = next_level['required_balance'] - balance
+                    embed.add_field(
+                        name="До следующего уровня",
+                        value=f"Накопите еще {self.format_amount(remaining, interaction.guild_id)} для получения уровня {next_level['emoji']} {next_level['name']}",
+                        inline=False
+                    )
+                else:
+                    embed.add_field(
+                        name="Поздравляем! 🎉",
+                        value="Вы достигли максимального уровня обслуживания!",
+                        inline=False
+                    )
 
-            else:
-                with get_db() as db:
-                    try:
-                        first_level = db.query(ServiceLevel).filter(
-                            ServiceLevel.guild_id == interaction.guild_id
-                        ).order_by(ServiceLevel.required_balance).first()
-
-                        if first_level:
-                            remaining = first_level.required_balance - balance
-                            embed.add_field(
-                                name="Уровень обслуживания",
-                                value="У вас пока нет уровня обслуживания",
-                                inline=False
-                            )
-                            embed.add_field(
-                                name="Следующий уровень",
-                                value=f"Накопите еще {self.format_amount(remaining)} для получения уровня {first_level.emoji} {first_level.name}",
-                                inline=False
-                            )
-                    except SQLAlchemyError as e:
-                        print(f"Database error in balance command (first level): {str(e)}", file=sys.stderr)
+            elif next_level:
+                remaining = next_level['required_balance'] - balance
+                embed.add_field(
+                    name="Уровень обслуживания",
+                    value="У вас пока нет уровня обслуживания",
+                    inline=False
+                )
+                embed.add_field(
+                    name="Следующий уровень",
+                    value=f"Накопите еще {self.format_amount(remaining, interaction.guild_id)} для получения уровня {next_level['emoji']} {next_level['name']}",
+                    inline=False
+                )
 
             if user:
                 embed.set_footer(text=f"Запрошено пользователем: {interaction.user.name}")
 
             await interaction.response.send_message(embed=embed)
-        except Exception as e:
-            print(f"Error in balance command: {e}", file=sys.stderr)
+        except Exception:
+            log.exception("Error in balance command")
             await interaction.response.send_message(
                 "❌ Произошла ошибка при получении информации о балансе",
                 ephemeral=True
@@ -193,7 +245,7 @@ class Economy(commands.Cog):
     )
     async def transfer(self, interaction: discord.Interaction, user: discord.Member, amount: int):
         """Transfer money to another user"""
-        print(f"Transfer command called by {interaction.user.name} to {user.name} amount {amount}")
+        log.info("Transfer command called", extra={'sampled': True, 'data': {'to_user_id': user.id, 'amount': amount}})
 
         if amount <= 0:
             await interaction.response.send_message(
@@ -209,211 +261,330 @@ class Economy(commands.Cog):
             )
             return
 
-        with get_db() as db:
+        async with get_async_db() as db:
             try:
-                # Get or create sender profile
-                sender_profile = db.query(UserProfile).filter(
-                    UserProfile.user_id == interaction.user.id,
-                    UserProfile.guild_id == interaction.guild_id
-                ).first()
+                # Debit, credit and transaction record in one atomic statement
+                result = await transfer_funds(
+                    db,
+                    guild_id=interaction.guild_id,
+                    from_user_id=interaction.user.id,
+                    to_user_id=user.id,
+                    amount=amount
+                )
 
-                if not sender_profile or sender_profile.balance < amount:
+                if result is None:
                     await interaction.response.send_message(
                         ERRORS['INSUFFICIENT_FUNDS'],
                         ephemeral=True
                     )
                     return
 
-                # Get or create recipient profile
-                recipient_profile = db.query(UserProfile).filter(
-                    UserProfile.user_id == user.id,
-                    UserProfile.guild_id == interaction.guild_id
-                ).first()
-
-                if not recipient_profile:
-                    recipient_profile = UserProfile(
-                        user_id=user.id,
-                        guild_id=interaction.guild_id,
-                        balance=DEFAULT_BALANCE
-                    )
-                    db.add(recipient_profile)
-
-                # Perform transfer
-                sender_profile.balance -= amount
-                recipient_profile.balance += amount
-
-                # Record transaction
-                transaction = Transaction(
-                    from_user_id=interaction.user.id,
-                    to_user_id=user.id,
-                    guild_id=interaction.guild_id,
-                    amount=amount,
-                    transaction_type='transfer'
-                )
-                db.add(transaction)
-                db.commit()
+                sender_balance, recipient_balance = result
+                record_balance(interaction.guild_id, interaction.user.id, sender_balance)
+                record_balance(interaction.guild_id, user.id, recipient_balance)
 
                 embed = discord.Embed(title="Перевод выполнен", color=discord.Color.green())
                 embed.add_field(name="От", value=interaction.user.name, inline=True)
                 embed.add_field(name="Кому", value=user.name, inline=True)
                 embed.add_field(
                     name="Сумма",
-                    value=f"{CURRENCY['SYMBOL']} {self.format_amount(amount)}",
+                    value=self.format_balance(amount, interaction.guild_id),
                     inline=True
                 )
                 embed.add_field(
                     name="Остаток",
-                    value=f"{CURRENCY['SYMBOL']} {self.format_amount(sender_profile.balance)}",
+                    value=self.format_balance(sender_balance, interaction.guild_id),
                     inline=False
                 )
 
                 await interaction.response.send_message(embed=embed)
-            except SQLAlchemyError as e:
-                print(f"Database error in transfer command: {str(e)}", file=sys.stderr)
+            except SQLAlchemyError:
+                log.exception("Database error in transfer command")
                 await interaction.response.send_message(
                     "❌ Произошла ошибка при переводе денег",
                     ephemeral=True
                 )
 
+    async def add_top_fields(self, embed: discord.Embed, guild, rows, added_count: int, size: int) -> int:
+        """Add the /top rows whose users can be resolved, up to size; returns the new count"""
+        user_names = await resolve_names(self.bot, guild, [user_id for _, user_id, _ in rows])
+        for rank, user_id, balance in rows:
+            if added_count >= size:
+                break
+            if user_id in user_names:
+                embed.add_field(
+                    name=f"#{rank} {user_names[user_id]}",
+                    value=self.format_balance(balance, guild.id),
+                    inline=False
+                )
+                added_count += 1
+        return added_count
+
     @app_commands.command(
         name='top',
         description='Показать список богатейших пользователей'
     )
     async def top(self, interaction: discord.Interaction):
         """Show top richest users"""
-        print(f"Top command called by {interaction.user.name}")
+        log.info("Top command called", extra={'sampled': True})
 
-        with get_db() as db:
+        async with get_async_db() as db:
             try:
-                sorted_accounts = db.query(UserProfile).filter(
-                    UserProfile.guild_id == interaction.guild_id
-                ).order_by(desc(UserProfile.balance)).all()
-
-                if not sorted_accounts:
-                    embed = discord.Embed(
-                        title="Топ счетов",
-                        description="Список пуст. Пока нет ни одного счета!",
-                        color=discord.Color.gold()
-                    )
-                    await interaction.response.send_message(embed=embed)
-                    return
-
                 embed = discord.Embed(title="Топ счетов", color=discord.Color.gold())
+                size = guild_settings.get(interaction.guild_id).leaderboard_size
+                batch_size = size * LEADERBOARD['OVERFETCH']
                 added_count = 0
-
-                for i, profile in enumerate(sorted_accounts, 1):
-                    user = self.bot.get_user(profile.user_id)
-                    if user:
-                        embed.add_field(
-                            name=f"#{i} {user.name}",
-                            value=f"{CURRENCY['SYMBOL']} {self.format_amount(profile.balance)}",
-                            inline=False
-                        )
-                        added_count += 1
-                    if added_count >= 10:  # Show only top 10
+                scanned_count = 0
+                batch = []
+
+                # Overfetch in batches so users we can't resolve don't shrink the list;
+                # names of a whole batch are resolved at once (one member request when uncached)
+                async for row in iter_top_profiles(
+                    db,
+                    interaction.guild_id,
+                    batch_size=batch_size,
+                    max_batches=LEADERBOARD['MAX_BATCHES']
+                ):
+                    scanned_count += 1
+                    batch.append(row)
+                    if len(batch) < batch_size:
+                        continue
+                    added_count = await self.add_top_fields(embed, interaction.guild, batch, added_count, size)
+                    batch = []
+                    if added_count >= size:
                         break
+                if batch:
+                    added_count = await self.add_top_fields(embed, interaction.guild, batch, added_count, size)
+
+                if scanned_count == 0:
+                    embed.description = "Список пуст. Пока нет ни одного счета!"
+                    await interaction.response.send_message(embed=embed)
+                    return
 
                 if added_count == 0:
                     embed.description = "Не удалось получить информацию о пользователях"
                 else:
-                    embed.set_footer(text=f"Всего пользователей в списке: {len(sorted_accounts)}")
+                    total = await count_profiles(db, interaction.guild_id)
+                    embed.set_footer(text=f"Всего пользователей в списке: {total}")
 
                 await interaction.response.send_message(embed=embed)
-            except SQLAlchemyError as e:
-                print(f"Database error in top command: {str(e)}", file=sys.stderr)
+            except SQLAlchemyError:
+                log.exception("Database error in top command")
                 await interaction.response.send_message(
                     "❌ Произошла ошибка при получении топа счетов",
                     ephemeral=True
                 )
 
     @app_commands.command(
-        name='level',
-        description='Информация об уровнях обслуживания'
+        name='rank',
+        description='Показать место в рейтинге богатейших пользователей'
     )
     @app_commands.describe(
-        level_id='ID уровня для подробной информации'
+        user='Пользователь (опционально)',
+        page='Страница рейтинга (опционально)'
     )
-    async def level(self, interaction: discord.Interaction, level_id: int = None):
-        """Show service level information"""
-        print(f"Level command called by {interaction.user.name}, level_id={level_id}")
+    async def rank(self, interaction: discord.Interaction, user: discord.Member = None, page: int = None):
+        """Show a user's leaderboard position or a page of the leaderboard"""
+        log.info("Rank command called", extra={'sampled': True, 'data': {'page': page}})
 
-        with get_db() as db:
-            try:
-                if level_id is not None:
-                    # Show specific level info
-                    level = db.query(ServiceLevel).filter(
-                        ServiceLevel.guild_id == interaction.guild_id,
-                        ServiceLevel.id == level_id
-                    ).first()
-                    if not level:
-                        await interaction.response.send_message(
-                            ERRORS['LEVEL_NOT_FOUND'],
-                            ephemeral=True
-                        )
-                        return
-
-                    embed = discord.Embed(
-                        title=f"Уровень {level.emoji} {level.name}",
-                        color=discord.Color(level.color)
-                    )
-                    embed.add_field(
-                        name="Требуемый баланс",
-                        value=self.format_amount(level.required_balance),
-                        inline=False
+        if not interaction.guild_id:
+            await interaction.response.send_message(
+                "❌ Эта команда работает только на серверах!",
+                ephemeral=True
+            )
+            return
+
+        try:
+            async with get_async_db() as db:
+                ranking = await get_ranking(db, interaction.guild_id)
+
+            if page is not None:
+                page_count = max(1, (len(ranking) + RANKING['PAGE_SIZE'] - 1) // RANKING['PAGE_SIZE'])
+                if page < 1 or page > page_count:
+                    await interaction.response.send_message(
+                        f"❌ Страница должна быть от 1 до {page_count}",
+                        ephemeral=True
                     )
+                    return
+
+                embed = discord.Embed(
+                    title=f"Рейтинг счетов — страница {page}/{page_count}",
+                    color=discord.Color.gold()
+                )
+                entries = ranking.page(page, RANKING['PAGE_SIZE'])
+                user_names = await resolve_names(
+                    self.bot, interaction.guild, [user_id for _, user_id, _ in entries]
+                )
+                for position, user_id, balance in entries:
                     embed.add_field(
-                        name="Привилегии",
-                        value="\n".join(f"• {benefit}" for benefit in json.loads(level.benefits)),
+                        name=f"#{position} {user_names.get(user_id, user_id)}",
+                        value=self.format_balance(balance, interaction.guild_id),
                         inline=False
                     )
+                if not len(ranking):
+                    embed.description = "Список пуст. Пока нет ни одного счета!"
+            else:
+                target_user = user or interaction.user
+                position = ranking.rank(target_user.id)
+
+                embed = discord.Embed(title="Место в рейтинге", color=discord.Color.gold())
+                embed.add_field(name="Пользователь", value=target_user.name, inline=False)
+                if position is None:
+                    embed.description = "У пользователя пока нет счета в рейтинге"
                 else:
-                    # Show all levels overview
-                    embed = discord.Embed(
-                        title="📊 Уровни обслуживания",
-                        description="Список всех доступных уровней",
-                        color=discord.Color(DEFAULT_COLOR)
+                    embed.add_field(name="Место", value=f"#{position} из {len(ranking)}", inline=True)
+                    embed.add_field(
+                        name="Баланс",
+                        value=self.format_balance(ranking.balance(target_user.id), interaction.guild_id),
+                        inline=True
                     )
 
-                    current_balance = self.get_balance(interaction.user.id, interaction.guild_id)
-                    current_level = self.get_user_level(current_balance, interaction.guild_id)
+            await interaction.response.send_message(embed=embed)
+        except SQLAlchemyError:
+            log.exception("Database error in rank command")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при получении рейтинга",
+                ephemeral=True
+            )
 
-                    levels = db.query(ServiceLevel).filter(
-                        ServiceLevel.guild_id == interaction.guild_id
-                    ).order_by(ServiceLevel.required_balance).all()
+    def history_line(self, user_id: int, row, settings) -> str:
+        """One statement line, signed from user_id's point of view"""
+        when = discord.utils.format_dt(row.created_at.replace(tzinfo=timezone.utc), 'f')
+        if row.transaction_type == 'admin_set':
+            if row.to_user_id == user_id:
+                return f"{when} 🛠 Баланс изменен администратором: {settings.format_change(row.amount)}"
+            return f"{when} 🛠 Изменен баланс <@{row.to_user_id}>: {settings.format_change(row.amount)}"
+        if row.transaction_type == 'playtime':
+            return f"{when} ⛏ {settings.format_amount(row.amount)} за игру на сервере Minecraft"
+        if row.to_user_id == user_id:
+            return f"{when} ➕ {settings.format_amount(row.amount)} от <@{row.from_user_id}>"
+        return f"{when} ➖ {settings.format_amount(row.amount)} для <@{row.to_user_id}>"
+
+    def history_embed(self, user: discord.abc.User, page, guild_id: int) -> discord.Embed:
+        embed = discord.Embed(title=f"История операций — {user.name}", color=discord.Color.blue())
+        if page.rows:
+            settings = guild_settings.get(guild_id)
+            embed.description = "\n".join(self.history_line(user.id, row, settings) for row in page.rows)
+        else:
+            embed.description = "Операций пока нет"
+        return embed
+
+    @app_commands.command(
+        name='history',
+        description='Показать историю операций по счету'
+    )
+    @app_commands.describe(
+        user='Пользователь (опционально)'
+    )
+    async def history(self, interaction: discord.Interaction, user: discord.Member = None):
+        """Show a user's transactions, newest first, with paging buttons"""
+        log.info("History command called", extra={'sampled': True})
 
-                    for level in levels:
-                        status = ""
-                        if current_level and level.id == current_level['id']:
-                            status = "✅ Текущий уровень"
-                        elif current_balance >= level.required_balance:
-                            status = "✓ Доступен"
-                        else:
-                            remaining = level.required_balance - current_balance
-                            status = f"Требуется еще {self.format_amount(remaining)}"
+        if not interaction.guild_id:
+            await interaction.response.send_message(
+                "❌ Эта команда работает только на серверах!",
+                ephemeral=True
+            )
+            return
 
-                        embed.add_field(
-                            name=f"{level.emoji} {level.name} (ID: {level.id})",
-                            value=f"Требуемый баланс: {self.format_amount(level.required_balance)}\n{status}",
-                            inline=False
-                        )
+        target_user = user or interaction.user
+        try:
+            async with get_async_db() as db:
+                page = await fetch_history_page(
+                    db, interaction.guild_id, target_user.id, HISTORY['PAGE_SIZE']
+                )
+        except SQLAlchemyError:
+            log.exception("Database error in history command")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при получении истории",
+                ephemeral=True
+            )
+            return
 
-                    embed.set_footer(text="Используйте /level <ID> для подробной информации об уровне")
+        view = HistoryView(self, interaction, target_user, page)
+        await interaction.response.send_message(
+            embed=self.history_embed(target_user, page, interaction.guild_id),
+            view=view,
+            ephemeral=True
+        )
 
-                await interaction.response.send_message(embed=embed)
-            except SQLAlchemyError as e:
-                print(f"Database error in level command: {str(e)}", file=sys.stderr)
-                await interaction.response.send_message(
-                    "❌ Произошла ошибка при получении информации об уровнях",
-                    ephemeral=True
+    @app_commands.command(
+        name='level',
+        description='Информация об уровнях обслуживания'
+    )
+    @app_commands.describe(
+        level_id='ID уровня для подробной информации'
+    )
+    async def level(self, interaction: discord.Interaction, level_id: int = None):
+        """Show service level information"""
+        log.info("Level command called", extra={'sampled': True, 'data': {'level_id': level_id}})
+
+        try:
+            async with get_async_db() as db:
+                levels = await get_guild_levels(db, interaction.guild_id)
+
+            if level_id is not None:
+                # Show specific level info
+                level = levels.get(level_id)
+                if not level:
+                    await interaction.response.send_message(
+                        ERRORS['LEVEL_NOT_FOUND'],
+                        ephemeral=True
+                    )
+                    return
+
+                embed = discord.Embed(
+                    title=f"Уровень {level['emoji']} {level['name']}",
+                    color=discord.Color(level['color'])
                 )
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error in level command: {str(e)}", file=sys.stderr)
-                await interaction.response.send_message(
-                    "❌ Произошла ошибка при обработке данных уровней",
-                    ephemeral=True
+                embed.add_field(
+                    name="Требуемый баланс",
+                    value=self.format_amount(level['required_balance'], interaction.guild_id),
+                    inline=False
                 )
+                embed.add_field(
+                    name="Привилегии",
+                    value="\n".join(f"• {benefit}" for benefit in level['benefits']),
+                    inline=False
+                )
+            else:
+                # Show all levels overview
+                embed = discord.Embed(
+                    title="📊 Уровни обслуживания",
+                    description="Список всех доступных уровней",
+                    color=discord.Color(DEFAULT_COLOR)
+                )
+
+                current_balance = await self.get_balance(interaction.user.id, interaction.guild_id)
+                current_level, _ = levels.resolve(current_balance)
+
+                for level in levels.levels:
+                    status = ""
+                    if current_level and level['id'] == current_level['id']:
+                        status = "✅ Текущий уровень"
+                    elif current_balance >= level['required_balance']:
+                        status = "✓ Доступен"
+                    else:
+                        remaining = level['required_balance'] - current_balance
+                        status = f"Требуется еще {self.format_amount(remaining, interaction.guild_id)}"
+
+                    embed.add_field(
+                        name=f"{level['emoji']} {level['name']} (ID: {level['id']})",
+                        value=f"Требуемый баланс: {self.format_amount(level['required_balance'], interaction.guild_id)}\n{status}",
+                        inline=False
+                    )
+
+                embed.set_footer(text="Используйте /level <ID> для подробной информации об уровне")
+
+            await interaction.response.send_message(embed=embed)
+        except SQLAlchemyError:
+            log.exception("Database error in level command")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при получении информации об уровнях",
+                ephemeral=True
+            )
 
 
 async def setup(bot):
     await bot.add_cog(Economy(bot))
-    print("Economy cog setup complete")
\ No newline at end of file
+    log.info("Economy cog setup complete")
\ No newline at end of file
@@ -1,108 +1,317 @@
 import discord
-from discord.ext import commands
 from discord import app_commands
-from mcstatus import JavaServer
-from utils.config import MINECRAFT_CONFIG, ERRORS, CURRENCY
-from utils.permissions import requires_role
+from utils.config import MINECRAFT, PLAYTIME, ERRORS
+from utils.permissions import has_command_permission
+from utils.accounts import credit_balance
+from utils.ledger import record_transaction, commit_with_ledger
+from utils.leaderboard import note_profile_created
+from utils.ranking import record_balance
+from utils.minecraft_links import (
+    NAME_PATTERN, get_guild_links, link_account, unlink_account, lookup_profile, new_verify_code, verify_link
+)
+from utils.minecraft_rcon import RconError, rcon_enabled, tell
+from utils.minecraft_status import statuses
+from utils.playtime import playtime
+from utils.settings import guild_settings
+from utils.database import get_async_db
+from utils.metrics import InstrumentedCog
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import aiohttp
 import asyncio
+import logging
 
-class Minecraft(commands.Cog):
+log = logging.getLogger(__name__)
+
+class Minecraft(InstrumentedCog):
     """Minecraft server integration"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.server = None
-        self.last_status = None
         self.status_task = None
 
     async def cog_load(self):
-        """Called when the cog is loaded"""
-        try:
-            print(f"Attempting to connect to Minecraft server at {MINECRAFT_CONFIG['SERVER_ADDRESS']}")
-            self.server = JavaServer.lookup(MINECRAFT_CONFIG['SERVER_ADDRESS'])
-            self.status_task = self.bot.loop.create_task(self.update_status_loop())
-            print("Successfully initialized Minecraft server connection")
-        except Exception as e:
-            print(f"Failed to initialize Minecraft server connection: {e}")
-            self.server = None
+        """Start polling the configured servers"""
+        if not statuses.servers:
+            log.info("No Minecraft servers configured, status polling disabled")
+            return
+        log.info("Polling Minecraft servers", extra={'data': {'servers': list(statuses.servers)}})
+        if PLAYTIME['ENABLED']:
+            statuses.listeners.append(playtime.tick)
+        self.status_task = asyncio.create_task(statuses.run())
 
     async def cog_unload(self):
         """Called when the cog is unloaded"""
         if self.status_task:
             self.status_task.cancel()
+        if playtime.tick in statuses.listeners:
+            statuses.listeners.remove(playtime.tick)
 
-    async def update_status_loop(self):
-        """Periodically update server status"""
-        while True:
-            try:
-                if self.server:
-                    self.last_status = await self.server.async_status()
-                    print("Successfully updated Minecraft server status")
-                else:
-                    print("No server connection available")
-            except Exception as e:
-                print(f"Failed to update Minecraft server status: {e}")
-                self.last_status = None
-            await asyncio.sleep(MINECRAFT_CONFIG['UPDATE_INTERVAL'])
+    async def send_verify_code(self, db, guild_id: int, user_id: int, name: str) -> bool:
+        """Send a fresh verification code to the player in game; False when RCON is off or they aren't online"""
+        found = statuses.find_player(name) if rcon_enabled() else None
+        if found is None:
+            return False
+        code = await new_verify_code(db, guild_id, user_id)
+        try:
+            await tell(found[0].address, name, f"Код подтверждения Discord: {code}")
+        except (RconError, OSError, TimeoutError):
+            log.warning(
+                "Failed to send Minecraft verification code",
+                extra={'data': {'server': found[0].address, 'name': name}}, exc_info=True
+            )
+            return False
+        return True
+
+    def verify_hint(self, sent: bool) -> str:
+        """How a member verifies their link"""
+        if sent:
+            minutes = MINECRAFT['VERIFY_CODE_TTL'] // 60
+            return f"Код подтверждения отправлен вам в игре: введите `/mc_verify код` в течение {minutes} мин."
+        if rcon_enabled():
+            return "Зайдите на сервер и выполните `/mc_verify`, чтобы получить код подтверждения в игре."
+        return "Попросите администратора подтвердить привязку (`/mc_confirm`)."
 
     @app_commands.command(
         name='mc_status',
         description='Показать статус Minecraft сервера'
     )
-    async def status(self, interaction: discord.Interaction):
-        """Show Minecraft server status"""
-        if not self.server:
+    @app_commands.describe(server='Адрес сервера (по умолчанию первый из настроенных)')
+    async def status(self, interaction: discord.Interaction, server: str = None):
+        """Show Minecraft server status from the status cache"""
+        address = server or next(iter(statuses.servers), None)
+        if address not in statuses:
             await interaction.response.send_message(
                 "❌ Сервер Minecraft недоступен",
                 ephemeral=True
             )
             return
 
-        try:
-            status = await self.server.async_status()
-            self.last_status = status
-
-            embed = discord.Embed(
-                title="Статус Minecraft сервера",
-                color=discord.Color.green()
+        cache = statuses.get(address)
+        status = await cache.get()
+        if status is None:
+            await interaction.response.send_message(
+                "❌ Не удалось получить статус сервера",
+                ephemeral=True
             )
+            return
+
+        embed = discord.Embed(
+            title="Статус Minecraft сервера",
+            color=discord.Color.green()
+        )
+        embed.add_field(
+            name="Адрес",
+            value=address,
+            inline=False
+        )
+        embed.add_field(
+            name="Игроков",
+            value=f"{status.players.online}/{status.players.max}",
+            inline=True
+        )
+        embed.add_field(
+            name="Версия",
+            value=status.version.name,
+            inline=True
+        )
+        embed.add_field(
+            name="Пинг",
+            value=f"{status.latency:.1f}мс",
+            inline=True
+        )
+
+        if status.players.sample:
+            players = "\n".join(p.name for p in status.players.sample)
             embed.add_field(
-                name="Адрес",
-                value=MINECRAFT_CONFIG['SERVER_ADDRESS'],
+                name="Онлайн",
+                value=players,
                 inline=False
             )
-            embed.add_field(
-                name="Игроков",
-                value=f"{status.players.online}/{status.players.max}",
-                inline=True
+        embed.set_footer(text=f"Обновлено {cache.age:.0f} с назад")
+
+        await interaction.response.send_message(embed=embed)
+
+    @status.autocomplete('server')
+    async def server_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=address, value=address)
+            for address in statuses.servers if current.lower() in address.lower()
+        ][:25]
+
+    @app_commands.command(
+        name='mc_link',
+        description='Привязать Minecraft аккаунт к своему профилю'
+    )
+    @app_commands.describe(nickname='Ник в Minecraft')
+    @app_commands.guild_only()
+    async def link(self, interaction: discord.Interaction, nickname: str):
+        """Link the caller's Minecraft account"""
+        if not NAME_PATTERN.match(nickname):
+            await interaction.response.send_message(
+                "❌ Ник Minecraft может содержать от 3 до 16 латинских букв, цифр и знаков _",
+                ephemeral=True
             )
-            embed.add_field(
-                name="Версия",
-                value=status.version.name,
-                inline=True
+            return
+
+        uuid = None
+        if MINECRAFT['ONLINE_MODE']:
+            try:
+                profile = await lookup_profile(nickname)
+            except (aiohttp.ClientError, TimeoutError):
+                # Mojang is down: link by name now, the UUID is filled in by the next /mc_link
+                log.warning("Minecraft profile lookup failed", extra={'data': {'name': nickname}}, exc_info=True)
+                profile = (nickname, None)
+            if profile is None:
+                await interaction.response.send_message(
+                    "❌ Аккаунт Minecraft с таким ником не найден",
+                    ephemeral=True
+                )
+                return
+            nickname, uuid = profile
+
+        try:
+            async with get_async_db() as db:
+                links = await get_guild_links(db, interaction.guild_id)
+                owner = links.find(nickname, uuid)
+                if owner and owner['user_id'] != interaction.user.id and owner['verified']:
+                    await interaction.response.send_message(
+                        "❌ Этот аккаунт Minecraft уже привязан к другому участнику",
+                        ephemeral=True
+                    )
+                    return
+                verified = await link_account(db, interaction.guild_id, interaction.user.id, nickname, uuid)
+                sent = not verified and await self.send_verify_code(
+                    db, interaction.guild_id, interaction.user.id, nickname
+                )
+        except IntegrityError:
+            # Linked by someone else between the index check and the insert
+            await interaction.response.send_message(
+                "❌ Этот аккаунт Minecraft уже привязан к другому участнику",
+                ephemeral=True
             )
-            embed.add_field(
-                name="Пинг",
-                value=f"{status.latency:.1f}мс",
-                inline=True
+            return
+        except SQLAlchemyError:
+            log.exception("Database error in mc_link")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при привязке аккаунта",
+                ephemeral=True
             )
+            return
 
-            if status.players.sample:
-                players = "\n".join(p.name for p in status.players.sample)
-                embed.add_field(
-                    name="Онлайн",
-                    value=players,
-                    inline=False
-                )
+        message = f"✅ Аккаунт Minecraft **{nickname}** привязан к {interaction.user.mention}"
+        if not verified:
+            message += (
+                "\nНаграды за игру получают только подтвержденные аккаунты. " + self.verify_hint(sent)
+            )
+        await interaction.response.send_message(message, ephemeral=True)
 
-            await interaction.response.send_message(embed=embed)
+    @app_commands.command(
+        name='mc_verify',
+        description='Подтвердить, что привязанный Minecraft аккаунт принадлежит вам'
+    )
+    @app_commands.describe(code='Код из игры; без кода бот отправит новый код в игру')
+    @app_commands.guild_only()
+    async def verify(self, interaction: discord.Interaction, code: str = None):
+        """Verify the caller's link with the code sent in game, or send a new code"""
+        try:
+            async with get_async_db() as db:
+                entry = (await get_guild_links(db, interaction.guild_id)).for_user(interaction.user.id)
+                if entry is None or entry['verified']:
+                    await interaction.response.send_message(
+                        "❌ К вашему профилю не привязан аккаунт Minecraft" if entry is None
+                        else f"✅ Аккаунт Minecraft **{entry['name']}** уже подтвержден",
+                        ephemeral=True
+                    )
+                    return
+                if code is None:
+                    sent = await self.send_verify_code(db, interaction.guild_id, interaction.user.id, entry['name'])
+                else:
+                    entry = await verify_link(db, interaction.guild_id, interaction.user.id, code)
+        except SQLAlchemyError:
+            log.exception("Database error in mc_verify")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при подтверждении аккаунта",
+                ephemeral=True
+            )
+            return
 
-        except Exception as e:
-            print(f"Error getting server status: {e}")
+        if code is None and not sent:
             await interaction.response.send_message(
-                "❌ Не удалось получить статус сервера",
+                "❌ Не удалось отправить код в игру. " + self.verify_hint(False),
+                ephemeral=True
+            )
+        elif code is None:
+            await interaction.response.send_message(self.verify_hint(True), ephemeral=True)
+        elif entry is None:
+            await interaction.response.send_message(
+                "❌ Неверный или просроченный код. Выполните `/mc_verify` без кода, чтобы получить новый",
+                ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                f"✅ Аккаунт Minecraft **{entry['name']}** подтвержден",
+                ephemeral=True
+            )
+
+    @app_commands.command(
+        name='mc_confirm',
+        description='Подтвердить привязку Minecraft аккаунта участника'
+    )
+    @app_commands.describe(member='Участник')
+    @app_commands.guild_only()
+    @has_command_permission('mc_confirm')
+    async def confirm(self, interaction: discord.Interaction, member: discord.Member):
+        """Verify a member's link without a code, for servers without RCON"""
+        try:
+            async with get_async_db() as db:
+                entry = await verify_link(db, interaction.guild_id, member.id)
+        except SQLAlchemyError:
+            log.exception("Database error in mc_confirm")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при подтверждении аккаунта",
+                ephemeral=True
+            )
+            return
+
+        if entry is None:
+            await interaction.response.send_message(
+                "❌ К профилю участника не привязан аккаунт Minecraft",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_message(
+            f"✅ Аккаунт Minecraft **{entry['name']}** участника {member.mention} подтвержден",
+            ephemeral=True
+        )
+
+    @app_commands.command(
+        name='mc_unlink',
+        description='Отвязать Minecraft аккаунт от своего профиля'
+    )
+    @app_commands.guild_only()
+    async def unlink(self, interaction: discord.Interaction):
+        """Remove the caller's Minecraft link"""
+        try:
+            async with get_async_db() as db:
+                entry = await unlink_account(db, interaction.guild_id, interaction.user.id)
+        except SQLAlchemyError:
+            log.exception("Database error in mc_unlink")
+            await interaction.response.send_message(
+                "❌ Произошла ошибка при отвязке аккаунта",
                 ephemeral=True
             )
+            return
+
+        if entry is None:
+            await interaction.response.send_message(
+                "❌ К вашему профилю не привязан аккаунт Minecraft",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_message(
+            f"✅ Аккаунт Minecraft **{entry['name']}** отвязан",
+            ephemeral=True
+        )
 
     @app_commands.command(
         name='mc_reward',
@@ -112,7 +321,7 @@ class Minecraft(commands.Cog):
         player='Ник игрока',
         amount='Количество монет'
     )
-    @requires_role('ADMIN')
+    @has_command_permission('mc_reward')
     async def reward_player(
         self,
         interaction: discord.Interaction,
@@ -127,80 +336,84 @@ class Minecraft(commands.Cog):
             )
             return
 
-        # Check if player is online
-        try:
-            if not self.last_status:
-                await interaction.response.send_message(
-                    "❌ Статус сервера недоступен",
-                    ephemeral=True
-                )
-                return
-
-            player_online = any(
-                p.name.lower() == player.lower()
-                for p in (self.last_status.players.sample or [])
+        if not any(server.cached() for server in statuses.servers.values()):
+            await interaction.response.send_message(
+                "❌ Статус сервера недоступен",
+                ephemeral=True
             )
+            return
 
-            if not player_online:
-                await interaction.response.send_message(
-                    "❌ Игрок не найден на сервере",
-                    ephemeral=True
-                )
-                return
-
-            # Find Discord user by Minecraft nickname
-            discord_member = None
-            for guild_member in interaction.guild.members:
-                if guild_member.display_name.lower() == player.lower():
-                    discord_member = guild_member
-                    break
-
-            if not discord_member:
-                await interaction.response.send_message(
-                    "❌ Не удалось найти Discord пользователя с таким ником",
-                    ephemeral=True
-                )
-                return
-
-            # Add reward
-            economy_cog = self.bot.get_cog('Economy')
-            if not economy_cog:
-                await interaction.response.send_message(
-                    ERRORS['ECONOMY_MODULE_ERROR'],
-                    ephemeral=True
-                )
-                return
-
-            economy_cog.get_balance(discord_member.id)  # Ensure account exists
-            economy_cog.accounts[discord_member.id] += amount
-
-            embed = discord.Embed(
-                title="Награда за игру",
-                color=discord.Color.gold()
-            )
-            embed.add_field(name="Игрок", value=player, inline=True)
-            embed.add_field(
-                name="Награда",
-                value=f"{CURRENCY['SYMBOL']} {economy_cog.format_amount(amount)}",
-                inline=True
-            )
-            embed.add_field(
-                name="Новый баланс",
-                value=f"{CURRENCY['SYMBOL']} {economy_cog.format_amount(economy_cog.accounts[discord_member.id])}",
-                inline=False
-            )
-            embed.set_footer(
-                text=f"Выдано администратором: {interaction.user.name}"
+        # Check if player is online, on any server, as of the last poll
+        found = statuses.find_player(player)
+        if found is None:
+            await interaction.response.send_message(
+                "❌ Игрок не найден на сервере",
+                ephemeral=True
             )
+            return
+        online = found[1]
 
-            await interaction.response.send_message(embed=embed)
+        try:
+            async with get_async_db() as db:
+                # Linked Discord member, by UUID first so Minecraft renames don't break the link
+                links = await get_guild_links(db, interaction.guild_id)
+                link = links.find(online.name, online.id)
+                if link is None:
+                    await interaction.response.send_message(
+                        "❌ Игрок не привязал Discord аккаунт (команда /mc_link)",
+                        ephemeral=True
+                    )
+                    return
+                if not link['verified']:
+                    await interaction.response.send_message(
+                        "❌ Игрок не подтвердил привязку аккаунта (команда /mc_verify)",
+                        ephemeral=True
+                    )
+                    return
 
-        except Exception as e:
-            print(f"Error rewarding player: {e}")
+                balance, created = await credit_balance(db, interaction.guild_id, link['user_id'], amount)
+                record_transaction(
+                    db,
+                    from_user_id=interaction.user.id,
+                    to_user_id=link['user_id'],
+                    guild_id=interaction.guild_id,
+                    amount=amount,
+                    transaction_type='mc_reward'
+                )
+                await commit_with_ledger(db)
+        except SQLAlchemyError:
+            log.exception("Database error in mc_reward")
             await interaction.response.send_message(
-                f"❌ Произошла ошибка: {str(e)}",
+                "❌ Произошла ошибка при выдаче награды",
                 ephemeral=True
             )
+            return
+
+        if created:
+            note_profile_created(interaction.guild_id)
+        record_balance(interaction.guild_id, link['user_id'], balance)
+
+        settings = guild_settings.get(interaction.guild_id)
+        embed = discord.Embed(
+            title="Награда за игру",
+            color=discord.Color.gold()
+        )
+        embed.add_field(name="Игрок", value=f"{online.name} (<@{link['user_id']}>)", inline=True)
+        embed.add_field(
+            name="Награда",
+            value=settings.format_balance(amount),
+            inline=True
+        )
+        embed.add_field(
+            name="Новый баланс",
+            value=settings.format_balance(balance),
+            inline=False
+        )
+        embed.set_footer(
+            text=f"Выдано администратором: {interaction.user.name}"
+        )
+
+        await interaction.response.send_message(embed=embed)
 
 async def setup(bot):
-    await bot.add_cog(Minecraft(bot))
\ No newline at end of file
+    await bot.add_cog(Minecraft(bot))
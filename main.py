@@ -1,68 +1,138 @@
+# First import: startup timings are measured from here (utils/startup.py)
+from utils.startup import startup
 import os
-import discord
-from discord.ext import commands
 from dotenv import load_dotenv
-from utils.config import PREFIX
-from utils.database import Base, engine  # Import database components
-from sqlalchemy import inspect
-import sys
 
-# Load environment variables
+# Load environment variables before utils.config and utils.database read them
 load_dotenv()
+
+from utils.log import setup_logging
+
+# JSON logs through a background writer thread (utils/log.py), before anything logs
+setup_logging()
+
+import discord
+from discord.ext import commands
+from utils.config import PREFIX, METRICS, TRAFFIC, MEMBERS, MIGRATIONS
+from utils.database import engine
+from utils.metrics import start_metrics_server, track_gateway, track_ledger
+from utils.ledger import ledger
+from utils.traffic import recorder
+from utils.command_sync import sync_commands
+from utils.members import client_options
+from utils.settings import load_guild_settings
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+import asyncio
+import logging
+import pkgutil
+
+log = logging.getLogger('bot')
 TOKEN = os.getenv('DISCORD_TOKEN')
 
 if not TOKEN:
     raise ValueError("DISCORD_TOKEN environment variable is not set!")
 
-# Initialize database tables
-print("Creating database tables...", file=sys.stderr)
-try:
-    Base.metadata.create_all(bind=engine)
-    inspector = inspect(engine)
-    table_names = inspector.get_table_names()
-    print("Created tables:", table_names, file=sys.stderr)
-    print("Database tables created successfully!", file=sys.stderr)
-except Exception as e:
-    print(f"Failed to create database tables: {e}", file=sys.stderr)
-    raise
-
-# Initialize bot with required intents
-intents = discord.Intents.default()
-intents.message_content = True  # Required for commands
-intents.members = True  # Required for member operations
-bot = commands.Bot(command_prefix=PREFIX, intents=intents)
-
-# Load cogs
+# Initialize bot with required intents; LOW_MEMORY_MODE skips member chunking and caching
+bot = commands.Bot(command_prefix=PREFIX, **client_options(MEMBERS['LOW_MEMORY']))
+track_gateway(bot)
+track_ledger(ledger)
+if TRAFFIC['RECORD']:
+    recorder.attach(bot)
+
+startup.lap('imports')
+
+COGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cogs')
+
+
+def pending_migrations(alembic_config):
+    """Revisions between the database's current one and head, oldest last"""
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_heads()
+    return list(ScriptDirectory.from_config(alembic_config).iterate_revisions('heads', current or 'base'))
+
+
+def apply_migrations():
+    """Bring the database schema up to date (blocking; run in a thread).
+
+    Migrations that lock large tables (LOCKS_TABLES in their module) are only applied
+    with MIGRATIONS_ALLOW_LOCKING, so a rolling restart doesn't run them unannounced.
+    """
+    alembic_config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alembic.ini'))
+    alembic_config.attributes['configure_logger'] = False
+    pending = pending_migrations(alembic_config)
+    locking = [script.revision for script in pending if getattr(script.module, 'LOCKS_TABLES', False)]
+    if locking and not MIGRATIONS['ALLOW_LOCKING']:
+        raise RuntimeError(
+            f"Pending migrations {', '.join(reversed(locking))} lock tables while they run; apply them with "
+            "`alembic upgrade head` during maintenance, or start with MIGRATIONS_ALLOW_LOCKING=true"
+        )
+    if pending:
+        revisions = [script.revision for script in reversed(pending)]
+        log.info("Applying database migrations", extra={'data': {'revisions': revisions}})
+        command.upgrade(alembic_config, 'head')
+
+
+def discover_extensions():
+    """Every module in cogs/, as an extension name"""
+    return [f"cogs.{module.name}" for module in pkgutil.iter_modules([COGS_DIR]) if not module.ispkg]
+
+
+async def load_extension(name: str):
+    with startup.phase(f"load {name}"):
+        await bot.load_extension(name)
+
+
 async def load_extensions():
-    """Load all cog extensions"""
-    try:
-        print("Loading economy cog...")
-        await bot.load_extension("cogs.economy")
-        print("Loading admin cog...")
-        await bot.load_extension("cogs.admin")
-        print("All cogs loaded successfully")
-    except Exception as e:
-        print(f"Error loading cogs: {e}", file=sys.stderr)
-        raise  # Re-raise to handle in on_ready
+    """Load all cogs concurrently. A cog that fails to load is logged and left out"""
+    names = discover_extensions()
+    results = await asyncio.gather(*(load_extension(name) for name in names), return_exceptions=True)
+    loaded = []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            log.error("Failed to load extension", exc_info=result, extra={'data': {'extension': name}})
+        else:
+            loaded.append(name)
+    if not loaded:
+        raise RuntimeError("No extension could be loaded")
+    log.info("Extensions loaded", extra={'data': {'loaded': loaded, 'failed': sorted(set(names) - set(loaded))}})
+
 
 @bot.event
-async def on_ready():
-    """Called when bot is ready and connected"""
-    print(f'{bot.user} has connected to Discord!')
-    try:
+async def setup_hook():
+    """One-shot startup, after login and before connecting to the gateway"""
+    startup.lap('login')
+    with startup.phase('migrations'):
+        await asyncio.to_thread(apply_migrations)
+    with startup.phase('settings'):
+        await load_guild_settings()
+    with startup.phase('extensions'):
         await load_extensions()
-        print("Attempting to sync application commands...")
-        await bot.tree.sync()
-        print("Successfully synced application commands")
-        print("Bot is fully ready!")
-    except Exception as e:
-        print(f"An error occurred during setup: {e}", file=sys.stderr)
-        return  # Exit early if setup fails
+    with startup.phase('sync'):
+        await sync_commands(bot)
+    startup.lap('setup')
+
+
+@bot.event
+async def on_ready():
+    """Called when bot is ready and connected, again after every reconnect"""
+    log.info("Connected to Discord", extra={'data': {'bot_user': str(bot.user)}})
+    if 'gateway' not in startup.phases:
+        startup.lap('gateway')
+        log.info("Bot is ready", extra={'duration_ms': round(startup.since_start() * 1000, 1)})
+
+
+@bot.listen('on_app_command_completion')
+async def on_app_command_completion(interaction, command):
+    startup.command_served()
+
 
 @bot.event
 async def on_command_error(ctx, error):
     """Global error handler for commands"""
-    print(f"Command error occurred: {type(error).__name__} - {str(error)}", file=sys.stderr)
+    log.warning("Command error", extra={'data': {'error': type(error).__name__, 'detail': str(error)}})
 
     if isinstance(error, commands.errors.CheckFailure):
         await ctx.send('❌ У вас нет прав для выполнения этой команды.')
@@ -77,9 +147,13 @@ async def on_command_error(ctx, error):
 
 if __name__ == "__main__":
     try:
-        print("Starting bot...", file=sys.stderr)
-        bot.run(TOKEN)
+        if METRICS['ENABLED']:
+            start_metrics_server(METRICS['PORT'], METRICS['ADDR'])
+            log.info(f"Metrics served on http://{METRICS['ADDR']}:{METRICS['PORT']}/metrics")
+        log.info("Starting bot")
+        # log_handler=None: discord.py logs propagate to the root logger set up above
+        bot.run(TOKEN, log_handler=None)
     except discord.errors.LoginFailure:
-        print("Failed to login: Invalid token", file=sys.stderr)
-    except Exception as e:
-        print(f"An error occurred: {e}", file=sys.stderr)
\ No newline at end of file
+        log.error("Failed to login: invalid token")
+    except Exception:
+        log.exception("Bot stopped with an error")
\ No newline at end of file
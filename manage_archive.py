@@ -0,0 +1,45 @@
+"""Maintain and query the monthly transaction partitions and their archive files.
+
+    python manage_archive.py maintain
+    python manage_archive.py query --month 2025-01 --guild 123 --user 456
+
+query reads the compressed archive files directly; archived months are never
+loaded back into the database.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.log import setup_logging
+from utils.archive import add_months, iter_archived_transactions, run_maintenance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction partitions and their archive")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('maintain', help="create upcoming partitions and archive old months")
+    query = commands.add_parser('query', help="print archived transactions as NDJSON")
+    query.add_argument('--month', help="YYYY-MM; all archived months if omitted")
+    query.add_argument('--guild', type=int)
+    query.add_argument('--user', type=int)
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == 'maintain':
+        asyncio.run(run_maintenance())
+        return
+
+    start = end = None
+    if args.month:
+        start = datetime.strptime(args.month, '%Y-%m')
+        end = add_months(start, 1)
+    for row in iter_archived_transactions(start, end, args.guild, args.user):
+        print(json.dumps({**row, 'created_at': row['created_at'].isoformat()}))
+
+
+if __name__ == "__main__":
+    main()
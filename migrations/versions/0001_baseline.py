@@ -0,0 +1,75 @@
+"""Baseline schema: user_profiles, transactions, service_levels
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:00:00
+
+Matches the tables Base.metadata.create_all used to create. Databases that
+were set up that way already have them, so each table is only created when
+it is missing and upgrading such a database just records the revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('user_profiles'):
+        op.create_table(
+            'user_profiles',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=True),
+            sa.Column('guild_id', sa.BigInteger(), nullable=True),
+            sa.Column('balance', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'guild_id', name='unique_user_guild'),
+        )
+        op.create_index('ix_user_profiles_id', 'user_profiles', ['id'])
+
+    if not inspector.has_table('transactions'):
+        op.create_table(
+            'transactions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('from_user_id', sa.BigInteger(), nullable=True),
+            sa.Column('to_user_id', sa.BigInteger(), nullable=True),
+            sa.Column('guild_id', sa.BigInteger(), nullable=True),
+            sa.Column('amount', sa.Integer(), nullable=True),
+            sa.Column('transaction_type', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_transactions_id', 'transactions', ['id'])
+
+    if not inspector.has_table('service_levels'):
+        op.create_table(
+            'service_levels',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('guild_id', sa.BigInteger(), nullable=True),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('emoji', sa.String(), nullable=True),
+            sa.Column('required_balance', sa.Integer(), nullable=True),
+            sa.Column('color', sa.Integer(), nullable=True),
+            sa.Column('benefits', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_service_levels_id', 'service_levels', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('service_levels')
+    op.drop_table('transactions')
+    op.drop_table('user_profiles')
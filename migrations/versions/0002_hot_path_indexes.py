@@ -0,0 +1,57 @@
+"""Indexes for the queries the cogs run on every command
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:30:00
+
+Built with CREATE INDEX CONCURRENTLY so a live bot keeps writing while they
+build. ix_user_profiles_guild_balance may already exist on databases that
+were created before migrations, hence IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_profiles_guild_balance', 'user_profiles',
+            ['guild_id', sa.text('balance DESC'), sa.text('user_id DESC')],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_transactions_guild_created', 'transactions', ['guild_id', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_transactions_from_user_id', 'transactions', ['from_user_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_transactions_to_user_id', 'transactions', ['to_user_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_service_levels_guild_required_balance', 'service_levels', ['guild_id', 'required_balance'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_service_levels_guild_required_balance', 'service_levels', postgresql_concurrently=True)
+        op.drop_index('ix_transactions_to_user_id', 'transactions', postgresql_concurrently=True)
+        op.drop_index('ix_transactions_from_user_id', 'transactions', postgresql_concurrently=True)
+        op.drop_index('ix_transactions_guild_created', 'transactions', postgresql_concurrently=True)
+        op.drop_index('ix_user_profiles_guild_balance', 'user_profiles', postgresql_concurrently=True)
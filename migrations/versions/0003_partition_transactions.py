@@ -0,0 +1,132 @@
+"""Partition transactions by month of created_at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 13:00:00
+
+Replaces transactions with a table range-partitioned by created_at, one
+partition per month (transactions_pYYYYMM) plus transactions_default for
+anything outside them. Existing rows are copied over, so this takes an
+exclusive lock on transactions for the duration of the copy. Later months are
+created by utils.archive.ensure_partitions and old ones are moved to files by
+utils.archive.archive_old_partitions.
+
+The primary key becomes (id, created_at): PostgreSQL requires the partition
+key in every unique constraint of a partitioned table. ids keep coming from
+the same sequence.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Copies transactions under an exclusive lock: the bot only applies this at startup with
+# MIGRATIONS_ALLOW_LOCKING (main.apply_migrations)
+LOCKS_TABLES = True
+
+# Months created ahead of the current one; keep in sync with ARCHIVE['PREMAKE_MONTHS']
+PREMAKE_MONTHS = 3
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def create_indexes() -> None:
+    op.create_index('ix_transactions_guild_created', 'transactions', ['guild_id', 'created_at'])
+    op.create_index('ix_transactions_from_user_id', 'transactions', ['from_user_id'])
+    op.create_index('ix_transactions_to_user_id', 'transactions', ['to_user_id'])
+
+
+def drop_indexes() -> None:
+    op.drop_index('ix_transactions_to_user_id', 'transactions', if_exists=True)
+    op.drop_index('ix_transactions_from_user_id', 'transactions', if_exists=True)
+    op.drop_index('ix_transactions_guild_created', 'transactions', if_exists=True)
+    op.drop_index('ix_transactions_id', 'transactions', if_exists=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.execute("LOCK TABLE transactions IN EXCLUSIVE MODE")
+
+    drop_indexes()
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            from_user_id BIGINT,
+            to_user_id BIGINT,
+            guild_id BIGINT,
+            amount INTEGER,
+            transaction_type VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+
+    now = datetime.utcnow()
+    oldest = bind.scalar(sa.text("SELECT min(created_at) FROM transactions_unpartitioned")) or now
+    month = datetime(oldest.year, oldest.month, 1)
+    last = add_months(datetime(now.year, now.month, 1), PREMAKE_MONTHS)
+    while month <= last:
+        following = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_p{month:%Y%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+        )
+        month = following
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    # Rows written before created_at was NOT NULL are filed under the migration time
+    op.execute("""
+        INSERT INTO transactions (id, from_user_id, to_user_id, guild_id, amount, transaction_type, created_at)
+        SELECT id, from_user_id, to_user_id, guild_id, amount, transaction_type,
+               coalesce(created_at, timezone('utc', now()))
+        FROM transactions_unpartitioned
+    """)
+    op.execute("DROP TABLE transactions_unpartitioned")
+
+    # Declared on the parent, created on every partition
+    create_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_indexes()
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            from_user_id BIGINT,
+            to_user_id BIGINT,
+            guild_id BIGINT,
+            amount INTEGER,
+            transaction_type VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("INSERT INTO transactions SELECT * FROM transactions_partitioned")
+    # Drops every partition with it; months already archived stay in their files
+    op.execute("DROP TABLE transactions_partitioned")
+
+    op.create_index('ix_transactions_id', 'transactions', ['id'])
+    create_indexes()
@@ -0,0 +1,67 @@
+"""Covering indexes for /history
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 14:00:00
+
+One index per side of a transfer, keyed (guild_id, user, created_at DESC,
+id DESC) and including the remaining columns, so a statement page is an
+index-only scan starting at its keyset cursor. They replace the single-column
+from/to indexes, which no query used.
+
+CREATE INDEX CONCURRENTLY doesn't work on a partitioned table. The index is
+therefore created on the parent only (invalid until every partition has
+one), built concurrently on each partition and attached; partitions created
+later get it automatically.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HISTORY_INDEXES = {
+    'ix_transactions_guild_from_history': ('from_user_id', 'to_user_id'),
+    'ix_transactions_guild_to_history': ('to_user_id', 'from_user_id'),
+}
+
+
+def partitions():
+    return op.get_bind().scalars(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass
+    """)).all()
+
+
+def create_partitioned_index(name: str, user_column: str, other_column: str) -> None:
+    columns = f"guild_id, {user_column}, created_at DESC, id DESC"
+    include = f"INCLUDE ({other_column}, amount, transaction_type)"
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY transactions ({columns}) {include}")
+    for partition in partitions():
+        child = f"{partition}_{name[len('ix_transactions_'):]}"
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} ({columns}) {include}")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, (user_column, other_column) in HISTORY_INDEXES.items():
+        create_partitioned_index(name, user_column, other_column)
+
+    op.drop_index('ix_transactions_to_user_id', 'transactions', if_exists=True)
+    op.drop_index('ix_transactions_from_user_id', 'transactions', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_transactions_from_user_id', 'transactions', ['from_user_id'])
+    op.create_index('ix_transactions_to_user_id', 'transactions', ['to_user_id'])
+    for name in HISTORY_INDEXES:
+        op.drop_index(name, 'transactions')
@@ -0,0 +1,43 @@
+"""Minecraft account links
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 16:00:00
+
+minecraft_links maps a guild member to a Minecraft account. Both unique
+constraints are per guild: a member links one account, and a Minecraft name
+(case-folded in name_key) belongs to one member.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'minecraft_links',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('minecraft_name', sa.String(length=16), nullable=False),
+        sa.Column('name_key', sa.String(length=16), nullable=False),
+        sa.Column('minecraft_uuid', sa.String(length=32), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('guild_id', 'user_id', name='uq_minecraft_links_guild_user'),
+        sa.UniqueConstraint('guild_id', 'name_key', name='uq_minecraft_links_guild_name'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('minecraft_links')
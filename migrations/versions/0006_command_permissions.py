@@ -0,0 +1,39 @@
+"""Per-guild command permission levels
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:00:00
+
+command_permissions holds a guild's overrides of the default level a
+command requires (PERMISSIONS['COMMAND_LEVELS']); commands without a row
+use the default.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'command_permissions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('command', sa.String(length=32), nullable=False),
+        sa.Column('level', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('guild_id', 'command', name='uq_command_permissions_guild_command'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('command_permissions')
@@ -0,0 +1,46 @@
+"""Per-guild settings
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 20:00:00
+
+guild_settings holds the settings a guild changed (currency, default
+balance, leaderboard size); NULL columns use the defaults from
+utils/config.py. version is incremented by every update, so caches in
+several bot processes can tell a newer row from an older one.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'guild_settings',
+        sa.Column('guild_id', sa.BigInteger(), nullable=False),
+        sa.Column('currency_name', sa.String(length=32), nullable=True),
+        sa.Column('currency_symbol', sa.String(length=64), nullable=True),
+        sa.Column('currency_format', sa.String(length=64), nullable=True),
+        sa.Column('default_balance', sa.Integer(), nullable=True),
+        sa.Column('leaderboard_size', sa.Integer(), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('guild_id'),
+    )
+    # Incremental refresh: rows updated since the last one a process has seen
+    op.create_index('ix_guild_settings_updated_at', 'guild_settings', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_guild_settings_updated_at', table_name='guild_settings')
+    op.drop_table('guild_settings')
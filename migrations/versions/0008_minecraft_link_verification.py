@@ -0,0 +1,36 @@
+"""Minecraft link verification
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 22:00:00
+
+A link is verified once the member proves the Minecraft account is theirs
+(the one-time code sent in game, see /mc_verify) or an admin confirms it;
+only verified links earn playtime and /mc_reward. Existing links start
+unverified. verify_code and verify_expires_at hold the pending code.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('minecraft_links', sa.Column('verified', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('minecraft_links', sa.Column('verify_code', sa.String(length=8), nullable=True))
+    op.add_column('minecraft_links', sa.Column('verify_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('minecraft_links', 'verify_expires_at')
+    op.drop_column('minecraft_links', 'verify_code')
+    op.drop_column('minecraft_links', 'verified')
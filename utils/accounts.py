@@ -0,0 +1,64 @@
+from sqlalchemy import text
+from utils.settings import guild_settings
+
+# Accounts without a row read as the guild's default balance (utils/settings.py); the
+# row is only written by the first balance change. `previous` reads the row from the
+# statement's snapshot, i.e. the balance being replaced (no FOR UPDATE: it would skip
+# the row the upsert just changed); the upsert creates or overwrites the row.
+SET_BALANCE_SQL = text("""
+    WITH previous AS (
+        SELECT balance
+        FROM user_profiles
+        WHERE guild_id = :guild_id AND user_id = :user_id
+    ), upsert AS (
+        INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+        VALUES (:user_id, :guild_id, :balance, timezone('utc', now()), timezone('utc', now()))
+        ON CONFLICT ON CONSTRAINT unique_user_guild DO UPDATE
+        SET balance = EXCLUDED.balance,
+            updated_at = EXCLUDED.updated_at
+        RETURNING (xmax = 0) AS created
+    )
+    SELECT (SELECT balance FROM previous) AS previous_balance, upsert.created
+    FROM upsert
+""")
+
+
+async def set_balance(db, guild_id: int, user_id: int, balance: int):
+    """Set an account's balance, creating its row if needed. Does not commit.
+
+    Returns (previous balance, whether the row was created). An account that had
+    no row reports the guild's default balance as its previous balance.
+    """
+    row = (await db.execute(SET_BALANCE_SQL, {
+        'guild_id': guild_id,
+        'user_id': user_id,
+        'balance': balance,
+    })).one()
+    if row.previous_balance is None:
+        return guild_settings.get(guild_id).default_balance, row.created
+    return row.previous_balance, row.created
+
+
+# Adds to the balance, or opens the account at the default balance + amount
+CREDIT_SQL = text("""
+    INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+    VALUES (:user_id, :guild_id, :opening_balance, timezone('utc', now()), timezone('utc', now()))
+    ON CONFLICT ON CONSTRAINT unique_user_guild DO UPDATE
+    SET balance = user_profiles.balance + :amount,
+        updated_at = EXCLUDED.updated_at
+    RETURNING balance, (xmax = 0) AS created
+""")
+
+
+async def credit_balance(db, guild_id: int, user_id: int, amount: int):
+    """Add amount to an account, creating its row if needed. Does not commit.
+
+    Returns (new balance, whether the row was created).
+    """
+    row = (await db.execute(CREDIT_SQL, {
+        'guild_id': guild_id,
+        'user_id': user_id,
+        'amount': amount,
+        'opening_balance': guild_settings.get(guild_id).default_balance + amount,
+    })).one()
+    return row.balance, row.created
@@ -0,0 +1,301 @@
+from sqlalchemy import text
+from utils.config import ARCHIVE
+from utils.database import get_async_db, async_engine
+from datetime import datetime
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+
+log = logging.getLogger(__name__)
+
+# transactions is range-partitioned by created_at, one partition per month named
+# transactions_pYYYYMM (migrations/versions/0003). Months older than KEEP_MONTHS are
+# detached, written to ARCHIVE['DIR']/transactions/YYYY-MM.ndjson.gz and dropped.
+# Archived months stay queryable with iter_archived_transactions().
+#
+# Rows that arrive for a month without a partition land in transactions_default. Aged ones are
+# moved into their month's partition before it is archived, or merged into its archive file if
+# the month is archived already. Every bot process runs the maintenance loop; a Postgres
+# advisory lock lets one of them (or manage_archive.py) work at a time.
+
+COLUMNS = ('id', 'from_user_id', 'to_user_id', 'guild_id', 'amount', 'transaction_type', 'created_at')
+PARTITION_NAME = re.compile(r'^transactions_p(\d{4})(\d{2})$')
+MAINTENANCE_LOCK = 0x7472616e73  # pg_advisory_lock key held while maintenance runs
+
+DEFAULT_MONTHS_SQL = text("""
+    SELECT DISTINCT date_trunc('month', created_at) AS month
+    FROM transactions_default
+    WHERE created_at < :cutoff
+""")
+
+PARTITIONS_SQL = text("""
+    SELECT c.relname AS name, i.inhrelid IS NOT NULL AS attached
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = 'transactions'::regclass
+    WHERE c.relkind = 'r'
+      AND c.relname ~ '^transactions_p[0-9]{6}$'
+      AND pg_table_is_visible(c.oid)
+""")
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"transactions_p{month:%Y%m}"
+
+
+def archive_path(month: datetime, directory: str = ARCHIVE['DIR']) -> str:
+    return os.path.join(directory, 'transactions', f"{month:%Y-%m}.ndjson.gz")
+
+
+async def list_partitions(db):
+    """{month: attached} for every monthly partition table, including detached ones"""
+    partitions = {}
+    for row in await db.execute(PARTITIONS_SQL):
+        match = PARTITION_NAME.match(row.name)
+        partitions[datetime(int(match[1]), int(match[2]), 1)] = row.attached
+    return partitions
+
+
+async def create_partition(db, month: datetime):
+    """Create the month's partition, moving its rows out of transactions_default if there are any"""
+    name = partition_name(month)
+    bounds = f"FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    in_default = (
+        f"transactions_default WHERE created_at >= '{month:%Y-%m-%d}' "
+        f"AND created_at < '{add_months(month, 1):%Y-%m-%d}'"
+    )
+    if not await db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {in_default})")):
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF transactions FOR VALUES {bounds}"))
+        return
+
+    # PARTITION OF would fail the default partition's constraint check; fill a plain table
+    # and attach it instead (indexes are created on attach). Same transaction as the caller's.
+    await db.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await db.execute(text(
+        f"WITH moved AS (DELETE FROM {in_default} RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await db.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    log.info("Moved rows out of the default partition", extra={'data': {'partition': name, 'rows': moved.rowcount}})
+
+
+async def ensure_partitions(db, months_ahead: int = ARCHIVE['PREMAKE_MONTHS'], months_back: int = 0):
+    """Create the partitions for the current month, months_ahead after it and months_back before it"""
+    existing = await list_partitions(db)
+    current = month_start(datetime.utcnow())
+    created = []
+    for offset in range(-months_back, months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        await create_partition(db, month)
+        await db.commit()
+        created.append(month)
+    return created
+
+
+async def export_partition(db, month: datetime, directory: str = ARCHIVE['DIR']) -> int:
+    """Stream a partition into its compressed NDJSON file. Returns the number of rows written"""
+    path = archive_path(month, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+
+    result = await db.stream(
+        text(f"SELECT {', '.join(COLUMNS)} FROM {partition_name(month)} ORDER BY created_at, id"),
+        execution_options={'yield_per': ARCHIVE['FETCH_SIZE']}
+    )
+    written = 0
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        async for rows in result.partitions():
+            lines = ''.join(
+                json.dumps({**row._asdict(), 'created_at': row.created_at.isoformat()}) + '\n'
+                for row in rows
+            )
+            # Compression happens off the event loop
+            await asyncio.to_thread(archive.write, lines)
+            written += len(rows)
+
+    os.replace(partial, path)
+    return written
+
+
+async def archive_partition(month: datetime, attached: bool, directory: str = ARCHIVE['DIR']) -> int:
+    """Detach a month, write it to its archive file, then drop it"""
+    table = partition_name(month)
+    async with get_async_db() as db:
+        if attached:
+            # No new rows can land in the partition while it is being exported
+            await db.execute(text(f"ALTER TABLE transactions DETACH PARTITION {table}"))
+            await db.commit()
+
+        expected = await db.scalar(text(f"SELECT count(*) FROM {table}"))
+        written = await export_partition(db, month, directory)
+        await db.commit()
+        if written != expected:
+            raise RuntimeError(f"{table}: wrote {written} of {expected} rows, keeping the table")
+
+        await db.execute(text(f"DROP TABLE {table}"))
+        await db.commit()
+        return written
+
+
+def merge_archive(path: str, rows) -> int:
+    """Merge rows (dicts sorted by created_at, id) into an archive file, keeping it sorted.
+
+    Rows already in the file are skipped, so merging the same rows again is harmless.
+    Returns the number of rows added.
+    """
+    def read(archive):
+        for line in archive:
+            row = json.loads(line)
+            yield (datetime.fromisoformat(row['created_at']), row['id']), line, False
+
+    new = [
+        ((row['created_at'], row['id']),
+         json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + '\n', True)
+        for row in rows
+    ]
+    partial = path + '.partial'
+    added = 0
+    with gzip.open(path, 'rt', encoding='utf-8') as archive, gzip.open(partial, 'wt', encoding='utf-8') as merged:
+        previous = None
+        # File rows come first among equal keys, so a row merged before is the one skipped
+        for key, line, is_new in heapq.merge(read(archive), new, key=lambda item: item[0]):
+            if key == previous:
+                continue
+            merged.write(line)
+            previous = key
+            added += is_new
+    os.replace(partial, path)
+    return added
+
+
+async def archive_late_rows(month: datetime, directory: str = ARCHIVE['DIR']) -> int:
+    """Move a month's rows from transactions_default into its existing archive file"""
+    async with get_async_db() as db:
+        rows = (await db.execute(text(f"""
+            DELETE FROM transactions_default
+            WHERE created_at >= '{month:%Y-%m-%d}' AND created_at < '{add_months(month, 1):%Y-%m-%d}'
+            RETURNING {', '.join(COLUMNS)}
+        """))).all()
+        rows = sorted((row._asdict() for row in rows), key=lambda row: (row['created_at'], row['id']))
+        # Written before the delete commits: a failure keeps the rows, and a retry skips the ones merged
+        await asyncio.to_thread(merge_archive, archive_path(month, directory), rows)
+        await db.commit()
+    return len(rows)
+
+
+async def sweep_default_partition(cutoff: datetime, directory: str = ARCHIVE['DIR']) -> dict:
+    """Give aged rows in transactions_default a home: {month: rows merged into an archive file}.
+
+    Months without an archive file get a partition (filled from the default one), which is
+    then archived like any other.
+    """
+    async with get_async_db() as db:
+        months = [row.month for row in await db.execute(DEFAULT_MONTHS_SQL, {'cutoff': cutoff})]
+        existing = await list_partitions(db)
+        for month in months:
+            if month not in existing and not os.path.exists(archive_path(month, directory)):
+                await create_partition(db, month)
+                await db.commit()
+
+    merged = {}
+    for month in months:
+        if month not in existing and os.path.exists(archive_path(month, directory)):
+            merged[month] = await archive_late_rows(month, directory)
+            log.info("Archived late transactions", extra={'data': {'month': f"{month:%Y-%m}", 'rows': merged[month]}})
+    return merged
+
+
+async def archive_old_partitions(keep_months: int = ARCHIVE['KEEP_MONTHS'], directory: str = ARCHIVE['DIR']):
+    """Archive every month before the last keep_months. Returns {month: rows archived}"""
+    cutoff = add_months(month_start(datetime.utcnow()), -(keep_months - 1))
+    await sweep_default_partition(cutoff, directory)
+    async with get_async_db() as db:
+        partitions = await list_partitions(db)
+
+    archived = {}
+    # Detached partitions are left over from an interrupted run and get archived too
+    for month, attached in sorted(partitions.items()):
+        if month < cutoff or not attached:
+            archived[month] = await archive_partition(month, attached, directory)
+            log.info("Archived transactions partition", extra={'data': {'partition': partition_name(month), 'rows': archived[month]}})
+    return archived
+
+
+async def run_maintenance():
+    """Create upcoming partitions and archive old ones; skipped (None) while another process does"""
+    async with async_engine.connect() as lock:
+        if not await lock.scalar(text("SELECT pg_try_advisory_lock(:key)"), {'key': MAINTENANCE_LOCK}):
+            log.info("Partition maintenance running elsewhere, skipped")
+            return None
+        try:
+            async with get_async_db() as db:
+                created = await ensure_partitions(db)
+            for month in created:
+                log.info("Created transactions partition", extra={'data': {'partition': partition_name(month)}})
+            return await archive_old_partitions()
+        finally:
+            await lock.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': MAINTENANCE_LOCK})
+
+
+async def maintenance_loop(interval: float = ARCHIVE['INTERVAL']):
+    """Run maintenance now and then every interval seconds, until cancelled"""
+    while True:
+        try:
+            await run_maintenance()
+        except Exception:
+            log.exception("Transaction partition maintenance failed")
+        await asyncio.sleep(interval)
+
+
+def archived_months(directory: str = ARCHIVE['DIR']):
+    """Months that have an archive file, oldest first"""
+    folder = os.path.join(directory, 'transactions')
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        datetime.strptime(name[:7], '%Y-%m')
+        for name in os.listdir(folder)
+        if re.fullmatch(r'\d{4}-\d{2}\.ndjson\.gz', name)
+    )
+
+
+def iter_archived_transactions(
+    start: datetime = None,
+    end: datetime = None,
+    guild_id: int = None,
+    user_id: int = None,
+    directory: str = ARCHIVE['DIR']
+):
+    """Yield archived transactions as dicts, in created_at order, straight from the files.
+
+    start is inclusive, end exclusive. Only the months overlapping [start, end) are
+    opened, and each is decompressed line by line, so nothing is loaded into the database.
+    """
+    for month in archived_months(directory):
+        if (start and add_months(month, 1) <= start) or (end and month >= end):
+            continue
+        with gzip.open(archive_path(month, directory), 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if guild_id is not None and row['guild_id'] != guild_id:
+                    continue
+                if user_id is not None and user_id not in (row['from_user_id'], row['to_user_id']):
+                    continue
+                row['created_at'] = datetime.fromisoformat(row['created_at'])
+                if (start and row['created_at'] < start) or (end and row['created_at'] >= end):
+                    continue
+                yield row
+
@@ -0,0 +1,78 @@
+from utils.config import COMMAND_SYNC, PERMISSIONS
+import discord
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Application command sync is a slow, rate-limited API call. The payload the bot would send
+# is hashed and compared with the hash of the last successful sync (COMMAND_SYNC['STATE_FILE']),
+# so restarts without command changes skip it. With COMMAND_SYNC['DEV_GUILD_ID'] the global
+# commands are copied to that guild and synced there only, which takes effect immediately.
+
+
+def check_key(check) -> str:
+    """A check's identity in the hash. has_command_permission predicates all share one
+    qualname, so the command they check (and its default level) is part of it"""
+    key = f"{check.__module__}.{check.__qualname__}"
+    permission_command = getattr(check, 'permission_command', None)
+    if permission_command is not None:
+        key += f":{permission_command}@{PERMISSIONS['COMMAND_LEVELS'].get(permission_command, 0)}"
+    return key
+
+
+def command_payload(tree, guild=None) -> list:
+    """What sync() would upload for the scope, plus each command's checks (they never reach
+    Discord, but a changed check should still count as a changed command)"""
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        entry = command.to_dict(tree)
+        entry['checks'] = [check_key(check) for check in getattr(command, 'checks', ())]
+        payload.append(entry)
+    return sorted(payload, key=lambda entry: (entry.get('type', 1), entry['name']))
+
+
+def tree_hash(tree, guild=None) -> str:
+    canonical = json.dumps(command_payload(tree, guild), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def load_state(path: str) -> dict:
+    try:
+        with open(path, encoding='utf-8') as state:
+            return json.load(state)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        log.warning("Unreadable command sync state, syncing", extra={'data': {'path': path}}, exc_info=True)
+        return {}
+
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+    with open(partial, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file, indent=2, sort_keys=True)
+    os.replace(partial, path)
+
+
+async def sync_commands(bot, force: bool = COMMAND_SYNC['FORCE']) -> bool:
+    """Sync the command tree if it changed since the last sync. Returns whether it synced"""
+    guild = discord.Object(COMMAND_SYNC['DEV_GUILD_ID']) if COMMAND_SYNC['DEV_GUILD_ID'] else None
+    if guild:
+        bot.tree.copy_global_to(guild=guild)
+
+    scope = f"{bot.application_id}:{f'guild:{guild.id}' if guild else 'global'}"
+    digest = tree_hash(bot.tree, guild)
+    state = load_state(COMMAND_SYNC['STATE_FILE'])
+    if not force and state.get(scope) == digest:
+        log.info("Application commands unchanged, skipping sync", extra={'data': {'scope': scope}})
+        return False
+
+    synced = await bot.tree.sync(guild=guild)
+    state[scope] = digest
+    save_state(COMMAND_SYNC['STATE_FILE'], state)
+    log.info("Synced application commands", extra={'data': {'scope': scope, 'commands': len(synced)}})
+    return True
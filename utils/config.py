@@ -4,10 +4,11 @@ import os
 PREFIX = '/'
 DEFAULT_BALANCE = 1000  # Starting balance
 
-# Currency settings
+# Currency settings, the defaults of every guild's settings (utils/settings.py)
 CURRENCY = {
     'NAME': 'монет',
-    'SYMBOL': '💰'
+    'SYMBOL': '💰',
+    'FORMAT': '{amount:,} {currency}'  # Fields: amount, currency
 }
 
 # Default color for embeds when no service level color is available
@@ -22,11 +23,172 @@ ERRORS = {
     'ROLE_NOT_FOUND': '❌ Требуемая роль не найдена на сервере!',
     'INVALID_PERMISSION_LEVEL': '❌ Неверный уровень прав доступа!',
     'COMMAND_NOT_FOUND': '❌ Команда не найдена!',
+    'PERMISSION_NOT_CONFIGURABLE': '❌ Эта команда доступна всем, ее уровень доступа не настраивается!',
     'LEVEL_NOT_FOUND': '❌ Указанный уровень не найден!',
-    'INVALID_LEVEL_ID': '❌ Неверный ID уровня!'
+    'INVALID_LEVEL_ID': '❌ Неверный ID уровня!',
+    'INVALID_CURRENCY_FORMAT': '❌ Неверный формат! Допустимы только поля {amount} и {currency}, например {amount:,} {currency}'
 }
 
 # Service levels configuration
 SERVICE_LEVELS = {
-    'default_color': DEFAULT_COLOR
-}
\ No newline at end of file
+    'default_color': DEFAULT_COLOR,
+    'cache_ttl': 300  # Seconds before a guild's cached levels are reloaded to pick up changes made elsewhere
+}
+
+# Leaderboard (/top) settings
+LEADERBOARD = {
+    'SIZE': 10,  # Users shown in /top
+    'OVERFETCH': 2,  # Rows fetched per batch = SIZE * OVERFETCH, to skip users we can't resolve
+    'MAX_BATCHES': 5,  # Stop looking for resolvable users after this many batches
+    'COUNT_TTL': 300  # Seconds before the cached per-guild profile count is recounted
+}
+
+# In-memory per-guild ranking (/rank)
+RANKING = {
+    'PAGE_SIZE': 10,  # Users per leaderboard page
+    'TTL': 600  # Seconds before a guild's ranking is rebuilt to pick up changes made elsewhere
+}
+
+# Transaction ledger. In write-behind mode balance changes still commit synchronously,
+# but the Transaction audit rows are queued in memory and inserted in batches.
+LEDGER = {
+    'WRITE_BEHIND': os.getenv('LEDGER_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes'),
+    'MAX_QUEUE': 10000,  # Queued rows before commands wait for the flusher (backpressure)
+    'BATCH_SIZE': 500,  # Flush as soon as this many rows are queued
+    'FLUSH_INTERVAL': 1.0,  # ...or after this many seconds
+    'ENQUEUE_TIMEOUT': 5.0,  # Seconds a command waits on a full queue before spilling to disk
+    'SPILL_FILE': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'ledger_spill.ndjson')
+}
+
+# Monthly partitions of the transactions table and their archive
+ARCHIVE = {
+    'KEEP_MONTHS': 6,  # Months kept in the database, the current one included; older ones go to files
+    'PREMAKE_MONTHS': 3,  # Partitions created ahead of the current month
+    'INTERVAL': 6 * 3600,  # Seconds between maintenance runs
+    'FETCH_SIZE': 5000,  # Rows streamed per round trip while archiving a partition
+    'DIR': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'archive')
+}
+
+# Transaction statement (/history)
+HISTORY = {
+    'PAGE_SIZE': 10,  # Transactions per page
+    'TIMEOUT': 300  # Seconds the Next/Prev buttons keep working
+}
+
+# Prometheus metrics endpoint (utils/metrics.py)
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes'),
+    'ADDR': os.getenv('METRICS_ADDR', '127.0.0.1'),  # Local only by default
+    'PORT': int(os.getenv('METRICS_PORT', '9100'))
+}
+
+# SQL logging (utils/sqltrace.py)
+SQL = {
+    'ECHO': os.getenv('SQL_ECHO', '').lower() in ('1', 'true', 'yes'),  # Log every statement; debugging only
+    'SLOW_QUERY_MS': float(os.getenv('SLOW_QUERY_MS', '200')),  # Statements at least this slow are logged
+    # Logged with their parameters and slash command, also to this file; empty SLOW_QUERY_LOG: log only
+    'SLOW_QUERY_LOG': os.getenv(
+        'SLOW_QUERY_LOG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'slow_queries.log')
+    )
+}
+
+# Logging (utils/log.py)
+LOGGING = {
+    'LEVEL': os.getenv('LOG_LEVEL', 'INFO').upper(),
+    'SAMPLE_RATE': float(os.getenv('LOG_SAMPLE_RATE', '0.1')),  # Share of high-volume info events kept
+    'QUEUE_SIZE': 10000  # Records waiting for the writer thread before new ones are dropped
+}
+
+# Opt-in capture of slash command traffic for benchmarks/bench_replay.py (utils/traffic.py)
+TRAFFIC = {
+    'RECORD': os.getenv('TRAFFIC_RECORD', '').lower() in ('1', 'true', 'yes'),
+    'DIR': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'traffic'),
+    'SALT': os.getenv('TRAFFIC_SALT', ''),  # Key for hashing guild and user ids; empty: new key every run
+    'FLUSH_INTERVAL': 10.0  # Seconds between writes of the buffered records
+}
+
+# Application command sync (utils/command_sync.py)
+COMMAND_SYNC = {
+    # Hash of the command tree at the last successful sync, per application and scope
+    'STATE_FILE': os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'command_sync.json'),
+    'DEV_GUILD_ID': int(os.getenv('DEV_GUILD_ID')) if os.getenv('DEV_GUILD_ID') else None,  # Sync to this guild only
+    'FORCE': os.getenv('FORCE_COMMAND_SYNC', '').lower() in ('1', 'true', 'yes')  # Sync even if unchanged
+}
+
+# Gateway intents and member cache (utils/members.py)
+MEMBERS = {
+    # No members/message content intents, no guild chunking, no member cache; names fetched on demand
+    'LOW_MEMORY': os.getenv('LOW_MEMORY_MODE', '').lower() in ('1', 'true', 'yes'),
+    'NAME_CACHE_SIZE': 10000,  # User names kept from on-demand lookups
+    'NAME_TTL': 3600  # Seconds before a looked-up name is fetched again
+}
+
+# Minecraft server integration (cogs/minecraft.py)
+MINECRAFT = {
+    # host[:port] of each server, comma separated; the cog stays idle without any
+    'SERVERS': [
+        address.strip()
+        for address in (os.getenv('MINECRAFT_SERVERS') or os.getenv('MINECRAFT_SERVER') or '').split(',')
+        if address.strip()
+    ],
+    'UPDATE_INTERVAL': 60,  # Seconds between background status polls of each server
+    'STATUS_TTL': 90,  # Seconds a polled status is served as is; longer than UPDATE_INTERVAL so polls keep it fresh
+    'STATUS_STALE_TTL': 600,  # Older statuses are served up to this age while a refresh runs in the background
+    'STATUS_TIMEOUT': 5,  # Seconds per DNS lookup and status request
+    'BACKOFF_MAX': 900,  # Longest wait between polls of a server that keeps failing
+    # Online-mode servers: /mc_link checks the name with Mojang and stores the account UUID
+    'ONLINE_MODE': os.getenv('MINECRAFT_ONLINE_MODE', '1').lower() in ('1', 'true', 'yes'),
+    'PROFILE_API': 'https://api.mojang.com/users/profiles/minecraft/{name}',
+    'PROFILE_API_TIMEOUT': 5,  # Seconds
+    'LINK_CACHE_TTL': 3600,  # Seconds before a guild's link index is reloaded from the database
+    # RCON of the servers (same host, one password), used to send /mc_verify codes in game; unset disables it
+    'RCON_PASSWORD': os.getenv('MINECRAFT_RCON_PASSWORD'),
+    'RCON_PORT': int(os.getenv('MINECRAFT_RCON_PORT', '25575')),
+    'RCON_TIMEOUT': 5,  # Seconds per connection and command
+    'VERIFY_CODE_TTL': 600  # Seconds a link verification code stays valid
+}
+
+# Automatic rewards for time played on the Minecraft servers (utils/playtime.py)
+PLAYTIME = {
+    'ENABLED': os.getenv('MINECRAFT_PLAYTIME_REWARDS', '').lower() in ('1', 'true', 'yes'),
+    'REWARD': 10,  # Coins per PERIOD online, credited to the linked member in every guild with a link
+    'PERIOD': 600,  # Seconds
+    # Longest gap between two status samples still counted as continuous play (missed polls, backoff)
+    'MAX_GAP': 300
+}
+
+# Permission levels (utils/permissions.py): 0 everyone, 1 helpers (manage messages),
+# 2 moderators (manage server), 3 administrators. Guilds override these with /set_permission.
+PERMISSIONS = {
+    'COMMAND_LEVELS': {
+        'admin_set': 3,
+        'admin_reset': 3,
+        'set_currency': 3,
+        'server_settings': 3,
+        'add_level': 3,
+        'edit_level': 3,
+        'remove_level': 3,
+        'mc_reward': 3,
+        'mc_confirm': 2,
+        'set_permission': 3,
+        'get_permission': 2,
+        'mute': 2,
+        'unmute': 2,
+        'kick': 2,
+        'warn': 1,
+        'unwarn': 1
+    },
+    'CACHE_TTL': 3600  # Seconds before a guild's command levels are reloaded from the database
+}
+
+# Database migrations applied by the bot at startup
+MIGRATIONS = {
+    # Migrations marked LOCKS_TABLES (e.g. 0003, which copies transactions under an exclusive lock)
+    # stop the start unless this is set; otherwise apply them with `alembic upgrade head`
+    'ALLOW_LOCKING': os.getenv('MIGRATIONS_ALLOW_LOCKING', '').lower() in ('1', 'true', 'yes')
+}
+
+# Per-guild settings (guild_settings table, utils/settings.py); unset columns use the defaults above
+GUILD_SETTINGS = {
+    'REFRESH_INTERVAL': 60  # Seconds between reloads of settings changed by other bot processes
+}
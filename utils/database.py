@@ -1,20 +1,31 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, BigInteger, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import (
+    create_engine, Column, Integer, String, BigInteger, Boolean, DateTime, ForeignKey, UniqueConstraint, Index,
+    Sequence, text
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
-import sys
+import logging
 from sqlalchemy.exc import SQLAlchemyError
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from utils.config import SQL
+from utils.metrics import track_pool, DB_SESSION_ERRORS
+from utils.sqltrace import instrument_engine
+from utils.tracing import current_trace
+
+log = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set!")
 
-print(f"Connecting to database...", file=sys.stderr)
+log.info("Connecting to database")
 engine = create_engine(
     DATABASE_URL,
-    echo=True,  # SQL logging
+    echo=SQL['ECHO'],  # Log every statement (SQL_ECHO), for debugging; see the slow query log
     pool_pre_ping=True,  # Enable connection health checks
     pool_recycle=3600,  # Recycle connections every hour
     pool_size=5,  # Maximum number of permanent connections
@@ -30,6 +41,37 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_async_database_url(url: str):
+    """Convert DATABASE_URL to an asyncpg URL (asyncpg does not understand sslmode)"""
+    url = make_url(url)
+    query = dict(url.query)
+    query.pop('sslmode', None)
+    return url.set(drivername='postgresql+asyncpg', query=query)
+
+# Async engine used by the cogs, so database round trips don't block the event loop
+async_engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    echo=SQL['ECHO'],  # Log every statement (SQL_ECHO), for debugging; see the slow query log
+    pool_pre_ping=True,  # Enable connection health checks
+    pool_recycle=3600,  # Recycle connections every hour
+    pool_size=5,  # Maximum number of permanent connections
+    max_overflow=10,  # Maximum number of additional temporary connections
+    connect_args={
+        "ssl": "require",  # Force SSL mode
+        "timeout": 10,  # Connection timeout in seconds
+    }
+)
+
+# expire_on_commit=False: attributes are read after commit and async sessions can't lazy load
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Statement timing, per-command query counts and the slow query log (utils/sqltrace.py)
+instrument_engine(engine, 'sync')
+instrument_engine(async_engine.sync_engine, 'async')
+track_pool(engine, 'sync')
+track_pool(async_engine.sync_engine, 'async')
+
 Base = declarative_base()
 
 class UserProfile(Base):
@@ -47,16 +89,32 @@ class UserProfile(Base):
         UniqueConstraint('user_id', 'guild_id', name='unique_user_guild'),
     )
 
+# Leaderboard index: /top reads the first rows of a guild straight from the index
+Index(
+    'ix_user_profiles_guild_balance',
+    UserProfile.guild_id,
+    UserProfile.balance.desc(),
+    UserProfile.user_id.desc()
+)
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Part of a composite key, so the sequence (and default) of migration 0003 is named explicitly
+    id = Column(
+        Integer, Sequence('transactions_id_seq'), primary_key=True, autoincrement=True,
+        server_default=text("nextval('transactions_id_seq')")
+    )
     from_user_id = Column(BigInteger)
     to_user_id = Column(BigInteger)
     guild_id = Column(BigInteger)
     amount = Column(Integer)
     transaction_type = Column(String)  # 'transfer', 'daily', 'admin_set', etc.
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key, so part of the primary key (see utils/archive.py)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    # Monthly partitions are created by migrations and utils.archive.ensure_partitions
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
 
 class ServiceLevel(Base):
     __tablename__ = "service_levels"
@@ -69,23 +127,104 @@ class ServiceLevel(Base):
     color = Column(Integer)
     benefits = Column(String)  # Store as JSON string
 
+class MinecraftLink(Base):
+    """A member's Minecraft account in a guild (/mc_link), see utils/minecraft_links.py"""
+    __tablename__ = "minecraft_links"
+
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)  # Discord server ID
+    user_id = Column(BigInteger, nullable=False)  # Discord user ID
+    minecraft_name = Column(String(16), nullable=False)
+    name_key = Column(String(16), nullable=False)  # casefold() of minecraft_name, for lookups
+    minecraft_uuid = Column(String(32))  # Without dashes; None when it couldn't be looked up
+    verified = Column(Boolean, nullable=False, default=False, server_default=text('false'))  # Proven to be the member's
+    verify_code = Column(String(8))  # Pending one-time code from /mc_link or /mc_verify
+    verify_expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # One Minecraft account per member and one member per Minecraft name, per guild
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'user_id', name='uq_minecraft_links_guild_user'),
+        UniqueConstraint('guild_id', 'name_key', name='uq_minecraft_links_guild_name'),
+    )
+
+class CommandPermission(Base):
+    """A guild's override of a command's required permission level, see utils/permissions.py"""
+    __tablename__ = "command_permissions"
+
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)  # Discord server ID
+    command = Column(String(32), nullable=False)  # App command qualified name
+    level = Column(Integer, nullable=False)  # 0 everyone .. 3 administrators
+
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'command', name='uq_command_permissions_guild_command'),
+    )
+
+class GuildSetting(Base):
+    """A guild's settings; NULL columns fall back to the defaults in utils/config.py"""
+    __tablename__ = "guild_settings"
+
+    guild_id = Column(BigInteger, primary_key=True)  # Discord server ID
+    currency_name = Column(String(32))
+    currency_symbol = Column(String(64))
+    currency_format = Column(String(64))
+    default_balance = Column(Integer)
+    leaderboard_size = Column(Integer)
+    version = Column(Integer, nullable=False, default=1)  # Incremented by every update
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Indexes are created by migrations (migrations/versions), declared here so autogenerate sees them
+Index('ix_transactions_guild_created', Transaction.guild_id, Transaction.created_at)
+# /history: covering indexes, one per side of a transfer (see utils/history.py)
+Index(
+    'ix_transactions_guild_from_history',
+    Transaction.guild_id, Transaction.from_user_id, Transaction.created_at.desc(), Transaction.id.desc(),
+    postgresql_include=['to_user_id', 'amount', 'transaction_type']
+)
+Index(
+    'ix_transactions_guild_to_history',
+    Transaction.guild_id, Transaction.to_user_id, Transaction.created_at.desc(), Transaction.id.desc(),
+    postgresql_include=['from_user_id', 'amount', 'transaction_type']
+)
+Index('ix_service_levels_guild_required_balance', ServiceLevel.guild_id, ServiceLevel.required_balance)
+Index('ix_guild_settings_updated_at', GuildSetting.updated_at)
+
 @contextmanager
 def get_db():
     """Database session context manager"""
     db = SessionLocal()
+    trace = current_trace()
+    if trace:
+        trace.session_opened()
     try:
         yield db
     except SQLAlchemyError as e:
         db.rollback()
-        print(f"Database error: {str(e)}", file=sys.stderr)
+        DB_SESSION_ERRORS.labels(type(e).__name__).inc()
+        log.error("Database error, session rolled back", extra={'data': {'error': str(e)}})
         raise
     finally:
         db.close()
+        if trace:
+            trace.session_closed()
 
-print("Creating database tables...", file=sys.stderr)
-try:
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully!", file=sys.stderr)
-except Exception as e:
-    print(f"Error creating database tables: {e}", file=sys.stderr)
-    raise
\ No newline at end of file
+@asynccontextmanager
+async def get_async_db():
+    """Async database session context manager"""
+    db = AsyncSessionLocal()
+    # Counted against the current command, see benchmarks/check_query_budget.py
+    trace = current_trace()
+    if trace:
+        trace.session_opened()
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        await db.rollback()
+        DB_SESSION_ERRORS.labels(type(e).__name__).inc()
+        log.error("Database error, session rolled back", extra={'data': {'error': str(e)}})
+        raise
+    finally:
+        await db.close()
+        if trace:
+            trace.session_closed()
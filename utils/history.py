@@ -0,0 +1,78 @@
+from sqlalchemy import text
+
+# A user's statement is every transaction they sent or received, newest first.
+# Each side is read from its own covering index (ix_transactions_guild_from_history /
+# ix_transactions_guild_to_history), so both branches are index-only scans that start
+# at the cursor, and Postgres merges them. Pages are addressed by the (created_at, id)
+# of their first or last row instead of an OFFSET, so a deep page costs the same as
+# the first one.
+_HISTORY_TEMPLATE = """
+    (SELECT id, created_at, from_user_id, to_user_id, amount, transaction_type
+     FROM transactions
+     WHERE guild_id = :guild_id AND from_user_id = :user_id{cursor}
+     ORDER BY created_at {order}, id {order}
+     LIMIT :limit)
+    UNION ALL
+    (SELECT id, created_at, from_user_id, to_user_id, amount, transaction_type
+     FROM transactions
+     WHERE guild_id = :guild_id AND to_user_id = :user_id
+       AND from_user_id IS DISTINCT FROM :user_id{cursor}
+     ORDER BY created_at {order}, id {order}
+     LIMIT :limit)
+    ORDER BY created_at {order}, id {order}
+    LIMIT :limit
+"""
+
+FIRST_PAGE_SQL = text(_HISTORY_TEMPLATE.format(cursor='', order='DESC'))
+OLDER_SQL = text(_HISTORY_TEMPLATE.format(
+    cursor='\n       AND (created_at, id) < (:created_at, :id)', order='DESC'
+))
+NEWER_SQL = text(_HISTORY_TEMPLATE.format(
+    cursor='\n       AND (created_at, id) > (:created_at, :id)', order='ASC'
+))
+
+
+class HistoryPage:
+    """One page of a user's statement, newest first"""
+
+    def __init__(self, rows, has_older: bool, has_newer: bool):
+        self.rows = rows
+        self.has_older = has_older
+        self.has_newer = has_newer
+
+    @property
+    def first_key(self):
+        """(created_at, id) of the newest row, the cursor for the newer page"""
+        return (self.rows[0].created_at, self.rows[0].id) if self.rows else None
+
+    @property
+    def last_key(self):
+        """(created_at, id) of the oldest row, the cursor for the older page"""
+        return (self.rows[-1].created_at, self.rows[-1].id) if self.rows else None
+
+
+async def fetch_history_page(db, guild_id: int, user_id: int, page_size: int,
+                             older_than=None, newer_than=None) -> HistoryPage:
+    """Fetch the page before older_than or after newer_than, or the newest page.
+
+    Cursors are (created_at, id) keys taken from HistoryPage.first_key / last_key.
+    One extra row is fetched to know whether there is a page beyond this one.
+    """
+    params = {'guild_id': guild_id, 'user_id': user_id, 'limit': page_size + 1}
+
+    if newer_than is not None:
+        params['created_at'], params['id'] = newer_than
+        rows = (await db.execute(NEWER_SQL, params)).all()
+        has_newer = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return HistoryPage(rows, has_older=True, has_newer=has_newer)
+
+    if older_than is not None:
+        params['created_at'], params['id'] = older_than
+        rows = (await db.execute(OLDER_SQL, params)).all()
+        has_newer = True
+    else:
+        rows = (await db.execute(FIRST_PAGE_SQL, params)).all()
+        has_newer = False
+
+    return HistoryPage(rows[:page_size], has_older=len(rows) > page_size, has_newer=has_newer)
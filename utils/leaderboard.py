@@ -0,0 +1,56 @@
+from sqlalchemy import desc, func, select, tuple_
+from utils.config import LEADERBOARD
+from utils.database import UserProfile
+import time
+
+# guild_id -> (profile count, monotonic time it was counted)
+_profile_counts = {}
+
+
+async def iter_top_profiles(db, guild_id: int, batch_size: int, max_batches: int):
+    """Yield (rank, user_id, balance) richest first, fetching batch_size rows at a time.
+
+    Uses keyset pagination over the (guild_id, balance DESC, user_id DESC) index, so
+    each batch is an index-only range scan no matter how large the guild is.
+    """
+    rank = 0
+    last_key = None
+
+    for _ in range(max_batches):
+        query = select(UserProfile.user_id, UserProfile.balance).filter(
+            UserProfile.guild_id == guild_id
+        )
+        if last_key is not None:
+            query = query.filter(tuple_(UserProfile.balance, UserProfile.user_id) < last_key)
+
+        rows = (await db.execute(
+            query.order_by(desc(UserProfile.balance), desc(UserProfile.user_id)).limit(batch_size)
+        )).all()
+
+        for user_id, balance in rows:
+            rank += 1
+            yield rank, user_id, balance
+
+        if len(rows) < batch_size:
+            return
+        last_key = (rows[-1].balance, rows[-1].user_id)
+
+
+async def count_profiles(db, guild_id: int) -> int:
+    """Number of profiles in a guild, counted at most once per COUNT_TTL seconds"""
+    cached = _profile_counts.get(guild_id)
+    if cached and time.monotonic() - cached[1] < LEADERBOARD['COUNT_TTL']:
+        return cached[0]
+
+    count = await db.scalar(
+        select(func.count()).select_from(UserProfile).filter(UserProfile.guild_id == guild_id)
+    )
+    _profile_counts[guild_id] = (count, time.monotonic())
+    return count
+
+
+def note_profile_created(guild_id: int):
+    """Keep the cached count current when this process creates a profile"""
+    cached = _profile_counts.get(guild_id)
+    if cached:
+        _profile_counts[guild_id] = (cached[0] + 1, cached[1])
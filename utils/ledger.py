@@ -0,0 +1,207 @@
+from sqlalchemy import insert
+from utils.config import LEDGER
+from utils.database import get_async_db, Transaction
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+
+class WriteBehindLedger:
+    """Bounded in-process queue of Transaction rows, inserted in batches by a background task.
+
+    Durability: close() drains the queue into the database on shutdown. Rows that
+    can't be written then, or that don't fit in a full queue within ENQUEUE_TIMEOUT,
+    are appended to SPILL_FILE and inserted on the next start(). Only a crash loses
+    the rows still in memory.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float,
+                 enqueue_timeout: float, spill_file: str):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_file = spill_file
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._closing = False
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.failed_flushes = 0
+        self.spilled_rows = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        """Rows waiting to be written"""
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'flushed_rows': self.flushed_rows,
+            'flushed_batches': self.flushed_batches,
+            'failed_flushes': self.failed_flushes,
+            'spilled_rows': self.spilled_rows,
+        }
+
+    async def start(self):
+        """Insert rows spilled by a previous run and start the flusher"""
+        if self._task:
+            return
+        self._closing = False
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, row: dict):
+        """Queue a Transaction row; waits while the queue is full, then spills to disk"""
+        if self._closing or not self._task:
+            self._spill([row])
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Ledger queue full, spilling row to disk", extra={'data': {'waited_s': self.enqueue_timeout}})
+            self._spill([row])
+            return
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def close(self):
+        """Stop accepting rows, let the flusher write out the queue, spill what can't be written"""
+        self._closing = True
+        if self._task:
+            await self._task
+            self._task = None
+
+        # Rows that were waiting on a full queue when the flusher stopped
+        remaining = self._drain(self._queue.qsize())
+        while remaining:
+            batch, remaining = remaining[:self.batch_size], remaining[self.batch_size:]
+            if not await self._flush(batch):
+                self._spill(batch + remaining)
+                break
+
+    async def _run(self):
+        backoff = self.flush_interval
+        while not (self._closing and self._queue.empty()):
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            while not await self._flush(batch):
+                if self._closing:
+                    self._spill(batch + self._drain(self._queue.qsize()))
+                    return
+                # Keep the batch and retry; the bounded queue pushes back on commands meanwhile
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            backoff = self.flush_interval
+
+    async def _next_batch(self):
+        """Collect rows until BATCH_SIZE or FLUSH_INTERVAL after the first one; [] if none came"""
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            batch.extend(self._drain(self.batch_size - len(batch)))
+            timeout = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _drain(self, limit: int):
+        rows = []
+        while len(rows) < limit and not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    async def _flush(self, batch) -> bool:
+        """Insert a batch with one multi-row INSERT. Returns False if it failed"""
+        try:
+            async with get_async_db() as db:
+                await db.execute(insert(Transaction), batch)
+                await db.commit()
+        except Exception:
+            self.failed_flushes += 1
+            log.warning("Failed to flush ledger rows", exc_info=True, extra={'data': {'rows': len(batch)}})
+            return False
+        self.flushed_rows += len(batch)
+        self.flushed_batches += 1
+        return True
+
+    def _spill(self, rows):
+        os.makedirs(os.path.dirname(self.spill_file), exist_ok=True)
+        with open(self.spill_file, 'a', encoding='utf-8') as spill:
+            for row in rows:
+                spill.write(json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + '\n')
+        self.spilled_rows += len(rows)
+
+    async def _replay_spill(self):
+        if not os.path.exists(self.spill_file):
+            return
+        with open(self.spill_file, encoding='utf-8') as spill:
+            lines = [line for line in spill if line.strip()]
+        rows = [json.loads(line) for line in lines]
+        for row in rows:
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+
+        for start in range(0, len(rows), self.batch_size):
+            if not await self._flush(rows[start:start + self.batch_size]):
+                # Keep only the rows not inserted yet, or the next start would insert the others again
+                partial = f"{self.spill_file}.partial"
+                with open(partial, 'w', encoding='utf-8') as spill:
+                    spill.writelines(lines[start:])
+                os.replace(partial, self.spill_file)
+                log.warning("Keeping unreplayed ledger rows for the next start", extra={'data': {
+                    'path': self.spill_file, 'replayed': start, 'kept': len(rows) - start
+                }})
+                return
+        os.remove(self.spill_file)
+        log.info("Replayed spilled ledger rows", extra={'data': {'rows': len(rows)}})
+
+
+ledger = WriteBehindLedger(
+    max_queue=LEDGER['MAX_QUEUE'],
+    batch_size=LEDGER['BATCH_SIZE'],
+    flush_interval=LEDGER['FLUSH_INTERVAL'],
+    enqueue_timeout=LEDGER['ENQUEUE_TIMEOUT'],
+    spill_file=LEDGER['SPILL_FILE']
+)
+
+
+def transaction_row(from_user_id: int, to_user_id: int, guild_id: int, amount: int, transaction_type: str) -> dict:
+    """Column values of a Transaction, timestamped when the balance change happens"""
+    return {
+        'from_user_id': from_user_id,
+        'to_user_id': to_user_id,
+        'guild_id': guild_id,
+        'amount': amount,
+        'transaction_type': transaction_type,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def record_transaction(db, **fields):
+    """Record a Transaction as part of the session's next commit_with_ledger()"""
+    row = transaction_row(**fields)
+    if LEDGER['WRITE_BEHIND']:
+        db.info.setdefault('ledger_rows', []).append(row)
+    else:
+        db.add(Transaction(**row))
+
+
+async def commit_with_ledger(db):
+    """Commit the session; in write-behind mode queue its Transaction rows afterwards"""
+    await db.commit()
+    for row in db.info.pop('ledger_rows', []):
+        await ledger.enqueue(row)
@@ -0,0 +1,69 @@
+from bisect import bisect_right
+from sqlalchemy import select
+from utils.config import SERVICE_LEVELS
+from utils.database import ServiceLevel
+import json
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class GuildLevels:
+    """A guild's service levels sorted by required_balance, benefits already decoded"""
+
+    def __init__(self, levels):
+        self.levels = sorted(
+            (self._to_dict(level) for level in levels),
+            key=lambda level: level['required_balance']
+        )
+        self._thresholds = [level['required_balance'] for level in self.levels]
+        self._by_id = {level['id']: level for level in self.levels}
+        self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _to_dict(level: ServiceLevel) -> dict:
+        try:
+            benefits = json.loads(level.benefits)
+        except (TypeError, json.JSONDecodeError) as e:
+            log.warning("JSON decode error for service level benefits", extra={'data': {'level_id': level.id, 'error': str(e)}})
+            benefits = []
+
+        return {
+            'id': level.id,
+            'name': level.name,
+            'emoji': level.emoji,
+            'required_balance': level.required_balance,
+            'color': level.color,
+            'benefits': benefits
+        }
+
+    def resolve(self, balance: int):
+        """(current level or None, next level or None) for a balance, with one bisect"""
+        index = bisect_right(self._thresholds, balance)
+        current_level = self.levels[index - 1] if index else None
+        next_level = self.levels[index] if index < len(self.levels) else None
+        return current_level, next_level
+
+    def get(self, level_id: int):
+        return self._by_id.get(level_id)
+
+
+_level_cache = {}
+
+
+async def get_guild_levels(db, guild_id: int) -> GuildLevels:
+    """Cached service levels of a guild; queries the database only on a miss"""
+    cached = _level_cache.get(guild_id)
+    if cached and time.monotonic() - cached.loaded_at < SERVICE_LEVELS['cache_ttl']:
+        return cached
+
+    levels = (await db.scalars(select(ServiceLevel).filter(ServiceLevel.guild_id == guild_id))).all()
+    cached = GuildLevels(levels)
+    _level_cache[guild_id] = cached
+    return cached
+
+
+def invalidate_levels(guild_id: int):
+    """Drop a guild's cached levels after they were added, edited or removed"""
+    _level_cache.pop(guild_id, None)
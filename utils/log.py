@@ -0,0 +1,140 @@
+from utils.config import LOGGING, SQL
+from utils.tracing import current_trace
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+# Logging pipeline: loggers hand records to a bounded in-memory queue and return, a
+# background thread (QueueListener) formats them as JSON lines and writes them out.
+# A slow stderr pipe therefore never blocks the event loop; when the queue is full,
+# records are dropped and counted instead.
+#
+#     log = logging.getLogger(__name__)
+#     log.info("Transfer command called", extra={'sampled': True})
+#     log.warning("Ledger flush failed", extra={'data': {'rows': 500}})
+#
+# Records logged while a slash command runs get its guild, user and command from the
+# current CommandTrace. INFO records marked sampled are kept with LOGGING['SAMPLE_RATE'].
+
+STRUCTURED_FIELDS = ('guild', 'user', 'command', 'duration_ms', 'sample_rate')
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        entry.update(getattr(record, 'data', None) or {})
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class CommandContextFilter(logging.Filter):
+    """Fill guild/user/command from the slash command the logging task is handling"""
+
+    def filter(self, record):
+        trace = current_trace()
+        if trace:
+            for field, value in (('guild', trace.guild_id), ('user', trace.user_id), ('command', trace.command)):
+                if getattr(record, field, None) is None:
+                    setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a share of the INFO-and-below records logged with extra={'sampled': True}"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or record.levelno > logging.INFO:
+            return True
+        record.sample_rate = self.rate
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never waits: a full queue drops the record"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback here, the writer thread only serializes
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+def setup_logging():
+    """Route every logger through the queue; call once at startup"""
+    global _listener
+    if _listener:
+        return
+
+    formatter = JsonFormatter()
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+    handlers = [console]
+
+    # Slow queries (utils/sqltrace.py) also go to their own file
+    if SQL['SLOW_QUERY_LOG']:
+        os.makedirs(os.path.dirname(os.path.abspath(SQL['SLOW_QUERY_LOG'])), exist_ok=True)
+        slow_queries = logging.FileHandler(SQL['SLOW_QUERY_LOG'], encoding='utf-8')
+        slow_queries.setFormatter(formatter)
+        slow_queries.addFilter(logging.Filter('utils.sqltrace'))
+        handlers.append(slow_queries)
+
+    log_queue = queue.Queue(maxsize=LOGGING['QUEUE_SIZE'])
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(LOGGING['SAMPLE_RATE']))
+    handler.addFilter(CommandContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOGGING['LEVEL'])
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out what is still queued and stop the writer thread"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+        if DroppingQueueHandler.dropped:
+            print(f"Logging queue was full, dropped {DroppingQueueHandler.dropped} records", file=sys.stderr)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from utils.config import MEMBERS
+import discord
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Member lookups that work without the member cache. In low-memory mode (MEMBERS['LOW_MEMORY'])
+# the bot runs without the members intent and doesn't chunk guilds, so bot.get_user() and
+# guild.members only know the few users seen recently. Names missing from the cache are
+# requested over the gateway (guild.query_members, up to 100 ids per request, no privileged
+# intent needed) and kept in a small LRU.
+
+QUERY_MEMBERS_MAX = 100  # Ids per gateway member request
+
+
+def client_options(low_memory: bool) -> dict:
+    """Keyword arguments for commands.Bot: intents and member cache policy"""
+    if not low_memory:
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.members = True  # Required for member operations
+        return {'intents': intents}
+
+    # Slash commands need no gateway intents; guilds keeps the guild and channel cache
+    intents = discord.Intents.none()
+    intents.guilds = True
+    return {
+        'intents': intents,
+        'chunk_guilds_at_startup': False,
+        'member_cache_flags': discord.MemberCacheFlags.none(),  # Only the bot's own member
+    }
+
+
+class NameCache:
+    """user id -> display name, least recently used entries evicted past max_size"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._names = OrderedDict()
+
+    def get(self, user_id: int):
+        entry = self._names.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        self._names.move_to_end(user_id)
+        return entry[0]
+
+    def put(self, user_id: int, name: str):
+        self._names[user_id] = (name, time.monotonic())
+        self._names.move_to_end(user_id)
+        while len(self._names) > self.max_size:
+            self._names.popitem(last=False)
+
+
+names = NameCache(MEMBERS['NAME_CACHE_SIZE'], MEMBERS['NAME_TTL'])
+
+
+async def resolve_names(bot, guild, user_ids) -> dict:
+    """{user_id: name} for the ids that can be resolved; users who left the guild are missing"""
+    resolved, missing = {}, []
+    for user_id in user_ids:
+        user = bot.get_user(user_id)
+        name = user.name if user else names.get(user_id)
+        if name:
+            resolved[user_id] = name
+        else:
+            missing.append(user_id)
+
+    if missing and guild is not None:
+        for start in range(0, len(missing), QUERY_MEMBERS_MAX):
+            try:
+                members = await guild.query_members(
+                    user_ids=missing[start:start + QUERY_MEMBERS_MAX], limit=QUERY_MEMBERS_MAX, cache=False
+                )
+            except (discord.HTTPException, discord.ClientException, TimeoutError):
+                log.warning("Member lookup failed", extra={'data': {'guild_id': guild.id}}, exc_info=True)
+                break
+            for member in members:
+                names.put(member.id, member.name)
+                resolved[member.id] = member.name
+    return resolved
+
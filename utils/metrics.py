@@ -0,0 +1,149 @@
+from discord.ext import commands
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from functools import lru_cache
+from utils.tracing import start_trace
+import logging
+import math
+import re
+
+log = logging.getLogger(__name__)
+
+# Prometheus metrics, served by start_metrics_server() on METRICS['ADDR']:METRICS['PORT'].
+# Commands are timed by InstrumentedCog, SQL statements by utils.sqltrace.instrument_engine().
+
+COMMAND_LATENCY = Histogram(
+    'bot_command_duration_seconds',
+    'Slash command handling time',
+    ['command', 'status']
+)
+INTERACTION_ERRORS = Counter(
+    'bot_interaction_errors_total',
+    'Slash commands that raised instead of responding',
+    ['command', 'error']
+)
+COMMAND_QUERIES = Histogram(
+    'bot_command_queries',
+    'SQL statements issued per slash command',
+    ['command'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50)
+)
+DB_QUERY_LATENCY = Histogram(
+    'bot_db_query_duration_seconds',
+    'SQL statement execution time by statement shape',
+    ['engine', 'shape'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+DB_SESSION_ERRORS = Counter(
+    'bot_db_session_errors_total',
+    'Sessions from get_db/get_async_db rolled back after a database error',
+    ['error']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'bot_db_pool_checked_out',
+    'Connections currently checked out of the pool',
+    ['engine']
+)
+DB_POOL_OVERFLOW = Gauge(
+    'bot_db_pool_overflow',
+    'Connections open beyond pool_size (negative while the pool is not full)',
+    ['engine']
+)
+GATEWAY_LATENCY = Gauge(
+    'bot_gateway_latency_seconds',
+    'Discord gateway heartbeat latency'
+)
+LEDGER_QUEUE_DEPTH = Gauge(
+    'bot_ledger_queue_depth',
+    'Transaction rows waiting in the write-behind ledger'
+)
+STARTUP_PHASE = Gauge(
+    'bot_startup_phase_seconds',
+    'Time spent in each startup phase (utils/startup.py)',
+    ['phase']
+)
+TIME_TO_FIRST_COMMAND = Gauge(
+    'bot_time_to_first_command_seconds',
+    'Seconds from process start to the first slash command completed'
+)
+MINECRAFT_STATUS_REQUESTS = Counter(
+    'bot_minecraft_status_requests_total',
+    'Status requests sent to Minecraft servers (utils/minecraft_status.py)',
+    ['server', 'result']
+)
+
+_VERB = re.compile(r'^\s*(\w+)')
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def statement_shape(statement: str) -> str:
+    """Low-cardinality label for a statement: its verb and the first table it touches"""
+    verb = _VERB.match(statement)
+    table = _TABLE.search(statement)
+    return ' '.join(part[1] for part in (verb, table) if part).upper() if verb else 'OTHER'
+
+
+def track_pool(engine, name: str):
+    """Pool gauges for engine (a sync Engine; pass async_engine.sync_engine)"""
+    DB_POOL_CHECKED_OUT.labels(name).set_function(engine.pool.checkedout)
+    DB_POOL_OVERFLOW.labels(name).set_function(engine.pool.overflow)
+
+
+def track_gateway(bot):
+    # bot.latency is nan until the first heartbeat
+    GATEWAY_LATENCY.set_function(lambda: 0.0 if math.isnan(bot.latency) else bot.latency)
+
+
+def track_ledger(ledger):
+    LEDGER_QUEUE_DEPTH.set_function(lambda: ledger.depth)
+
+
+def start_metrics_server(port: int, addr: str):
+    """Serve /metrics from a daemon thread"""
+    start_http_server(port, addr=addr)
+
+
+class InstrumentedCog(commands.Cog):
+    """Cog base class that times every app command it defines and counts the ones that fail.
+
+    Each command also gets a CommandTrace (utils/tracing.py), which the SQL
+    instrumentation uses to count its queries and label slow ones.
+    """
+
+    async def interaction_check(self, interaction) -> bool:
+        interaction.extras['trace'] = start_trace(
+            interaction.command.qualified_name if interaction.command else 'unknown',
+            interaction.guild_id,
+            interaction.user.id
+        )
+        return True
+
+    def _observe(self, interaction, status: str):
+        trace = interaction.extras.get('trace')
+        if trace is not None:
+            COMMAND_LATENCY.labels(trace.command, status).observe(trace.elapsed)
+            COMMAND_QUERIES.labels(trace.command).observe(trace.queries)
+            log.log(
+                logging.INFO if status == 'ok' else logging.WARNING,
+                "Command finished",
+                extra={
+                    'sampled': True,
+                    'duration_ms': round(trace.elapsed * 1000, 1),
+                    'data': {'status': status, 'queries': trace.queries, 'sessions': trace.sessions,
+                             'query_ms': round(trace.query_time * 1000, 1)}
+                }
+            )
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        # Every InstrumentedCog hears this event; only the command's own cog records it
+        if getattr(command, 'binding', None) is self:
+            self._observe(interaction, 'ok')
+
+    async def cog_app_command_error(self, interaction, error):
+        self._observe(interaction, 'error')
+        original = getattr(error, 'original', error)
+        INTERACTION_ERRORS.labels(
+            interaction.command.qualified_name if interaction.command else 'unknown',
+            type(original).__name__
+        ).inc()
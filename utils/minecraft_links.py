@@ -0,0 +1,183 @@
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from utils.config import MINECRAFT
+from utils.database import MinecraftLink
+from datetime import datetime, timedelta
+import aiohttp
+import logging
+import re
+import secrets
+import time
+
+log = logging.getLogger(__name__)
+
+# Minecraft account <-> Discord member links (/mc_link). The table is the source of truth;
+# each guild's links are loaded once into GuildLinks, an index by case-folded Minecraft
+# name, UUID and Discord user, and kept current by link()/unlink(). Lookups are O(1) and
+# need neither the member cache nor member chunking.
+# A new link is unverified until the member enters the one-time code sent to the player in
+# game (/mc_verify) or an admin confirms it (/mc_confirm); only verified links are paid.
+# An unverified link doesn't hold the account: another member's /mc_link replaces it.
+
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_]{3,16}$')
+
+
+def name_key(name: str) -> str:
+    return name.casefold()
+
+
+class GuildLinks:
+    """A guild's Minecraft links, as {'user_id', 'name', 'uuid', 'verified'} entries"""
+
+    def __init__(self, links=()):
+        self._by_name = {}
+        self._by_uuid = {}
+        self._by_user = {}
+        for link in links:
+            self.add(link.user_id, link.minecraft_name, link.minecraft_uuid, link.verified)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._by_user)
+
+    def add(self, user_id: int, name: str, uuid: str = None, verified: bool = False):
+        self.remove(user_id)
+        entry = {'user_id': user_id, 'name': name, 'uuid': uuid, 'verified': verified}
+        self._by_user[user_id] = entry
+        self._by_name[name_key(name)] = entry
+        if uuid:
+            self._by_uuid[uuid] = entry
+
+    def remove(self, user_id: int):
+        entry = self._by_user.pop(user_id, None)
+        if entry:
+            self._by_name.pop(name_key(entry['name']), None)
+            self._by_uuid.pop(entry['uuid'], None)
+        return entry
+
+    def find(self, name: str = None, uuid: str = None):
+        """Link of a Minecraft player, by UUID (survives Minecraft renames) or else by name"""
+        if uuid:
+            entry = self._by_uuid.get(uuid.replace('-', ''))
+            if entry:
+                return entry
+        return self._by_name.get(name_key(name)) if name else None
+
+    def for_user(self, user_id: int):
+        return self._by_user.get(user_id)
+
+
+_links = {}
+
+
+async def get_guild_links(db, guild_id: int) -> GuildLinks:
+    """Link index of a guild; queries the database only on a miss"""
+    cached = _links.get(guild_id)
+    if cached and time.monotonic() - cached.loaded_at < MINECRAFT['LINK_CACHE_TTL']:
+        return cached
+
+    links = (await db.scalars(select(MinecraftLink).filter(MinecraftLink.guild_id == guild_id))).all()
+    cached = GuildLinks(links)
+    _links[guild_id] = cached
+    return cached
+
+
+async def link_account(db, guild_id: int, user_id: int, name: str, uuid: str = None) -> bool:
+    """Link (or relink) a member's Minecraft account and commit. Returns whether the link is verified.
+
+    Another member's unverified link of the same account is removed. Relinking the account
+    already linked keeps its verification; any other account starts unverified.
+    Raises IntegrityError when the name is linked to another member.
+    """
+    key = name_key(name)
+    if uuid:
+        claimed = or_(MinecraftLink.minecraft_uuid == uuid, MinecraftLink.name_key == key)
+        # The same account: same UUID, or same name on a link made without one
+        same_account = or_(
+            MinecraftLink.minecraft_uuid == uuid,
+            and_(MinecraftLink.minecraft_uuid.is_(None), MinecraftLink.name_key == key)
+        )
+    else:
+        claimed = same_account = MinecraftLink.name_key == key
+    replaced = (await db.scalars(delete(MinecraftLink).filter(
+        MinecraftLink.guild_id == guild_id, MinecraftLink.user_id != user_id, MinecraftLink.verified.is_(False), claimed
+    ).returning(MinecraftLink.user_id))).all()
+
+    statement = insert(MinecraftLink).values(
+        guild_id=guild_id, user_id=user_id, minecraft_name=name, name_key=key, minecraft_uuid=uuid
+    )
+    verified = (await db.execute(statement.on_conflict_do_update(
+        constraint='uq_minecraft_links_guild_user',
+        set_={
+            'minecraft_name': name, 'name_key': key, 'minecraft_uuid': uuid,
+            'verified': and_(MinecraftLink.verified, same_account),
+            'verify_code': None, 'verify_expires_at': None
+        }
+    ).returning(MinecraftLink.verified))).scalar_one()
+    await db.commit()
+    links = await get_guild_links(db, guild_id)
+    for other_id in replaced:
+        links.remove(other_id)
+    links.add(user_id, name, uuid, verified)
+    return verified
+
+
+async def new_verify_code(db, guild_id: int, user_id: int) -> str:
+    """Give a member's link a fresh one-time code (replacing any pending one) and commit"""
+    code = secrets.token_hex(4)
+    await db.execute(update(MinecraftLink).filter(
+        MinecraftLink.guild_id == guild_id, MinecraftLink.user_id == user_id
+    ).values(
+        verify_code=code, verify_expires_at=datetime.utcnow() + timedelta(seconds=MINECRAFT['VERIFY_CODE_TTL'])
+    ))
+    await db.commit()
+    return code
+
+
+async def verify_link(db, guild_id: int, user_id: int, code: str = None):
+    """Mark a member's link verified and commit; with a code, only if it is the pending one.
+
+    Returns the verified entry, or None when there is no link or the code is wrong or expired.
+    """
+    conditions = [MinecraftLink.guild_id == guild_id, MinecraftLink.user_id == user_id]
+    if code is not None:
+        conditions += [
+            MinecraftLink.verify_code == code.strip().lower(), MinecraftLink.verify_expires_at > datetime.utcnow()
+        ]
+    row = (await db.execute(update(MinecraftLink).filter(*conditions).values(
+        verified=True, verify_code=None, verify_expires_at=None
+    ).returning(MinecraftLink.minecraft_name, MinecraftLink.minecraft_uuid))).first()
+    await db.commit()
+    if row is None:
+        return None
+    links = await get_guild_links(db, guild_id)
+    links.add(user_id, row.minecraft_name, row.minecraft_uuid, True)
+    return links.for_user(user_id)
+
+
+async def unlink_account(db, guild_id: int, user_id: int):
+    """Remove a member's link and commit. Returns the removed entry, or None"""
+    links = await get_guild_links(db, guild_id)
+    entry = links.for_user(user_id)
+    if entry is None:
+        return None
+    await db.execute(delete(MinecraftLink).filter(
+        MinecraftLink.guild_id == guild_id, MinecraftLink.user_id == user_id
+    ))
+    await db.commit()
+    return links.remove(user_id)
+
+
+async def lookup_profile(name: str):
+    """(name as Mojang spells it, UUID) of a Minecraft account; None when it doesn't exist.
+
+    Raises aiohttp.ClientError or TimeoutError when Mojang can't be reached.
+    """
+    timeout = aiohttp.ClientTimeout(total=MINECRAFT['PROFILE_API_TIMEOUT'])
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(MINECRAFT['PROFILE_API'].format(name=name)) as response:
+            if response.status in (204, 404):
+                return None
+            response.raise_for_status()
+            profile = await response.json()
+    return profile['name'], profile['id']
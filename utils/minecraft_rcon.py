@@ -0,0 +1,65 @@
+from utils.config import MINECRAFT
+import asyncio
+import json
+import struct
+
+# Minimal client for the Minecraft RCON protocol, used to send players their /mc_verify
+# code in game. One connection per command: codes are sent rarely, so nothing is pooled.
+# Packets are <length, request id, type> as little-endian int32s, then the payload and two
+# NUL bytes; the server answers a login with request id -1 when the password is wrong.
+
+LOGIN = 3
+COMMAND = 2
+
+
+class RconError(Exception):
+    """The server refused the RCON password or answered garbage"""
+
+
+def rcon_enabled() -> bool:
+    return bool(MINECRAFT['RCON_PASSWORD'])
+
+
+async def _send(writer, request_id: int, packet_type: int, payload: str):
+    body = payload.encode('utf-8') + b'\x00\x00'
+    writer.write(struct.pack('<iii', len(body) + 8, request_id, packet_type) + body)
+    await writer.drain()
+
+
+async def _receive(reader):
+    """(request id, payload) of the next packet"""
+    (length,) = struct.unpack('<i', await reader.readexactly(4))
+    if not 10 <= length <= 4096 + 10:
+        raise RconError(f"Bad RCON packet length {length}")
+    data = await reader.readexactly(length)
+    request_id, _ = struct.unpack('<ii', data[:8])
+    return request_id, data[8:-2].decode('utf-8', 'replace')
+
+
+async def _command(host: str, port: int, command: str) -> str:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await _send(writer, 1, LOGIN, MINECRAFT['RCON_PASSWORD'])
+        request_id, _ = await _receive(reader)
+        if request_id == -1:
+            raise RconError("RCON password refused")
+        await _send(writer, 2, COMMAND, command)
+        return (await _receive(reader))[1]
+    finally:
+        writer.close()
+
+
+async def run_command(address: str, command: str) -> str:
+    """Run a console command on the server at address (host[:port] as in MINECRAFT['SERVERS']).
+
+    Raises RconError, OSError or TimeoutError when the command can't be run.
+    """
+    host = address.rsplit(':', 1)[0] if address.count(':') == 1 else address
+    return await asyncio.wait_for(
+        _command(host, MINECRAFT['RCON_PORT'], command), MINECRAFT['RCON_TIMEOUT']
+    )
+
+
+async def tell(address: str, player: str, text: str):
+    """Show text to one player only (tellraw); player must be a validated Minecraft name"""
+    await run_command(address, f"tellraw {player} {json.dumps({'text': text, 'color': 'gold'})}")
@@ -0,0 +1,127 @@
+from mcstatus import JavaServer
+from utils.config import MINECRAFT
+from utils.metrics import MINECRAFT_STATUS_REQUESTS
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# One status cache per configured Minecraft server (MINECRAFT['SERVERS']), filled by a
+# background poller. Commands read the cache: a status younger than STATUS_TTL is served as
+# is, an older one (up to STATUS_STALE_TTL) is served while a refresh runs in the background.
+# Concurrent refreshes of a server share one request, so a burst of /mc_status sends at most
+# one ping per server. A failing server is polled with exponential backoff.
+
+
+class ServerStatus:
+    """Cached status of one server"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.server = None  # JavaServer, resolved (SRV/DNS) on first use and after failures
+        self.status = None
+        self.fetched_at = None
+        self.failures = 0
+        self.next_poll = 0.0
+        self._refresh = None
+
+    @property
+    def age(self):
+        """Seconds since the cached status was fetched, None if there is none"""
+        return None if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+    def cached(self):
+        """The cached status if it isn't older than STATUS_STALE_TTL; never waits"""
+        age = self.age
+        return self.status if age is not None and age < MINECRAFT['STATUS_STALE_TTL'] else None
+
+    async def get(self):
+        """Fresh status, a stale one while it is being refreshed, or None if the server can't be reached"""
+        age = self.age
+        if age is not None and age < MINECRAFT['STATUS_TTL']:
+            return self.status
+        if age is not None and age < MINECRAFT['STATUS_STALE_TTL']:
+            self.refresh()
+            return self.status
+        if self.failures and time.monotonic() < self.next_poll:
+            return None  # Backing off; commands don't get to hammer a server that is down
+        # Shielded: a caller giving up doesn't cancel the request the others are waiting on
+        await asyncio.shield(self.refresh())
+        return self.cached()
+
+    def refresh(self) -> asyncio.Task:
+        """Start a status request, or return the one already in flight"""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._fetch())
+        return self._refresh
+
+    async def _fetch(self) -> bool:
+        started = time.monotonic()
+        try:
+            if self.server is None:
+                self.server = await JavaServer.async_lookup(self.address, timeout=MINECRAFT['STATUS_TIMEOUT'])
+            status = await self.server.async_status()
+        except Exception as e:
+            self.failures += 1
+            self.server = None  # Resolve again next time, the server may have moved
+            delay = min(MINECRAFT['UPDATE_INTERVAL'] * 2 ** self.failures, MINECRAFT['BACKOFF_MAX'])
+            self.next_poll = time.monotonic() + delay
+            MINECRAFT_STATUS_REQUESTS.labels(self.address, 'error').inc()
+            log.warning("Failed to update Minecraft server status", extra={'data': {
+                'address': self.address, 'failures': self.failures, 'retry_in_s': delay, 'error': repr(e)
+            }})
+            return False
+
+        self.status = status
+        self.fetched_at = time.monotonic()
+        self.failures = 0
+        self.next_poll = self.fetched_at + MINECRAFT['UPDATE_INTERVAL']
+        MINECRAFT_STATUS_REQUESTS.labels(self.address, 'ok').inc()
+        log.debug("Updated Minecraft server status", extra={
+            'duration_ms': round((self.fetched_at - started) * 1000, 1),
+            'data': {'address': self.address, 'online': status.players.online}
+        })
+        return True
+
+
+class StatusPoller:
+    """Status caches of all configured servers and the task that keeps them fresh"""
+
+    def __init__(self, addresses):
+        self.servers = {address: ServerStatus(address) for address in addresses}
+        self.listeners = []  # Coroutine functions called with the poller after each polling round
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.servers
+
+    def get(self, address: str) -> ServerStatus:
+        return self.servers[address]
+
+    def find_player(self, name: str):
+        """(server, player) of an online player, from the cached samples only"""
+        wanted = name.casefold()
+        for server in self.servers.values():
+            status = server.cached()
+            for player in (status.players.sample or []) if status else ():
+                if player.name.casefold() == wanted:
+                    return server, player
+        return None
+
+    async def run(self):
+        """Poll every server that is due, concurrently, until cancelled"""
+        while True:
+            now = time.monotonic()
+            due = [server for server in self.servers.values() if server.next_poll <= now]
+            if due:
+                await asyncio.gather(*(server.refresh() for server in due))
+                for listener in self.listeners:
+                    try:
+                        await listener(self)
+                    except Exception:
+                        log.exception("Status listener failed", extra={'data': {'listener': listener.__qualname__}})
+            next_poll = min((server.next_poll for server in self.servers.values()), default=now + 60)
+            await asyncio.sleep(max(next_poll - time.monotonic(), 1.0))
+
+
+statuses = StatusPoller(MINECRAFT['SERVERS'])
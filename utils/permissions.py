@@ -1,63 +1,137 @@
 import discord
 from discord import app_commands
-from utils.database import get_db, ServiceLevel
-from utils.config import ERRORS
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from utils.database import get_async_db, CommandPermission
+from utils.config import ERRORS, PERMISSIONS
+import time
+
+# Permission checks without per-call work. A role's level is derived once from its
+# permission bits and kept per guild until a role event (on_guild_role_*) drops the guild.
+# A member's level is the highest of their roles' levels, taken from that table on every
+# check: the roles come with the interaction, so a role change counts at once.
+# The level each command requires comes from PERMISSIONS['COMMAND_LEVELS'] and the guild's
+# overrides in command_permissions, loaded once per guild.
+
+MAX_LEVEL = 3
+
+# Permission bits granting each level, highest first
+LEVEL_PERMISSIONS = (
+    (3, discord.Permissions(administrator=True).value),
+    (2, discord.Permissions(manage_guild=True).value),
+    (1, discord.Permissions(manage_messages=True).value),
+)
+
+
+def role_level(permissions: discord.Permissions) -> int:
+    for level, mask in LEVEL_PERMISSIONS:
+        if permissions.value & mask:
+            return level
+    return 0
+
+
+class PermissionCache:
+    """guild id -> {role id: level}"""
+
+    def __init__(self):
+        self._roles = {}
+
+    def role_levels(self, guild) -> dict:
+        levels = self._roles.get(guild.id)
+        if levels is None:
+            levels = {role.id: role_level(role.permissions) for role in guild.roles}
+            self._roles[guild.id] = levels
+        return levels
+
+    def member_level(self, member) -> int:
+        guild = getattr(member, 'guild', None)
+        if guild is None:
+            return 0  # Not a guild member (DMs)
+        if member.id == guild.owner_id:
+            return MAX_LEVEL
+        roles = self.role_levels(guild)
+        # Roles missing from the table were created after it was built; ask the role itself
+        return max(
+            (roles[role.id] if role.id in roles else role_level(role.permissions) for role in member.roles),
+            default=0
+        )
+
+    def invalidate_guild(self, guild_id: int):
+        """A role was created, changed or deleted: every role level in the guild may have changed"""
+        self._roles.pop(guild_id, None)
+
+
+permission_cache = PermissionCache()
+
+# guild_id -> (command -> level overrides, monotonic time they were loaded)
+_command_levels = {}
+
 
 def get_user_permission_level(member: discord.Member) -> int:
-    """Calculate user's permission level based on their roles"""
-    # Default level for everyone
-    default_level = 0
+    """User's permission level (0-3) from their roles"""
+    return permission_cache.member_level(member)
+
+
+async def get_command_levels(db, guild_id: int) -> dict:
+    """A guild's command -> level overrides; queries the database only on a miss"""
+    cached = _command_levels.get(guild_id)
+    if cached and time.monotonic() - cached[1] < PERMISSIONS['CACHE_TTL']:
+        return cached[0]
+
+    rows = (await db.execute(
+        select(CommandPermission.command, CommandPermission.level).filter(CommandPermission.guild_id == guild_id)
+    )).all()
+    levels = {command: level for command, level in rows}
+    _command_levels[guild_id] = (levels, time.monotonic())
+    return levels
 
-    # Admin gets highest level
-    if member.guild_permissions.administrator:
-        return 3
 
-    # Check other roles
-    if any(role.permissions.manage_guild for role in member.roles):
-        return 2
+def get_command_permission(levels: dict, command_name: str) -> dict:
+    """{'level', 'overridden'} of a command, given the guild's overrides"""
+    if command_name in levels:
+        return {'level': levels[command_name], 'overridden': True}
+    return {'level': PERMISSIONS['COMMAND_LEVELS'].get(command_name, 0), 'overridden': False}
 
-    if any(role.permissions.manage_messages for role in member.roles):
-        return 1
 
-    return default_level
+async def set_command_level(db, guild_id: int, command_name: str, level: int):
+    """Store a guild's override of a command's level and commit"""
+    statement = insert(CommandPermission).values(guild_id=guild_id, command=command_name, level=level)
+    await db.execute(statement.on_conflict_do_update(
+        constraint='uq_command_permissions_guild_command', set_={'level': level}
+    ))
+    await db.commit()
+    (await get_command_levels(db, guild_id))[command_name] = level
+
+
+async def required_level(guild_id: int, command_name: str) -> int:
+    if guild_id is None:
+        return get_command_permission({}, command_name)['level']  # DMs have no overrides
+    cached = _command_levels.get(guild_id)
+    if cached and time.monotonic() - cached[1] < PERMISSIONS['CACHE_TTL']:
+        levels = cached[0]
+    else:
+        async with get_async_db() as db:
+            levels = await get_command_levels(db, guild_id)
+    return get_command_permission(levels, command_name)['level']
+
 
 def has_command_permission(command_name: str):
     """Decorator to check command permissions"""
     async def predicate(interaction: discord.Interaction):
-        # Admin always has access
-        if interaction.user.guild_permissions.administrator:
+        if get_user_permission_level(interaction.user) >= await required_level(interaction.guild_id, command_name):
             return True
+        await interaction.response.send_message(
+            ERRORS['NO_PERMISSION'],
+            ephemeral=True
+        )
+        return False
+
+    predicate.permission_command = command_name
+    return app_commands.check(predicate)
+
 
-        # Get user's permission level
-        user_level = get_user_permission_level(interaction.user)
-
-        # Commands requiring admin (level 3)
-        admin_commands = ['admin_set', 'admin_reset', 'set_currency', 'add_level', 'edit_level', 'remove_level']
-        if command_name in admin_commands and user_level < 3:
-            await interaction.response.send_message(
-                ERRORS['NO_PERMISSION'],
-                ephemeral=True
-            )
-            return False
-
-        # Commands requiring moderator (level 2)
-        mod_commands = ['mute', 'unmute', 'kick']
-        if command_name in mod_commands and user_level < 2:
-            await interaction.response.send_message(
-                ERRORS['NO_PERMISSION'],
-                ephemeral=True
-            )
-            return False
-
-        # Commands requiring helper (level 1)
-        helper_commands = ['warn', 'unwarn']
-        if command_name in helper_commands and user_level < 1:
-            await interaction.response.send_message(
-                ERRORS['NO_PERMISSION'],
-                ephemeral=True
-            )
-            return False
-
-        return True
-
-    return app_commands.check(predicate)
\ No newline at end of file
+def permission_command(command) -> str:
+    """Name an app command's has_command_permission check uses, None if it has no such check"""
+    return next(
+        (check.permission_command for check in command.checks if hasattr(check, 'permission_command')), None
+    )
@@ -0,0 +1,192 @@
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from utils.config import DEFAULT_BALANCE, LEDGER, PLAYTIME
+from utils.database import get_async_db
+from utils.leaderboard import note_profile_created
+from utils.ledger import ledger, transaction_row
+from utils.minecraft_links import name_key
+from utils.ranking import record_balance
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Playtime rewards. After each polling round (utils/minecraft_status.py) the online sample of
+# every server is compared with the previous one: players present in both get the time between
+# the two samples not already counted on another server. Whole PERIODs are paid to the members
+# of all guilds with a verified link (see utils/minecraft_links.py) in one statement.
+
+# Credits, profile upserts and ledger rows for a whole tick in one round trip. Players come in
+# as parallel arrays and are matched to links by UUID, or by name for links without one. Rows
+# are upserted in (guild_id, user_id) order so concurrent batches lock them in the same order.
+# New profiles open at their guild's default balance (guild_settings, else DEFAULT_BALANCE).
+_CREDIT_TEMPLATE = """
+    WITH players AS (
+        SELECT * FROM unnest(CAST(:name_keys AS VARCHAR[]), CAST(:uuids AS VARCHAR[]), CAST(:amounts AS INTEGER[]))
+            AS player(name_key, uuid, amount)
+    ), credits AS (
+        SELECT links.guild_id, links.user_id, sum(matched.amount) AS amount,
+               COALESCE(guild_settings.default_balance, CAST(:default_balance AS INTEGER)) AS default_balance
+        FROM (
+            SELECT minecraft_links.id, players.amount
+            FROM players JOIN minecraft_links ON minecraft_links.minecraft_uuid = players.uuid
+            WHERE minecraft_links.verified
+            UNION ALL
+            SELECT minecraft_links.id, players.amount
+            FROM players JOIN minecraft_links ON minecraft_links.name_key = players.name_key
+            WHERE minecraft_links.minecraft_uuid IS NULL AND minecraft_links.verified
+        ) AS matched
+        JOIN minecraft_links AS links ON links.id = matched.id
+        LEFT JOIN guild_settings ON guild_settings.guild_id = links.guild_id
+        GROUP BY links.guild_id, links.user_id, guild_settings.default_balance
+    ), credited AS (
+        INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+        SELECT user_id, guild_id, default_balance + CAST(amount AS INTEGER),
+               timezone('utc', now()), timezone('utc', now())
+        FROM credits
+        ORDER BY guild_id, user_id
+        ON CONFLICT ON CONSTRAINT unique_user_guild DO UPDATE
+        SET balance = user_profiles.balance + EXCLUDED.balance - COALESCE(
+                (SELECT default_balance FROM guild_settings WHERE guild_id = EXCLUDED.guild_id),
+                CAST(:default_balance AS INTEGER)
+            ),
+            updated_at = EXCLUDED.updated_at
+        RETURNING guild_id, user_id, balance, (xmax = 0) AS created
+    ){ledger}
+    SELECT credited.guild_id, credited.user_id, credited.balance, credited.created, credits.amount
+    FROM credited JOIN credits USING (guild_id, user_id)
+"""
+
+LEDGER_CTE = """, ledger AS (
+        INSERT INTO transactions (from_user_id, to_user_id, guild_id, amount, transaction_type, created_at)
+        SELECT NULL, user_id, guild_id, amount, 'playtime', timezone('utc', now())
+        FROM credits
+    )"""
+
+CREDIT_SQL = text(_CREDIT_TEMPLATE.format(ledger=LEDGER_CTE))
+# Write-behind ledger mode: the Transaction rows are queued after commit instead
+CREDIT_WITHOUT_LEDGER_SQL = text(_CREDIT_TEMPLATE.format(ledger=''))
+
+
+async def credit_playtime(db, rewards):
+    """Credit [(name_key, uuid, amount)] to the linked members and commit.
+
+    Returns the credited rows: guild_id, user_id, balance, created, amount.
+    """
+    name_keys, uuids, amounts = (list(column) for column in zip(*rewards))
+    rows = (await db.execute(CREDIT_WITHOUT_LEDGER_SQL if LEDGER['WRITE_BEHIND'] else CREDIT_SQL, {
+        'name_keys': name_keys,
+        'uuids': uuids,
+        'amounts': amounts,
+        'default_balance': DEFAULT_BALANCE,
+    })).all()
+    await db.commit()
+    if LEDGER['WRITE_BEHIND']:
+        for row in rows:
+            await ledger.enqueue(transaction_row(None, row.user_id, row.guild_id, row.amount, 'playtime'))
+    return rows
+
+
+class PlaytimeTracker:
+    """Unpaid online time per player, accrued between the status samples of each server"""
+
+    def __init__(self):
+        self._online = {}  # address -> player keys in the last sample
+        self._sampled_at = {}  # address -> fetched_at of the last sample
+        self._players = {}  # player key -> {'name_key', 'uuid', 'seconds', 'counted_until'}
+        self.paid_players = 0
+        self.paid_amount = 0
+
+    @staticmethod
+    def player_key(player):
+        uuid = player.id.replace('-', '') if player.id else None
+        return uuid or name_key(player.name), name_key(player.name), uuid
+
+    def observe(self, address: str, players, sampled_at: float):
+        """Account the time since the server's previous sample to the players in both samples.
+
+        Time already counted for a player on another server isn't counted again.
+        """
+        since = self._sampled_at.get(address, sampled_at)
+        gap = sampled_at - since
+        previous = self._online.get(address, set())
+        current = set()
+        for player in players:
+            key, player_name_key, uuid = self.player_key(player)
+            current.add(key)
+            entry = self._players.setdefault(
+                key, {'name_key': player_name_key, 'uuid': uuid, 'seconds': 0.0, 'counted_until': None}
+            )
+            if key in previous and gap <= PLAYTIME['MAX_GAP']:
+                start = since if entry['counted_until'] is None else max(since, entry['counted_until'])
+                entry['seconds'] += max(sampled_at - start, 0.0)
+                entry['counted_until'] = max(sampled_at, start)
+        self._online[address] = current
+        self._sampled_at[address] = sampled_at
+        log.debug("Playtime sample", extra={'data': {
+            'address': address, 'online': len(current),
+            'joined': len(current - previous), 'left': len(previous - current)
+        }})
+
+    def forget(self, address: str):
+        """The server couldn't be polled: don't count the outage as play time"""
+        self._online.pop(address, None)
+        self._sampled_at.pop(address, None)
+
+    def take_rewards(self):
+        """[(name_key, uuid, amount)] for every whole PERIOD played, removed from the unpaid time.
+
+        Players no longer online anywhere are dropped with their unpaid part of a PERIOD.
+        """
+        online = set().union(*self._online.values())
+        rewards = []
+        for key, entry in list(self._players.items()):
+            periods = int(entry['seconds'] // PLAYTIME['PERIOD'])
+            if periods:
+                entry['seconds'] -= periods * PLAYTIME['PERIOD']
+                rewards.append((entry['name_key'], entry['uuid'], periods * PLAYTIME['REWARD']))
+            if key not in online:
+                del self._players[key]
+        return rewards
+
+    def give_back(self, rewards):
+        """Return rewards that couldn't be credited to the unpaid time, for the next tick"""
+        for player_name_key, uuid, amount in rewards:
+            entry = self._players.setdefault(uuid or player_name_key, {
+                'name_key': player_name_key, 'uuid': uuid, 'seconds': 0.0, 'counted_until': None
+            })
+            entry['seconds'] += amount / PLAYTIME['REWARD'] * PLAYTIME['PERIOD']
+
+    async def tick(self, poller):
+        """StatusPoller listener: take in the new samples and pay out the whole periods"""
+        for address, server in poller.servers.items():
+            if server.failures:
+                self.forget(address)
+            elif server.fetched_at is not None and server.fetched_at != self._sampled_at.get(address):
+                self.observe(address, server.status.players.sample or [], server.fetched_at)
+
+        rewards = self.take_rewards()
+        if not rewards:
+            return
+        started = time.monotonic()
+        try:
+            async with get_async_db() as db:
+                rows = await credit_playtime(db, rewards)
+        except SQLAlchemyError:
+            log.exception("Database error crediting playtime rewards, retrying next tick")
+            self.give_back(rewards)
+            return
+
+        for row in rows:
+            if row.created:
+                note_profile_created(row.guild_id)
+            record_balance(row.guild_id, row.user_id, row.balance)
+        self.paid_players += len(rows)
+        self.paid_amount += sum(row.amount for row in rows)
+        log.info("Credited playtime rewards", extra={
+            'duration_ms': round((time.monotonic() - started) * 1000, 1),
+            'data': {'players': len(rewards), 'credited': len(rows), 'amount': sum(row.amount for row in rows)}
+        })
+
+
+playtime = PlaytimeTracker()
@@ -0,0 +1,97 @@
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from utils.config import RANKING
+from utils.database import UserProfile
+import asyncio
+import time
+
+
+class GuildRanking:
+    """Order-statistics view of one guild's balances.
+
+    Entries are kept sorted richest first with the same tie order as /top
+    (higher user_id first), so rank lookups and pages are O(log n).
+    """
+
+    def __init__(self, rows):
+        self._balances = dict(rows)
+        self._order = SortedList(self._key(user_id, balance) for user_id, balance in self._balances.items())
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def _key(user_id: int, balance: int):
+        return (-balance, -user_id)
+
+    def __len__(self):
+        return len(self._order)
+
+    def update(self, user_id: int, balance: int):
+        """Move a user to their new balance (or add them)"""
+        old_balance = self._balances.get(user_id)
+        if old_balance == balance:
+            return
+        if old_balance is not None:
+            self._order.remove(self._key(user_id, old_balance))
+        self._balances[user_id] = balance
+        self._order.add(self._key(user_id, balance))
+
+    def rank(self, user_id: int):
+        """1-based position of the user, or None if they have no profile"""
+        balance = self._balances.get(user_id)
+        if balance is None:
+            return None
+        return self._order.index(self._key(user_id, balance)) + 1
+
+    def balance(self, user_id: int):
+        return self._balances.get(user_id)
+
+    def page(self, page: int, page_size: int):
+        """(rank, user_id, balance) rows of a 1-based leaderboard page"""
+        start = (page - 1) * page_size
+        return [
+            (start + offset + 1, -negative_user_id, -negative_balance)
+            for offset, (negative_balance, negative_user_id)
+            in enumerate(self._order.islice(start, start + page_size))
+        ]
+
+
+_rankings = {}
+_build_locks = {}
+# Balance changes seen while a guild's ranking is being built, applied once it is ready
+_pending = {}
+
+
+async def get_ranking(db, guild_id: int) -> GuildRanking:
+    """Ranking for a guild, built from user_profiles on first use and after TTL"""
+    ranking = _rankings.get(guild_id)
+    if ranking and time.monotonic() - ranking.built_at < RANKING['TTL']:
+        return ranking
+
+    lock = _build_locks.setdefault(guild_id, asyncio.Lock())
+    async with lock:
+        ranking = _rankings.get(guild_id)
+        if ranking and time.monotonic() - ranking.built_at < RANKING['TTL']:
+            return ranking
+
+        _pending[guild_id] = {}
+        try:
+            rows = (await db.execute(
+                select(UserProfile.user_id, UserProfile.balance).filter(UserProfile.guild_id == guild_id)
+            )).all()
+            ranking = GuildRanking(rows)
+            for user_id, balance in _pending[guild_id].items():
+                ranking.update(user_id, balance)
+            _rankings[guild_id] = ranking
+        finally:
+            del _pending[guild_id]
+
+    return ranking
+
+
+def record_balance(guild_id: int, user_id: int, balance: int):
+    """Apply a committed balance change to the guild's ranking, if it is loaded"""
+    if guild_id in _pending:
+        _pending[guild_id][user_id] = balance
+    ranking = _rankings.get(guild_id)
+    if ranking:
+        ranking.update(user_id, balance)
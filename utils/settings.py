@@ -0,0 +1,145 @@
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from utils.config import CURRENCY, DEFAULT_BALANCE, LEADERBOARD, GUILD_SETTINGS
+from utils.database import get_async_db, GuildSetting
+from datetime import timedelta
+import asyncio
+import logging
+import re
+import string
+import time
+
+log = logging.getLogger(__name__)
+
+# Per-guild settings. The guild_settings table only has rows for guilds that changed
+# something, so all of it is loaded at startup and every guild is a dict lookup afterwards:
+# commands and formatting never wait on the database for settings. Updates made here replace
+# the cached entry at once; those of other bot processes arrive with the next incremental
+# refresh (rows updated since the newest one seen). Entries carry the row's version, and an
+# older version never replaces a newer one.
+
+# Fields and format specs allowed in a currency format: '{amount:,} {currency}' and the like
+FORMAT_FIELDS = {'amount', 'currency'}
+FORMAT_SPEC = re.compile(r'^[,_]?$')
+
+
+def validate_format(currency_format: str) -> bool:
+    """Whether a guild may use currency_format (no attribute access, no padding widths)"""
+    try:
+        parsed = list(string.Formatter().parse(currency_format))
+        fields = [(name, spec, conversion) for _, name, spec, conversion in parsed if name is not None]
+    except ValueError:
+        return False
+    return bool(fields) and all(
+        name in FORMAT_FIELDS and FORMAT_SPEC.match(spec) and conversion is None
+        for name, spec, conversion in fields
+    )
+
+
+class GuildSettings:
+    """Effective settings of a guild: its guild_settings row over the config defaults"""
+
+    def __init__(self, guild_id: int, row=None):
+        self.guild_id = guild_id
+        self.version = row.version if row else 0
+        self.updated_at = row.updated_at if row else None
+        self.currency_name = row.currency_name if row and row.currency_name else CURRENCY['NAME']
+        self.currency_symbol = row.currency_symbol if row and row.currency_symbol else CURRENCY['SYMBOL']
+        self.currency_format = row.currency_format if row and row.currency_format else CURRENCY['FORMAT']
+        self.default_balance = DEFAULT_BALANCE if row is None or row.default_balance is None else row.default_balance
+        self.leaderboard_size = row.leaderboard_size if row and row.leaderboard_size else LEADERBOARD['SIZE']
+
+    def format_amount(self, amount: int) -> str:
+        """'1,000 монет'"""
+        return self.currency_format.format(amount=amount, currency=self.currency_name)
+
+    def format_balance(self, amount: int) -> str:
+        """'💰 1,000 монет'"""
+        return f"{self.currency_symbol} {self.format_amount(amount)}"
+
+    def format_change(self, amount: int) -> str:
+        """'+1,000 монет' / '-1,000 монет'"""
+        return f"{'-' if amount < 0 else '+'}{self.format_amount(abs(amount))}"
+
+
+class SettingsCache:
+    """guild id -> GuildSettings for every guild with a guild_settings row"""
+
+    def __init__(self):
+        self._settings = {}
+        self._seen_until = None  # Newest updated_at loaded
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._settings)
+
+    def get(self, guild_id: int) -> GuildSettings:
+        """Settings of a guild, without touching the database"""
+        settings = self._settings.get(guild_id)
+        return settings if settings is not None else GuildSettings(guild_id)
+
+    def put(self, settings: GuildSettings) -> bool:
+        """Cache settings unless a newer version is cached already"""
+        cached = self._settings.get(settings.guild_id)
+        if cached is not None and cached.version >= settings.version:
+            return False
+        self._settings[settings.guild_id] = settings
+        if settings.updated_at and (self._seen_until is None or settings.updated_at > self._seen_until):
+            self._seen_until = settings.updated_at
+        return True
+
+    async def refresh(self, db) -> int:
+        """Load the rows updated since the last refresh (all of them the first time)"""
+        query = select(GuildSetting)
+        if self._seen_until is not None:
+            # updated_at is the updating transaction's start, which can commit after rows with later
+            # timestamps: look back one more interval. put() ignores the rows it has already.
+            query = query.filter(
+                GuildSetting.updated_at >= self._seen_until - timedelta(seconds=GUILD_SETTINGS['REFRESH_INTERVAL'])
+            )
+        rows = (await db.scalars(query)).all()
+        changed = sum(self.put(GuildSettings(row.guild_id, row)) for row in rows)
+        self.loaded = True
+        return changed
+
+    async def refresh_loop(self):
+        """Pick up settings changed by other bot processes"""
+        while True:
+            await asyncio.sleep(GUILD_SETTINGS['REFRESH_INTERVAL'])
+            try:
+                async with get_async_db() as db:
+                    await self.refresh(db)
+            except Exception:
+                log.exception("Failed to refresh guild settings")
+
+
+guild_settings = SettingsCache()
+
+
+async def load_guild_settings():
+    """Load every guild's settings; called once at startup"""
+    started = time.monotonic()
+    async with get_async_db() as db:
+        await guild_settings.refresh(db)
+    log.info("Loaded guild settings", extra={
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'data': {'guilds': len(guild_settings)}
+    })
+
+
+async def update_guild_settings(db, guild_id: int, **values) -> GuildSettings:
+    """Change some of a guild's settings (column=value, None to reset to the default) and commit.
+
+    Accounts without a row read as the default balance, so changing default_balance also
+    changes the balance of every member who hasn't had a balance change yet.
+    """
+    now = func.timezone('utc', func.now())
+    statement = insert(GuildSetting).values(guild_id=guild_id, version=1, updated_at=now, **values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[GuildSetting.guild_id],
+        set_={**values, 'version': GuildSetting.version + 1, 'updated_at': now}
+    ).returning(GuildSetting)
+    settings = GuildSettings(guild_id, (await db.execute(statement)).scalar_one())
+    await db.commit()
+    guild_settings.put(settings)
+    return settings
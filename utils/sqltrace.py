@@ -0,0 +1,52 @@
+from sqlalchemy import event
+from utils.config import SQL
+from utils.metrics import DB_QUERY_LATENCY, statement_shape
+from utils.tracing import current_trace
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Statement instrumentation for both engines. Each statement is timed and counted against
+# the slash command that issued it. Statements slower than SQL['SLOW_QUERY_MS'] are logged
+# with their parameters; utils.log writes this logger to SQL['SLOW_QUERY_LOG'] as well.
+
+MAX_LOGGED_PARAMETERS = 2000  # Characters of repr(parameters) kept per slow query
+
+
+def log_slow_query(engine_name: str, statement: str, parameters, elapsed: float):
+    parameters = repr(parameters)
+    if len(parameters) > MAX_LOGGED_PARAMETERS:
+        parameters = parameters[:MAX_LOGGED_PARAMETERS] + '...'
+    # guild, user and command come from the current CommandTrace (utils/log.py)
+    log.warning("Slow query", extra={
+        'duration_ms': round(elapsed * 1000, 1),
+        'data': {'engine': engine_name, 'statement': ' '.join(statement.split()), 'parameters': parameters}
+    })
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement on engine (a sync Engine; pass async_engine.sync_engine)"""
+    threshold = SQL['SLOW_QUERY_MS'] / 1000
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        DB_QUERY_LATENCY.labels(name, statement_shape(statement)).observe(elapsed)
+
+        trace = current_trace()
+        if trace:
+            trace.queries += 1
+            trace.query_time += elapsed
+        if elapsed >= threshold:
+            log_slow_query(name, statement, parameters, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_timer(context):
+        started = context.connection.info.get('query_started') if context.connection else None
+        if started:
+            started.pop()
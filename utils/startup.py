@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from utils.metrics import STARTUP_PHASE, TIME_TO_FIRST_COMMAND
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Startup timings. main.py imports this module first, so "process start" is close to the
+# interpreter's. Each phase is logged and exported as bot_startup_phase_seconds{phase};
+# the first completed slash command sets bot_time_to_first_command_seconds.
+
+PROCESS_STARTED = time.monotonic()
+
+
+class StartupTimer:
+    """Durations of the startup phases and the time to the first command served"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self._last_lap = started
+        self.phases = {}
+        self.first_command = None
+
+    def since_start(self) -> float:
+        return time.monotonic() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as startup phase `name`"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def lap(self, name: str):
+        """Record the time since the previous lap (or process start) as phase `name`"""
+        now = time.monotonic()
+        self.record(name, now - self._last_lap)
+        self._last_lap = now
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        STARTUP_PHASE.labels(name).set(seconds)
+        log.info("Startup phase finished", extra={'duration_ms': round(seconds * 1000, 1), 'data': {'phase': name}})
+
+    def command_served(self):
+        """Call after every completed command; only the first one is recorded"""
+        if self.first_command is not None:
+            return
+        self.first_command = self.since_start()
+        TIME_TO_FIRST_COMMAND.set(self.first_command)
+        log.info("First command served", extra={
+            'duration_ms': round(self.first_command * 1000, 1),
+            'data': {'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}}
+        })
+
+
+startup = StartupTimer(PROCESS_STARTED)
@@ -0,0 +1,48 @@
+from contextvars import ContextVar
+import time
+
+# The slash command being handled by the current task. InstrumentedCog starts a trace
+# before each command; SQL instrumentation (utils/sqltrace.py) attributes statements to it.
+# The async engine runs statements in greenlets that inherit the task's context.
+
+
+class CommandTrace:
+    """What one slash command invocation did"""
+
+    def __init__(self, command: str, guild_id: int = None, user_id: int = None):
+        self.command = command
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.started_at = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.sessions = 0  # Database sessions opened (utils/database.py)
+        self.open_sessions = 0
+        self.max_open_sessions = 0  # More than 1: a session was opened inside another
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def session_opened(self):
+        self.sessions += 1
+        self.open_sessions += 1
+        self.max_open_sessions = max(self.max_open_sessions, self.open_sessions)
+
+    def session_closed(self):
+        self.open_sessions -= 1
+
+
+_current_trace = ContextVar('current_trace', default=None)
+
+
+def start_trace(command: str, guild_id: int = None, user_id: int = None) -> CommandTrace:
+    """Start tracing a command in the current task"""
+    trace = CommandTrace(command, guild_id, user_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    """The trace of the command the current task is handling, or None"""
+    return _current_trace.get()
@@ -0,0 +1,144 @@
+from utils.config import TRAFFIC
+from datetime import datetime
+import asyncio
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+
+log = logging.getLogger(__name__)
+
+# Opt-in capture of slash command traffic (TRAFFIC['RECORD']) for benchmarks/bench_replay.py.
+# One gzip NDJSON line per invocation:
+#   {"t": 1760000000.123, "c": "send", "g": <guild hash>, "u": <user hash>, "o": {"user": {"user": <hash>}, "amount": 50}}
+# Guild and user ids (also in options) are replaced by a keyed hash, so the same user keeps
+# the same id across a trace but can't be looked up. Hashes fit a BIGINT column. String
+# options (nicknames, addresses, level names...) are hashed the same way: {"string": <hash>}.
+
+USER_OPTION_TYPES = (6, 9)  # discord.AppCommandOptionType.user / mentionable
+STRING_OPTION_TYPES = (3,)  # discord.AppCommandOptionType.string
+SUBCOMMAND_TYPES = (1, 2)  # subcommand / subcommand_group
+
+
+def anonymize(snowflake, key: bytes) -> int:
+    digest = hmac.new(key, str(snowflake).encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') >> 1
+
+
+def command_options(options, key: bytes) -> dict:
+    """{name: value} of an interaction's raw options, user ids and strings hashed, subcommands flattened"""
+    values = {}
+    for option in options or ():
+        if option['type'] in SUBCOMMAND_TYPES:
+            values.update(command_options(option.get('options'), key))
+        elif option['type'] in USER_OPTION_TYPES:
+            values[option['name']] = {'user': anonymize(option['value'], key)}
+        elif option['type'] in STRING_OPTION_TYPES:
+            values[option['name']] = {'string': anonymize(option['value'], key)}
+        else:
+            values[option['name']] = option.get('value')
+    return values
+
+
+def qualified_name(data: dict) -> str:
+    """'group subcommand' style name of an invoked command from the interaction payload"""
+    names = [data.get('name')]
+    options = data.get('options') or ()
+    while options and options[0]['type'] in SUBCOMMAND_TYPES:
+        names.append(options[0]['name'])
+        options = options[0].get('options') or ()
+    return ' '.join(names)
+
+
+class TrafficRecorder:
+    """Buffers invocation records and appends them to a per-run trace file.
+
+    record() only appends to a list; a background task writes the buffer every
+    FLUSH_INTERVAL seconds in a worker thread, and whatever is left is written at exit.
+    """
+
+    def __init__(self, directory: str, salt: str, flush_interval: float):
+        self.path = os.path.join(directory, f"traffic-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson.gz")
+        # Without a salt the hashes differ between runs
+        self.key = salt.encode() if salt else secrets.token_bytes(32)
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._task = None
+
+    def attach(self, bot):
+        """Record every slash command the bot receives"""
+        bot.add_listener(self.on_interaction, 'on_interaction')
+        atexit.register(self.flush)
+        log.info("Recording command traffic", extra={'data': {'path': self.path}})
+
+    async def on_interaction(self, interaction):
+        if interaction.type.name != 'application_command' or not interaction.data:
+            return
+        self.record(
+            interaction.created_at.timestamp(),
+            qualified_name(interaction.data),
+            interaction.guild_id,
+            interaction.user.id,
+            command_options(interaction.data.get('options'), self.key)
+        )
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def record(self, timestamp: float, command: str, guild_id, user_id: int, options: dict):
+        self._buffer.append({
+            't': round(timestamp, 3),
+            'c': command,
+            'g': anonymize(guild_id, self.key) if guild_id else None,
+            'u': anonymize(user_id, self.key),
+            'o': options,
+        })
+
+    def flush(self):
+        """Write out the buffered records now"""
+        self.write(self._take())
+
+    def write(self, records):
+        """Append records to the trace file (one gzip member per call)"""
+        if not records:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as trace:
+                trace.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+            self.recorded += len(records)
+
+    def _take(self):
+        # Swapped on the event loop thread, so record() never appends to a list being written
+        records, self._buffer = self._buffer, []
+        return records
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            records = self._take()
+            try:
+                await asyncio.to_thread(self.write, records)
+            except OSError:
+                log.exception("Failed to write command traffic", extra={'data': {'path': self.path, 'dropped': len(records)}})
+
+
+def read_trace(path: str):
+    """Records of a trace file, in file order"""
+    with gzip.open(path, 'rt', encoding='utf-8') as trace:
+        for line in trace:
+            if line.strip():
+                yield json.loads(line)
+
+
+recorder = TrafficRecorder(
+    directory=TRAFFIC['DIR'],
+    salt=TRAFFIC['SALT'],
+    flush_interval=TRAFFIC['FLUSH_INTERVAL']
+)
@@ -0,0 +1,121 @@
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from utils.config import LEDGER
+from utils.leaderboard import note_profile_created
+from utils.ledger import ledger, transaction_row
+from utils.settings import guild_settings
+import logging
+
+log = logging.getLogger(__name__)
+
+# Debit, credit and ledger row in a single statement. The debit only matches while
+# balance >= amount, so concurrent transfers from one account can't overdraw it:
+# the second UPDATE waits on the row lock and re-checks the condition. Credit and
+# ledger insert select FROM debit, so nothing happens when the debit matched no row.
+#
+# Accounts without a row hold the guild's default balance. A sender without a row is opened by
+# the debit itself (opened), and the recipient's row is created by the credit upsert.
+_TRANSFER_TEMPLATE = """
+    WITH existing AS (
+        UPDATE user_profiles
+        SET balance = balance - :amount,
+            updated_at = timezone('utc', now())
+        WHERE guild_id = :guild_id
+          AND user_id = :from_user_id
+          AND balance >= :amount
+        RETURNING balance, false AS created
+    ), opened AS (
+        INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+        SELECT CAST(:from_user_id AS BIGINT), CAST(:guild_id AS BIGINT), CAST(:sender_opening_balance AS INTEGER),
+               timezone('utc', now()), timezone('utc', now())
+        WHERE CAST(:sender_opening_balance AS INTEGER) >= 0
+          AND NOT EXISTS (
+              SELECT 1 FROM user_profiles WHERE guild_id = :guild_id AND user_id = :from_user_id
+          )
+        ON CONFLICT ON CONSTRAINT unique_user_guild DO UPDATE
+        SET balance = user_profiles.balance - :amount,
+            updated_at = timezone('utc', now())
+        WHERE user_profiles.balance >= :amount
+        RETURNING balance, (xmax = 0) AS created
+    ), debit AS (
+        SELECT balance, created FROM existing
+        UNION ALL
+        SELECT balance, created FROM opened
+    ), credit AS (
+        INSERT INTO user_profiles (user_id, guild_id, balance, created_at, updated_at)
+        SELECT CAST(:to_user_id AS BIGINT), CAST(:guild_id AS BIGINT), CAST(:recipient_opening_balance AS INTEGER),
+               timezone('utc', now()), timezone('utc', now())
+        FROM debit
+        ON CONFLICT ON CONSTRAINT unique_user_guild DO UPDATE
+        SET balance = user_profiles.balance + :amount,
+            updated_at = timezone('utc', now())
+        RETURNING balance, (xmax = 0) AS created
+    ){ledger}
+    SELECT debit.balance AS sender_balance, debit.created AS sender_created,
+           credit.balance AS recipient_balance, credit.created AS recipient_created
+    FROM debit, credit
+"""
+
+LEDGER_CTE = """, ledger AS (
+        INSERT INTO transactions (from_user_id, to_user_id, guild_id, amount, transaction_type, created_at)
+        SELECT CAST(:from_user_id AS BIGINT), CAST(:to_user_id AS BIGINT), CAST(:guild_id AS BIGINT),
+               CAST(:amount AS INTEGER), CAST(:transaction_type AS VARCHAR), timezone('utc', now())
+        FROM debit
+    )"""
+
+TRANSFER_SQL = text(_TRANSFER_TEMPLATE.format(ledger=LEDGER_CTE))
+# Write-behind ledger mode: the Transaction row is queued after commit instead
+TRANSFER_WITHOUT_LEDGER_SQL = text(_TRANSFER_TEMPLATE.format(ledger=''))
+
+# Opposite transfers (A->B and B->A) lock the same two rows in different order
+DEADLOCK_DETECTED = '40P01'
+MAX_ATTEMPTS = 3
+
+
+async def transfer_funds(
+    db,
+    guild_id: int,
+    from_user_id: int,
+    to_user_id: int,
+    amount: int,
+    transaction_type: str = 'transfer'
+):
+    """Atomically move amount between two accounts and record the transaction.
+
+    Returns (sender_balance, recipient_balance) after the transfer, or None if the
+    sender doesn't have enough funds. Commits on success.
+    """
+    default_balance = guild_settings.get(guild_id).default_balance
+    params = {
+        'guild_id': guild_id,
+        'from_user_id': from_user_id,
+        'to_user_id': to_user_id,
+        'amount': amount,
+        'sender_opening_balance': default_balance - amount,
+        'recipient_opening_balance': default_balance + amount,
+        'transaction_type': transaction_type,
+    }
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            row = (await db.execute(
+                TRANSFER_WITHOUT_LEDGER_SQL if LEDGER['WRITE_BEHIND'] else TRANSFER_SQL, params
+            )).first()
+            if row is None:
+                await db.rollback()
+                return None
+
+            await db.commit()
+            if LEDGER['WRITE_BEHIND']:
+                await ledger.enqueue(transaction_row(
+                    from_user_id, to_user_id, guild_id, amount, transaction_type
+                ))
+            for created in (row.sender_created, row.recipient_created):
+                if created:
+                    note_profile_created(guild_id)
+            return row.sender_balance, row.recipient_balance
+        except DBAPIError as e:
+            await db.rollback()
+            if getattr(e.orig, 'sqlstate', None) != DEADLOCK_DETECTED or attempt == MAX_ATTEMPTS:
+                raise
+            log.warning("Deadlock in transfer_funds, retrying", extra={'data': {'attempt': attempt}})